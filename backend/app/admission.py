@@ -0,0 +1,136 @@
+# Admission control for upstream LLM calls
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+
+from app import metrics
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call is shed instead of queued."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Upstream is overloaded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps concurrent upstream calls, with a bounded FIFO wait queue.
+
+    When every slot is busy, callers queue up to ``max_queue`` deep. A
+    caller is shed immediately, rather than queued, when the queue is full
+    or its expected wait (queue position x smoothed call duration / slots)
+    exceeds ``max_queue_wait``. Queued callers that still haven't got a
+    slot after ``max_queue_wait`` are shed too.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        max_queue: int = 256,
+        max_queue_wait: float = 5.0,
+        initial_service_time: float = 1.0,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Exponentially weighted average of how long a call holds its slot
+        self._service_time = initial_service_time
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait(self) -> float:
+        """Estimated seconds a new caller would wait for a slot."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            return 0.0
+        return (len(self._waiters) + 1) * self._service_time / max(1, self.max_in_flight)
+
+    def check(self) -> None:
+        """Raise AdmissionRejected if a new caller would be shed right now."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            return
+        wait = self.expected_wait()
+        if len(self._waiters) >= self.max_queue or wait > self.max_queue_wait:
+            self._reject(wait)
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+
+        self.check()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        metrics.UPSTREAM_QUEUE_DEPTH.set(len(self._waiters))
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            if not self._forget(waiter):
+                return  # The slot was handed over just as we gave up, so keep it
+            self._reject(self.expected_wait())
+        except BaseException:
+            if not self._forget(waiter):
+                self.release(self._service_time)  # Pass on the slot we can't use
+            raise
+
+    def release(self, service_time: float) -> None:
+        self._service_time += 0.2 * (service_time - self._service_time)
+        # Hand the slot straight to the next waiter, keeping FIFO order
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                metrics.UPSTREAM_QUEUE_DEPTH.set(len(self._waiters))
+                return
+        metrics.UPSTREAM_QUEUE_DEPTH.set(0)
+        self.in_flight -= 1
+
+    def reset(self) -> None:
+        """Forget calls in flight and queued, e.g. in a freshly forked worker."""
+        self.in_flight = 0
+        self._waiters.clear()
+        metrics.UPSTREAM_QUEUE_DEPTH.set(0)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one upstream slot for the duration of the block."""
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "expected_wait_seconds": round(self.expected_wait(), 3),
+            "rejected": self.rejected,
+        }
+
+    def _forget(self, waiter: asyncio.Future) -> bool:
+        """Drop a waiter that gave up. Returns False if it already owns a slot."""
+        if waiter.done() and not waiter.cancelled():
+            return False
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        metrics.UPSTREAM_QUEUE_DEPTH.set(len(self._waiters))
+        return True
+
+    def _reject(self, wait: float) -> None:
+        self.rejected += 1
+        metrics.UPSTREAM_SHED.inc()
+        raise AdmissionRejected(retry_after=max(wait, 1.0))
@@ -1,16 +1,39 @@
 # app/api/v1/endpoints.py
-from fastapi import APIRouter, HTTPException, Request, Depends
+import asyncio
+import math
+from fastapi import APIRouter, HTTPException, Request, Depends, Query, Response
 from fastapi.responses import StreamingResponse
-from app.models import RephraseIn, RephraseOut, HealthResponse
-from app.llm import rephrase, rephrase_stream, LLMError
+from pydantic import ValidationError
+from app.config import get_settings
+from app.models import (
+    RephraseIn, RephraseOut, RephraseBatchIn, RephraseBatchItem, RephraseBatchOut, HealthResponse, JobOut
+)
+from app.llm import rephrase, rephrase_stream, check_admission, LLMError, LLMOverloadedError
 from app.security import rate_limiter, get_client_ip
+from app.streaming import STYLE_KEYS, StyleStreamParser, StreamParseError, format_sse, with_heartbeats
+from app.stream_buffer import fingerprint, get_stream_registry
+from app.jobs import Job, JobQueueFull, get_job_queue
+from app.metrics import RATE_LIMIT_REJECTIONS
 
 router = APIRouter()
 
+def _overloaded(error: LLMOverloadedError) -> HTTPException:
+    """A fast 503 telling the client when it's worth retrying."""
+    return HTTPException(
+        status_code=503,
+        detail="Service is busy. Please try again shortly.",
+        headers={"Retry-After": str(math.ceil(error.retry_after))},
+    )
+
+async def _check_rate_limit(client_ip: str, endpoint: str, cost: int = 1):
+    """Raise a 429 if the client is over its rate limit."""
+    if not await rate_limiter.is_allowed(client_ip, cost=cost):
+        RATE_LIMIT_REJECTIONS.labels(endpoint).inc()
+        raise HTTPException(status_code=429, detail="Rate limit exceeded. Please try again later.")
+
 @router.get("/health", response_model=HealthResponse)
 def health():
     """Health check endpoint."""
-    from app.config import get_settings
     settings = get_settings()
     return HealthResponse(
         status="ok", 
@@ -33,7 +56,17 @@ async def rephrase_stream_options():
     """Handle CORS preflight requests for the streaming endpoint."""
     return {"message": "OK"}
 
-@router.post("/rephrase", response_model=RephraseOut)
+@router.options("/rephrase-batch")
+async def rephrase_batch_options():
+    """Handle CORS preflight requests for the batch endpoint."""
+    return {"message": "OK"}
+
+@router.options("/jobs")
+async def jobs_options():
+    """Handle CORS preflight requests for the jobs endpoint."""
+    return {"message": "OK"}
+
+@router.post("/rephrase", response_model=RephraseOut, response_model_exclude_none=True)
 async def rephrase_endpoint(
     body: RephraseIn, 
     request: Request,
@@ -41,40 +74,161 @@ async def rephrase_endpoint(
 ):
     """Rephrase text in different styles."""
     # Rate limiting
-    if not await rate_limiter.is_allowed(client_ip):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded. Please try again later.")
+    await _check_rate_limit(client_ip, "rephrase")
     
     try:
-        result = await rephrase(body.text)
+        result = await rephrase(body.text, styles=body.styles)
         return RephraseOut(**result)
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
     except LLMError:
         # Don't leak internal details
         raise HTTPException(status_code=500, detail="LLM call failed")
 
+@router.post("/rephrase-batch", response_model=RephraseBatchOut, response_model_exclude_none=True)
+async def rephrase_batch_endpoint(
+    body: RephraseBatchIn,
+    request: Request,
+    client_ip: str = Depends(get_client_ip)
+):
+    """Rephrase many texts in one request.
+
+    Each text gets its own result or error, so one bad item doesn't fail the batch.
+    """
+    settings = get_settings()
+    
+    # Rate limiting - the batch counts as a fraction of a request per item
+    cost = max(1, math.ceil(len(body.texts) * settings.batch_item_weight))
+    await _check_rate_limit(client_ip, "rephrase_batch", cost=cost)
+    
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+    
+    async def run(index: int, text: str) -> RephraseBatchItem:
+        try:
+            item = RephraseIn(text=text)
+        except ValidationError as e:
+            return RephraseBatchItem(index=index, error=e.errors()[0]["msg"])
+        
+        async with semaphore:
+            try:
+                result = await rephrase(item.text, styles=body.styles)
+            except LLMOverloadedError:
+                return RephraseBatchItem(index=index, error="Service is busy")
+            except LLMError:
+                # Don't leak internal details
+                return RephraseBatchItem(index=index, error="LLM call failed")
+        return RephraseBatchItem(index=index, result=RephraseOut(**result))
+    
+    results = await asyncio.gather(*(run(i, text) for i, text in enumerate(body.texts)))
+    return RephraseBatchOut(results=results)
+
 @router.post("/rephrase-stream")
 async def rephrase_stream_endpoint(
     body: RephraseIn,
     request: Request,
     client_ip: str = Depends(get_client_ip)
 ):
-    """Stream rephrase response in real-time using Server-Sent Events."""
+    """Stream rephrase response in real-time using Server-Sent Events.
+
+    Emits typed events: ``delta`` with new text for a style, ``style_complete``
+    once a style's value is finished, then ``done`` with the full result
+    (or ``error`` if the generation fails). A reconnect with ``Last-Event-ID``
+    picks up after that event without starting a new generation.
+    """
     # Rate limiting
-    if not await rate_limiter.is_allowed(client_ip):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded. Please try again later.")
+    await _check_rate_limit(client_ip, "rephrase_stream")
     
-    try:
+    streams = get_stream_registry()
+    body_id = fingerprint(body.text, body.styles)
+    resume = streams.find(request.headers.get("last-event-id"), body_id)
+    if resume is not None:
+        session, after = resume
+    else:
+        # Shed load before the 200 goes out; once streaming, errors can only be in-band
+        try:
+            check_admission(body.text, body.styles)
+        except LLMOverloadedError as e:
+            raise _overloaded(e)
+        
         async def generate():
-            async for chunk in rephrase_stream(body.text):
-                # Format as Server-Sent Events
-                yield f"data: {chunk}\n\n"
+            parser = StyleStreamParser(body.styles or STYLE_KEYS)
+            chunks = rephrase_stream(body.text, styles=body.styles)
+            try:
+                async for chunk in chunks:
+                    for event, data in parser.feed(chunk):
+                        yield format_sse(event, data)
+                result = RephraseOut(**parser.result())
+            except (LLMError, StreamParseError):
+                # Headers are already sent, so report the failure in-band
+                yield format_sse("error", {"detail": "LLM call failed"})
+                return
+            finally:
+                # Stops the upstream call too if we're closed early
+                await chunks.aclose()
+            yield format_sse("done", result.model_dump(exclude_none=True))
         
-        return StreamingResponse(
-            generate(),
-            media_type="text/plain",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-            }
+        # The generation runs in the registry, so it outlives a dropped connection
+        session, after = streams.start(generate(), body_id), -1
+    
+    settings = get_settings()
+    return StreamingResponse(
+        with_heartbeats(
+            streams.subscribe(session, after), settings.sse_heartbeat_interval, request.is_disconnected
+        ),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            # Stop nginx buffering the events
+            "X-Accel-Buffering": "no",
+            "X-Stream-ID": session.id,
+        }
+    )
+
+
+def _job_out(job: Job) -> JobOut:
+    result = RephraseOut(**job.result) if job.result is not None else None
+    return JobOut(id=job.id, status=job.status, result=result, error=job.error)
+
+@router.post("/jobs", response_model=JobOut, response_model_exclude_none=True, status_code=202)
+async def create_job(
+    body: RephraseIn,
+    request: Request,
+    response: Response,
+    client_ip: str = Depends(get_client_ip)
+):
+    """Queue a rephrase and return its job id without waiting for the result.
+
+    For clients that can't hold a connection open for a slow LLM call;
+    fetch the result from ``GET /jobs/{id}``.
+    """
+    # Rate limiting
+    await _check_rate_limit(client_ip, "jobs")
+    
+    try:
+        job = await get_job_queue().submit(body.text, styles=body.styles)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many jobs queued. Please try again shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
         )
-    except LLMError:
-        raise HTTPException(status_code=500, detail="LLM call failed")
+    response.headers["Location"] = str(request.url_for("get_job", job_id=job.id))
+    return _job_out(job)
+
+@router.get("/jobs/{job_id}", response_model=JobOut, response_model_exclude_none=True)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish (long-poll)"),
+):
+    """Get a job's status, and its result once it has finished.
+
+    With ``wait``, the response is held until the job finishes or the wait
+    (capped at JOB_MAX_WAIT) runs out, whichever comes first.
+    """
+    queue = get_job_queue()
+    job = await queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    job = await queue.wait(job, min(wait, get_settings().job_max_wait))
+    return _job_out(job)
@@ -1,8 +1,20 @@
 # app/api/v1/version.py
+import asyncio
+import os
+import sqlite3
+import time
 from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 from app.config import get_settings
+from app.cache import get_response_cache
+from app.near_duplicates import get_near_duplicate_index
+from app.result_store import get_result_store
+from app.stream_buffer import get_stream_registry
+from app.jobs import get_job_queue
+from app.security import rate_limiter
+from app.llm import admission, hedging, http_pool, router as llm_router
+from app import metrics
 
 router = APIRouter()
 
@@ -30,6 +42,11 @@ def get_version_info():
                 "methods": ["POST"],
                 "streaming": False
             },
+            "rephrase_batch": {
+                "endpoint": "/api/v1/rephrase-batch",
+                "methods": ["POST"],
+                "streaming": False
+            },
             "rephrase_stream": {
                 "endpoint": "/api/v1/rephrase-stream",
                 "methods": ["POST"],
@@ -47,25 +64,63 @@ def get_version_info():
         sunset_date=None
     )
 
+def _result_store_stats() -> Dict[str, Any]:
+    try:
+        result_store = get_result_store()
+        return result_store.stats() if result_store is not None else {"enabled": False}
+    except sqlite3.Error as e:
+        # Requests carry on without the store, so the status shouldn't fail either
+        return {"enabled": True, "error": str(e)}
+
+def _stored_stats() -> Dict[str, Any]:
+    """The status figures read from SQLite files, which block; run in a thread."""
+    return {
+        "tracked_clients": len(rate_limiter),
+        "result_store": _result_store_stats(),
+        "jobs": get_job_queue().stats(),
+    }
+
 @router.get("/status")
-def get_api_status():
+async def get_api_status():
     """Get detailed API status."""
+    # On the event loop, so the in-memory stats aren't read while requests change them
     settings = get_settings()
+    stored = await asyncio.to_thread(_stored_stats)
     
     return {
         "status": "operational",
         "version": settings.version,
         "api_version": "v1",
         "environment": settings.environment,
-        "uptime": "running",
+        "uptime_seconds": round(time.time() - metrics.PROCESS_START, 1),
+        # Each worker process answers for itself; repeat the call to see others
+        "worker": {
+            "pid": os.getpid(),
+            "parent_pid": os.getppid(),
+            "workers": settings.web_workers or None,
+            "requests_served": metrics.requests_served(),
+            "requests_in_flight": int(metrics.HTTP_REQUESTS_IN_FLIGHT.labels().value),
+            "upstream_in_flight": admission.in_flight,
+            "max_requests": settings.worker_max_requests or None
+        },
         "rate_limit": {
             "per_minute": settings.rate_limit_per_minute,
-            "per_hour": settings.rate_limit_per_hour
+            "per_hour": settings.rate_limit_per_hour,
+            "tracked_clients": stored["tracked_clients"]
         },
         "features": {
             "openai_model": settings.openai_model,
             "max_text_length": settings.max_text_length,
             "cors_enabled": True,
             "security_enabled": True
-        }
+        },
+        "cache": get_response_cache().stats(),
+        "result_store": stored["result_store"],
+        "near_duplicates": dict(get_near_duplicate_index().stats(), enabled=settings.near_duplicate_enabled),
+        "upstream": admission.stats(),
+        "hedging": dict(hedging.stats(), enabled=settings.hedge_enabled),
+        "backends": llm_router.stats(),
+        "http_pool": http_pool.stats(),
+        "streams": get_stream_registry().stats(),
+        "jobs": stored["jobs"]
     }
@@ -0,0 +1,154 @@
+# LLM backends and routing between them
+import json
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.pacing import RateLimitPacer
+
+
+class Backend:
+    """One OpenAI-compatible endpoint and model, with its observed health.
+
+    ``client`` returns the AsyncOpenAI client to call. Inputs longer than
+    ``max_input_tokens`` (if set) are only sent here as a last resort.
+    ``pacer`` tracks the rate limits of this backend's account, if it has
+    its own.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        client: Callable[[], Any],
+        max_input_tokens: Optional[int] = None,
+        pacer: Optional[RateLimitPacer] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.client = client
+        self.max_input_tokens = max_input_tokens
+        self.pacer = pacer
+        self.latency: Optional[float] = None  # EWMA seconds, non-streamed calls only
+        self.error_rate = 0.0  # EWMA of failures
+        self.calls = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self.probe_at: Optional[float] = None  # When a backend demoted for latency is tried again
+
+    def fits(self, input_tokens: int) -> bool:
+        return self.max_input_tokens is None or input_tokens <= self.max_input_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "max_input_tokens": self.max_input_tokens,
+            "latency_seconds": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "failures": self.failures,
+        }
+
+
+class LLMRouter:
+    """Orders backends for each call: best fit first, the rest as fallbacks.
+
+    Short inputs go to the backend with the smallest ``max_input_tokens``
+    that still fits (the fast, cheap model), longer ones to the next tier
+    up. Backends whose error rate rises above ``max_error_rate`` are put
+    last for ``cooldown`` seconds, and a backend whose latency is over
+    ``slow_factor`` times the fastest healthy one the input fits gives way
+    to it. A backend given way still gets one call every ``probe_interval``
+    seconds, so its latency average can recover.
+    """
+
+    def __init__(
+        self,
+        backends: List[Backend],
+        alpha: float = 0.2,
+        max_error_rate: float = 0.5,
+        cooldown: float = 30.0,
+        slow_factor: float = 3.0,
+        probe_interval: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+        self.backends = backends
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.slow_factor = slow_factor
+        self.probe_interval = probe_interval
+        self._clock = clock
+
+    @property
+    def signature(self) -> str:
+        """Identifies the backend setup, so cached results don't outlive it."""
+        return ",".join(f"{b.name}={b.model}:{b.max_input_tokens}" for b in self.backends)
+
+    def route(self, input_tokens: int) -> List[Backend]:
+        """Backends to try for an input of this size, in order."""
+        fitting = sorted(
+            (b for b in self.backends if b.fits(input_tokens)),
+            key=lambda b: b.max_input_tokens if b.max_input_tokens is not None else math.inf,
+        )
+        order = fitting + [b for b in self.backends if not b.fits(input_tokens)]
+
+        now = self._clock()
+        healthy = [b for b in order if b.down_until <= now]
+        head = healthy[0] if healthy else None
+        if head is not None and head.fits(input_tokens) and head.latency is not None:
+            # Only backends the input fits can take its place
+            timed = [(b.latency, b) for b in healthy if b.fits(input_tokens) and b.latency is not None]
+            fastest_latency, fastest = min(timed, key=lambda pair: pair[0])
+            if head.latency <= self.slow_factor * fastest_latency:
+                head.probe_at = None
+            elif head.probe_at is not None and now >= head.probe_at:
+                head.probe_at = now + self.probe_interval  # Keep it first for this call
+            else:
+                if head.probe_at is None:
+                    head.probe_at = now + self.probe_interval
+                healthy.remove(fastest)
+                healthy.insert(0, fastest)
+        return healthy + [b for b in order if b.down_until > now]
+
+    def record_success(self, backend: Backend, latency: Optional[float] = None) -> None:
+        backend.calls += 1
+        backend.error_rate -= self.alpha * backend.error_rate
+        if latency is not None:
+            if backend.latency is None:
+                backend.latency = latency
+            else:
+                backend.latency += self.alpha * (latency - backend.latency)
+
+    def record_failure(self, backend: Backend) -> None:
+        backend.calls += 1
+        backend.failures += 1
+        backend.error_rate += self.alpha * (1 - backend.error_rate)
+        if backend.error_rate > self.max_error_rate:
+            backend.down_until = self._clock() + self.cooldown
+            # Come back half trusted, so one more failure sends it away again
+            backend.error_rate = self.max_error_rate
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        now = self._clock()
+        return {b.name: dict(b.stats(), available=b.down_until <= now) for b in self.backends}
+
+
+def parse_backends(raw: str) -> List[Dict[str, Any]]:
+    """Parse the LLM_BACKENDS JSON list of backend configs."""
+    try:
+        configs = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"LLM_BACKENDS is not valid JSON: {e}") from e
+    if not isinstance(configs, list) or not configs:
+        raise ValueError("LLM_BACKENDS must be a non-empty JSON list")
+    names = set()
+    for config in configs:
+        if not isinstance(config, dict) or not config.get("name") or not config.get("model"):
+            raise ValueError("Each LLM_BACKENDS entry needs a name and a model")
+        if config["name"] in names:
+            raise ValueError(f"Duplicate backend name in LLM_BACKENDS: {config['name']}")
+        names.add(config["name"])
+    return configs
@@ -0,0 +1,306 @@
+# Offline bulk rephrasing of JSONL files
+"""
+Rephrases every line of a JSONL file with app.llm.rephrase and appends the
+results to another JSONL file as they finish.
+
+Usage: python -m app.bulk INPUT OUTPUT [--concurrency 8] [--styles casual,polite]
+
+Each input line is an object with a "text" field (see --text-field) and an
+optional "id", which is copied to the output. Output lines are
+{"offset": ..., "id": ..., "result": {...}} or {..., "error": "..."}, where
+offset is the input line's byte offset; they're in completion order.
+
+Progress is checkpointed to OUTPUT.checkpoint, so running the same command
+again after an interruption carries on where it stopped.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+from typing import BinaryIO, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import ValidationError
+
+from app import llm, metrics
+from app.models import RephraseIn
+
+# Attempts per line when the upstream is busy, waiting its Retry-After in between
+MAX_ATTEMPTS = 5
+
+
+def read_lines(path: str, start: int = 0) -> Iterator[Tuple[int, int, bytes]]:
+    """Yield (offset, next offset, line) from ``start``, one line in memory at a time."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            yield offset, offset + len(line), line
+            offset += len(line)
+
+
+class Checkpoint:
+    """Which input lines are done, saved atomically next to the output.
+
+    Lines finish out of order, so it records the offset below which every
+    line is done plus the offsets done beyond it, and how long the output
+    was at the time; output written after the last save is cut off and
+    redone on resume.
+    """
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.done_below = 0
+        self.done: set = set()
+        self.output_bytes = 0
+
+    def load(self) -> bool:
+        """Read a saved checkpoint for the same input; False if there's none."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        if data.get("input") != self.input_path:
+            raise SystemExit(f"{self.path} is for {data.get('input')}; use --restart to start over")
+        self.done_below = data["done_below"]
+        self.done = set(data["done"])
+        self.output_bytes = data["output_bytes"]
+        return True
+
+    def save(self) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "input": self.input_path,
+                "done_below": self.done_below,
+                "done": sorted(self.done),
+                "output_bytes": self.output_bytes,
+            }, f)
+        os.replace(tmp, self.path)
+
+
+class BulkRun:
+    def __init__(
+        self,
+        input_path: str,
+        output_path: str,
+        concurrency: int = 8,
+        styles: Optional[List[str]] = None,
+        text_field: str = "text",
+        checkpoint_path: Optional[str] = None,
+        restart: bool = False,
+        progress_interval: float = 5.0,
+        checkpoint_interval: float = 1.0,
+        report: Optional[TextIO] = None,
+    ):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.styles = styles
+        self.text_field = text_field
+        self.checkpoint = Checkpoint(checkpoint_path or f"{output_path}.checkpoint", input_path)
+        self.restart = restart
+        self.progress_interval = progress_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.report = report
+        self.total_bytes = os.path.getsize(input_path)
+        self.completed = 0
+        self.errors = 0
+        self.skipped = 0
+        self._dispatched: deque = deque()  # (offset, next offset) in input order
+        self._finished: Dict[int, int] = {}
+        self._done_bytes = 0  # Input bytes done, including earlier runs
+        self._run_bytes = 0  # Input bytes done by this run, for the ETA
+        self._out: Optional[BinaryIO] = None
+        self._start = 0.0
+        self._last_save = 0.0
+        self._tokens_before = (0.0, 0.0)
+
+    async def run(self) -> Dict[str, Optional[float]]:
+        """Process every line not done yet; returns the final counts."""
+        resumed = not self.restart and self.checkpoint.load()
+        if resumed:
+            self._done_bytes = self.checkpoint.done_below
+        # Keep what an earlier run wrote, if there's a checkpoint for it
+        keep = resumed and os.path.exists(self.output_path)
+        self._start = time.monotonic()
+        self._tokens_before = self._tokens()
+        with open(self.output_path, "r+b" if keep else "wb") as out:
+            # Drop output written after the checkpoint; those lines are redone
+            out.truncate(self.checkpoint.output_bytes if resumed else 0)
+            out.seek(0, os.SEEK_END)
+            self._out = out
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+            workers = [asyncio.create_task(self._work(queue)) for _ in range(self.concurrency)]
+            progress = asyncio.create_task(self._report_progress())
+            try:
+                for offset, next_offset, line in read_lines(self.input_path, self.checkpoint.done_below):
+                    if offset in self.checkpoint.done:
+                        # Done by an earlier run; track it so done_below can move past it
+                        self.skipped += 1
+                        self._done_bytes += next_offset - offset
+                        self._dispatched.append((offset, next_offset))
+                        self._finished[offset] = next_offset
+                        continue
+                    self._dispatched.append((offset, next_offset))
+                    await queue.put((offset, next_offset, line))
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers + [progress]:
+                    task.cancel()
+                await asyncio.gather(*workers, progress, return_exceptions=True)
+                self.checkpoint.save()
+        summary = self.stats()
+        self._print(summary, final=True)
+        return summary
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        prompt, completion = self._tokens()
+        rate = self.completed / elapsed
+        fraction = self._done_bytes / self.total_bytes if self.total_bytes else 1.0
+        remaining = self.total_bytes - self._done_bytes
+        eta = elapsed * remaining / self._run_bytes if self._run_bytes else None
+        return {
+            "completed": self.completed,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "progress": round(fraction, 4),
+            "lines_per_second": round(rate, 2),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "prompt_tokens": int(prompt - self._tokens_before[0]),
+            "completion_tokens": int(completion - self._tokens_before[1]),
+        }
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            offset, next_offset, line = item
+            record = await self._process(offset, line)
+            assert self._out is not None
+            if record is not None:
+                self._out.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                self._out.flush()
+            # Written and flushed before it counts as done, so the checkpoint never runs ahead
+            self._mark_done(offset, next_offset)
+
+    async def _process(self, offset: int, line: bytes) -> Optional[dict]:
+        if not line.strip():
+            return None
+        record: dict = {"offset": offset}
+        try:
+            data = json.loads(line.decode("utf-8", errors="replace"))
+            if isinstance(data, dict) and "id" in data:
+                record["id"] = data["id"]
+            line.decode("utf-8")  # The id may be read past bad bytes, the text may not
+            text = data.get(self.text_field) if isinstance(data, dict) else data
+            item = RephraseIn.model_validate({"text": text, "styles": self.styles})
+        except json.JSONDecodeError:
+            return self._error(record, "Invalid JSON")
+        except UnicodeDecodeError:
+            return self._error(record, "Invalid UTF-8")
+        except ValidationError as e:
+            return self._error(record, e.errors()[0]["msg"])
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                record["result"] = await llm.rephrase(item.text, styles=item.styles)
+                self.completed += 1
+                return record
+            except llm.LLMOverloadedError as e:
+                if attempt < MAX_ATTEMPTS:
+                    await asyncio.sleep(e.retry_after)
+            except llm.LLMError as e:
+                return self._error(record, str(e))
+        return self._error(record, "Service is busy")
+
+    def _error(self, record: dict, message: str) -> dict:
+        self.errors += 1
+        record["error"] = message
+        return record
+
+    def _mark_done(self, offset: int, next_offset: int) -> None:
+        checkpoint = self.checkpoint
+        self._finished[offset] = next_offset
+        self._done_bytes += next_offset - offset
+        self._run_bytes += next_offset - offset
+        checkpoint.done.add(offset)
+        # Advance past every line at the front that's done
+        while self._dispatched and self._dispatched[0][0] in self._finished:
+            start, end = self._dispatched.popleft()
+            del self._finished[start]
+            checkpoint.done.discard(start)
+            checkpoint.done_below = end
+        assert self._out is not None
+        checkpoint.output_bytes = self._out.tell()
+        now = time.monotonic()
+        if now - self._last_save >= self.checkpoint_interval:
+            checkpoint.save()
+            self._last_save = now
+
+    async def _report_progress(self) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self._print(self.stats())
+
+    def _print(self, stats: Dict[str, Optional[float]], final: bool = False) -> None:
+        eta = stats["eta_seconds"]
+        eta_text = f"{int(eta // 3600)}h{int(eta % 3600 // 60):02d}m{int(eta % 60):02d}s" if eta is not None else "-"
+        print(
+            f"{'done' if final else 'progress'}: {stats['completed']:,} rephrased, "
+            f"{stats['errors']:,} errors ({stats['progress']:.1%} of input), "
+            f"{stats['lines_per_second']:.1f}/s, ETA {eta_text}, "
+            f"tokens {stats['prompt_tokens']:,} prompt / {stats['completion_tokens']:,} completion",
+            file=self.report or sys.stderr, flush=True,
+        )
+
+    @staticmethod
+    def _tokens() -> Tuple[float, float]:
+        return (
+            metrics.UPSTREAM_TOKENS.labels("prompt").value,
+            metrics.UPSTREAM_TOKENS.labels("completion").value,
+        )
+
+
+async def _main(args) -> Dict[str, Optional[float]]:
+    styles = args.styles.split(",") if args.styles else None
+    run = BulkRun(
+        args.input, args.output,
+        concurrency=args.concurrency,
+        styles=styles,
+        text_field=args.text_field,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+        progress_interval=args.progress_interval,
+    )
+    try:
+        return await run.run()
+    finally:
+        await llm.close_connections()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rephrase every line of a JSONL file")
+    parser.add_argument("input", help="JSONL file with one {\"text\": ...} object per line")
+    parser.add_argument("output", help="JSONL file to append results to")
+    parser.add_argument("--concurrency", type=int, default=8, help="Texts rephrased at once")
+    parser.add_argument("--styles", help="Comma-separated styles (all four if omitted)")
+    parser.add_argument("--text-field", default="text", help="Field holding the text in each line")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+    summary = asyncio.run(_main(args))
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# In-memory response cache for LLM results
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+from app.config import get_settings
+
+
+class ResponseCache:
+    """LRU cache with a TTL and an entry/byte budget.
+
+    Values are small dicts of strings (the rephrased styles), so the byte
+    size of an entry is the UTF-8 length of its key and values.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 10 * 1024 * 1024,
+        ttl_seconds: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # key -> (value, size in bytes, expiry timestamp)
+        self._entries: "OrderedDict[str, Tuple[Dict[str, str], int, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, count: bool = True) -> Optional[Dict[str, str]]:
+        """Return a copy of the cached value, or None on a miss.
+
+        With ``count=False`` the hit and miss counters are left alone, for
+        callers trying several keys that call ``record_lookup`` once instead.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            if count:
+                self.record_lookup(False)
+            return None
+
+        value, size, expires_at = entry
+        if expires_at <= self._clock():
+            self._remove(key, size)
+            self.expirations += 1
+            if count:
+                self.record_lookup(False)
+            return None
+
+        self._entries.move_to_end(key)
+        if count:
+            self.record_lookup(True)
+        return dict(value)
+
+    def record_lookup(self, hit: bool) -> None:
+        """Count one lookup as a hit or a miss."""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def set(self, key: str, value: Dict[str, str]) -> None:
+        """Store a value, evicting least recently used entries to stay in budget."""
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+
+        size = self._size_of(key, value)
+        if size > self.max_bytes:
+            return  # Would never fit, don't flush the whole cache for it
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+
+        self._entries[key] = (dict(value), size, self._clock() + self.ttl_seconds)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key, (_, oldest_size, _) = next(iter(self._entries.items()))
+            self._remove(oldest_key, oldest_size)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        self._entries.clear()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _remove(self, key: str, size: int) -> None:
+        del self._entries[key]
+        self._bytes -= size
+
+    @staticmethod
+    def _size_of(key: str, value: Dict[str, str]) -> int:
+        size = len(key.encode("utf-8"))
+        for k, v in value.items():
+            size += len(k.encode("utf-8")) + len(v.encode("utf-8"))
+        return size
+
+
+@lru_cache()
+def get_response_cache() -> ResponseCache:
+    """Get the shared response cache, sized from settings."""
+    settings = get_settings()
+    if not settings.cache_enabled:
+        return ResponseCache(max_entries=0)
+    return ResponseCache(
+        max_entries=settings.cache_max_entries,
+        max_bytes=settings.cache_max_bytes,
+        ttl_seconds=settings.cache_ttl_seconds,
+    )
@@ -1,5 +1,6 @@
 # Configuration management
 import os
+import tempfile
 from typing import List
 from functools import lru_cache
 
@@ -28,16 +29,114 @@ class Settings:
         # Rate limiting settings
         self.rate_limit_per_minute: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
         self.rate_limit_per_hour: int = int(os.getenv("RATE_LIMIT_PER_HOUR", "1000"))
+        # "memory" keeps counters per process, "sqlite" shares them between workers on a host
+        self.rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+        self.rate_limit_db_path: str = os.getenv(
+            "RATE_LIMIT_DB_PATH", os.path.join(tempfile.gettempdir(), "rephrase-rate-limit.sqlite3")
+        )
+        
+        # Worker processes for `python -m app.server` (0 = one per available CPU), and
+        # requests a worker serves before it's replaced, to bound memory growth (0 = never)
+        self.web_workers: int = int(os.getenv("WEB_WORKERS", "0"))
+        self.worker_max_requests: int = int(os.getenv("WORKER_MAX_REQUESTS", "10000"))
         
         # OpenAI API settings
         self.openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
         self.openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
         self.openai_timeout: float = float(os.getenv("OPENAI_TIMEOUT", "20"))
         self.openai_max_retries: int = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+        # Point at an OpenAI-compatible server instead, e.g. the local benchmark stand-in
+        self.openai_base_url: str | None = os.getenv("OPENAI_BASE_URL") or None
+        # Connection pool shared by all upstream clients, opened at startup
+        self.openai_http_max_connections: int = int(os.getenv("OPENAI_HTTP_MAX_CONNECTIONS", "64"))
+        self.openai_http_max_keepalive: int = int(os.getenv("OPENAI_HTTP_MAX_KEEPALIVE", "32"))
+        self.openai_http_keepalive_expiry: float = float(os.getenv("OPENAI_HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.openai_http2: bool = os.getenv("OPENAI_HTTP2", "false").lower() == "true"
+        self.openai_http_warm_connections: int = int(os.getenv("OPENAI_HTTP_WARM_CONNECTIONS", "2"))
+        # Optional JSON list of backends to route between, e.g.
+        # [{"name": "fast", "model": "gpt-4o-mini", "max_input_tokens": 200}, {"name": "strong", "model": "gpt-4o"}]
+        # Entries may set base_url and api_key_env; unset means the settings above
+        self.llm_backends: str | None = os.getenv("LLM_BACKENDS") or None
+        # A backend erroring on more than this share of recent calls is skipped for ROUTER_COOLDOWN
+        # seconds, and one over ROUTER_SLOW_FACTOR times slower than the fastest gives way to it,
+        # apart from one call every ROUTER_PROBE_INTERVAL seconds to check if it has recovered
+        self.router_max_error_rate: float = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+        self.router_cooldown: float = float(os.getenv("ROUTER_COOLDOWN", "30"))
+        self.router_slow_factor: float = float(os.getenv("ROUTER_SLOW_FACTOR", "3"))
+        self.router_probe_interval: float = float(os.getenv("ROUTER_PROBE_INTERVAL", "10"))
+        # Pace calls by the x-ratelimit-* headers; calls needing a longer wait are rejected
+        self.openai_pacing_enabled: bool = os.getenv("OPENAI_PACING_ENABLED", "true").lower() == "true"
+        self.openai_pacing_max_wait: float = float(os.getenv("OPENAI_PACING_MAX_WAIT", "2"))
+        
+        # Upstream admission control - concurrent calls, queue depth and the longest
+        # expected wait (seconds) before new calls are shed with a 503
+        self.llm_max_in_flight: int = int(os.getenv("LLM_MAX_IN_FLIGHT", "32"))
+        self.llm_max_queue: int = int(os.getenv("LLM_MAX_QUEUE", "256"))
+        self.llm_max_queue_wait: float = float(os.getenv("LLM_MAX_QUEUE_WAIT", "5"))
+        
+        # Hedging - opt-in second call when the first is slower than the recent quantile,
+        # for at most HEDGE_MAX_RATE of calls, and at most HEDGE_MAX_BUDGET in a burst
+        # (streams are never hedged)
+        self.hedge_enabled: bool = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+        self.hedge_quantile: float = float(os.getenv("HEDGE_QUANTILE", "0.9"))
+        self.hedge_default_delay: float = float(os.getenv("HEDGE_DEFAULT_DELAY", "2"))
+        self.hedge_max_rate: float = float(os.getenv("HEDGE_MAX_RATE", "0.1"))
+        self.hedge_max_budget: float = float(os.getenv("HEDGE_MAX_BUDGET", "10"))
+        
+        # Response cache settings
+        self.cache_enabled: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+        self.cache_max_entries: int = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+        self.cache_max_bytes: int = int(os.getenv("CACHE_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.cache_ttl_seconds: float = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+        # Result store: results kept in a SQLite file across restarts, shared by workers on a host
+        self.result_store_enabled: bool = os.getenv("RESULT_STORE_ENABLED", "false").lower() == "true"
+        self.result_store_path: str = os.getenv(
+            "RESULT_STORE_PATH", os.path.join(tempfile.gettempdir(), "rephrase-results.sqlite3")
+        )
+        self.result_store_max_bytes: int = int(os.getenv("RESULT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.result_store_ttl_seconds: float = float(os.getenv("RESULT_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+        # Most read stored results loaded into the response cache at startup
+        self.result_store_warm_entries: int = int(os.getenv("RESULT_STORE_WARM_ENTRIES", "1000"))
+        # Near-duplicate reuse: serve a cached result for a text this similar (0-1) to an earlier one
+        self.near_duplicate_enabled: bool = os.getenv("NEAR_DUPLICATE_ENABLED", "false").lower() == "true"
+        self.near_duplicate_threshold: float = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+        self.near_duplicate_max_entries: int = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "100000"))
+        
+        # Batch rephrasing settings
+        self.batch_concurrency: int = int(os.getenv("BATCH_CONCURRENCY", "8"))
+        # How much one batch item counts against the rate limit (0.25 = 4 items per request)
+        self.batch_item_weight: float = float(os.getenv("BATCH_ITEM_WEIGHT", "0.25"))
+        
+        # Content filtering - file with one blocked term per line (built-in list if unset)
+        self.content_blocklist_path: str | None = os.getenv("CONTENT_BLOCKLIST_PATH") or None
         
         # App limits and settings
         self.max_text_length: int = 5000
-        self.max_tokens: int = 1000
+        # Seconds of silence on /rephrase-stream before a heartbeat comment is sent
+        self.sse_heartbeat_interval: float = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+        # Background jobs (/api/v1/jobs): worker pool, and the SQLite file holding job
+        # state and results, shared by the workers on a host so any of them can answer a poll
+        self.job_store_path: str = os.getenv(
+            "JOB_STORE_PATH", os.path.join(tempfile.gettempdir(), "rephrase-jobs.sqlite3")
+        )
+        self.job_workers: int = int(os.getenv("JOB_WORKERS", "4"))
+        self.job_max_pending: int = int(os.getenv("JOB_MAX_PENDING", "1000"))
+        self.job_max_entries: int = int(os.getenv("JOB_MAX_ENTRIES", "10000"))
+        self.job_max_bytes: int = int(os.getenv("JOB_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.job_ttl_seconds: float = float(os.getenv("JOB_TTL_SECONDS", "600"))
+        # A job not finished this long after it was submitted, queueing included, fails
+        self.job_timeout_seconds: float = float(os.getenv("JOB_TIMEOUT_SECONDS", "300"))
+        # Longest a GET /jobs/{id}?wait= long-poll is held open
+        self.job_max_wait: float = float(os.getenv("JOB_MAX_WAIT", "30"))
+        # Resumable streams: events kept for Last-Event-ID reconnects
+        self.stream_buffer_max_streams: int = int(os.getenv("STREAM_BUFFER_MAX_STREAMS", "1000"))
+        self.stream_buffer_max_bytes: int = int(os.getenv("STREAM_BUFFER_MAX_BYTES", str(16 * 1024 * 1024)))
+        self.stream_buffer_ttl: float = float(os.getenv("STREAM_BUFFER_TTL", "60"))
+        # Seconds a generation keeps running with no client attached (0 = stop at once)
+        self.stream_resume_grace: float = float(os.getenv("STREAM_RESUME_GRACE", "5"))
+        # Upper bound on output tokens; each call's own cap is sized to its input
+        self.max_tokens: int = int(os.getenv("MAX_TOKENS", "4000"))
+        self.adaptive_max_tokens: bool = os.getenv("ADAPTIVE_MAX_TOKENS", "true").lower() == "true"
     
     def _load_env(self):
         """Load environment variables from .env file if it exists."""
@@ -0,0 +1,186 @@
+# Content filtering for user input
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Pattern
+
+from app.config import get_settings
+
+# Used when no blocklist file is configured
+DEFAULT_BLOCKED_TERMS = ("spam", "malware", "hack")
+
+
+def _build_trie(terms: Iterable[str]) -> Dict:
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True  # End of a term
+    return trie
+
+
+def _trie_to_regex(node: Dict) -> str:
+    """Turn a character trie into a regex where shared prefixes are matched once."""
+    branches = []
+    for ch in sorted(key for key in node if key):
+        # Any run of whitespace matches a space in a term
+        atom = r"\s+" if ch == " " else re.escape(ch)
+        branches.append(atom + _trie_to_regex(node[ch]))
+
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        # A term ends here, and longer terms continue from it
+        body = f"(?:{body})?"
+    return body
+
+
+def compile_terms(terms: Iterable[str]) -> Optional[Pattern]:
+    """Compile terms into one case-insensitive, whole-word regex.
+
+    The terms are merged into a trie first, so shared prefixes are matched
+    once and the regex engine follows a single path per input character.
+    """
+    normalized = {" ".join(term.lower().split()) for term in terms}
+    normalized.discard("")
+    if not normalized:
+        return None
+    return re.compile(r"(?<!\w)" + _trie_to_regex(_build_trie(normalized)) + r"(?!\w)", re.IGNORECASE)
+
+
+_WORD = re.compile(r"\w+")
+
+
+class CompiledBlocklist:
+    """A blocklist compiled for single-pass scanning.
+
+    Plain single-word terms, the bulk of any real list, go into a set that
+    is checked against the words of the text, so the cost of a scan doesn't
+    grow with the list size. Phrases and terms with punctuation (like
+    "c++") are compiled into one trie regex, which is only tried where a
+    text word equals a term's leading word. Terms that don't start with a
+    word character fall back to a regex search over the whole text.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        words = set()
+        anchors = set()
+        anchored = []
+        unanchored = []
+        for term in terms:
+            term = " ".join(term.lower().split())
+            if not term:
+                continue
+            if _WORD.fullmatch(term):
+                words.add(term)
+            elif (lead := _WORD.match(term)) is not None:
+                anchors.add(lead.group())
+                anchored.append(term)
+            else:
+                unanchored.append(term)
+        self.words = frozenset(words)
+        self.anchors = frozenset(anchors)
+        self.anchored_pattern = compile_terms(anchored)
+        self.unanchored_pattern = compile_terms(unanchored)
+        self.size = len(words) + len(anchored) + len(unanchored)
+
+    def find(self, text: str) -> Optional[str]:
+        """Return the first blocked term found in the text, if any."""
+        if self.words or self.anchors:
+            text_words = _WORD.findall(text.lower())
+            if not self.words.isdisjoint(text_words):
+                return next(word for word in text_words if word in self.words)
+            if self.anchored_pattern is not None and not self.anchors.isdisjoint(text_words):
+                for word in _WORD.finditer(text):
+                    if word.group().lower() in self.anchors:
+                        match = self.anchored_pattern.match(text, word.start())
+                        if match:
+                            return match.group()
+        if self.unanchored_pattern is not None:
+            match = self.unanchored_pattern.search(text)
+            if match:
+                return match.group()
+        return None
+
+
+def load_terms(path: str) -> List[str]:
+    """Read a blocklist file: one term per line, blank lines and # comments ignored."""
+    terms = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                terms.append(line)
+    return terms
+
+
+class ContentFilter:
+    """Blocks input containing any blocklisted term as a whole word.
+
+    With a blocklist file, the compiled pattern is rebuilt by ``reload()``,
+    and automatically when the file's modification time changes (checked
+    at most every ``refresh_interval`` seconds).
+    """
+
+    def __init__(
+        self,
+        terms: Iterable[str] = DEFAULT_BLOCKED_TERMS,
+        path: Optional[str] = None,
+        refresh_interval: float = 30.0,
+    ):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._default_terms = tuple(terms)
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._blocklist = CompiledBlocklist(())
+        self.reload()
+
+    @property
+    def term_count(self) -> int:
+        return self._blocklist.size
+
+    def reload(self) -> None:
+        """Rebuild the pattern from the blocklist file (or the default terms)."""
+        if self.path:
+            mtime = os.stat(self.path).st_mtime
+            terms = load_terms(self.path)
+        else:
+            mtime = None
+            terms = list(self._default_terms)
+        # Swap in the new blocklist only once it's fully built
+        self._blocklist, self._mtime = CompiledBlocklist(terms), mtime
+        self._next_check = time.monotonic() + self.refresh_interval
+
+    def find(self, text: str) -> Optional[str]:
+        """Return the first blocked term found in the text, if any."""
+        self._maybe_refresh()
+        return self._blocklist.find(text)
+
+    def contains_blocked(self, text: str) -> bool:
+        return self.find(text) is not None
+
+    def _maybe_refresh(self) -> None:
+        if not self.path or time.monotonic() < self._next_check:
+            return
+        try:
+            changed = os.stat(self.path).st_mtime != self._mtime
+        except OSError:
+            changed = False  # Keep the last good list if the file goes missing
+        if changed:
+            try:
+                self.reload()
+                return
+            except (OSError, ValueError):
+                pass  # Half-written or unreadable file, keep the current pattern
+        self._next_check = time.monotonic() + self.refresh_interval
+
+
+@lru_cache()
+def get_content_filter() -> ContentFilter:
+    """Get the shared content filter, built from the configured blocklist."""
+    settings = get_settings()
+    return ContentFilter(path=settings.content_blocklist_path)
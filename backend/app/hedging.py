@@ -0,0 +1,101 @@
+# Hedged upstream calls for tail latency
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, TypeVar
+
+from app import metrics
+
+T = TypeVar("T")
+
+
+class HedgePolicy:
+    """Fires a second, identical call when the first is slower than usual.
+
+    The hedge deadline is the ``quantile`` of recent call latencies (or
+    ``default_delay`` until ``min_samples`` calls have been seen). Whichever
+    call finishes first wins and the other is cancelled. Hedges are paid
+    for from a budget that starts empty and earns ``max_rate`` per call, so
+    at most that share of calls are ever sent twice; saving up is capped at
+    ``max_budget`` hedges, which bounds a burst after a quiet spell.
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.9,
+        default_delay: float = 2.0,
+        max_rate: float = 0.1,
+        window: int = 200,
+        min_samples: int = 20,
+        max_budget: float = 10.0,
+    ):
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.max_budget = max_budget
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._budget = 0.0
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def deadline(self) -> float:
+        """Seconds to wait on the first call before hedging it."""
+        if len(self._latencies) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(self._latencies)
+        rank = max(0, math.ceil(self.quantile * len(ordered)) - 1)
+        return ordered[rank]
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Await ``call()``, hedging it with a second call if it's slow."""
+        self.calls += 1
+        self._budget = min(self.max_budget, self._budget + self.max_rate)
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(call())
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.deadline())
+            if done or self._budget < 1:
+                result = await primary
+                self._latencies.append(time.perf_counter() - start)
+                return result
+
+            self._budget -= 1
+            self.hedged += 1
+            metrics.UPSTREAM_HEDGES.labels("fired").inc()
+            hedge = asyncio.ensure_future(call())
+            result = await self._first_success(primary, hedge)
+            # Only a lower bound for the primary, but keeps slow periods visible
+            self._latencies.append(time.perf_counter() - start)
+            return result
+        finally:
+            # Cancel the loser (or both, if we were cancelled ourselves)
+            primary.cancel()
+            if hedge is not None:
+                hedge.cancel()
+
+    async def _first_success(self, primary: asyncio.Future, hedge: asyncio.Future):
+        pending = {primary, hedge}
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled() or task.exception() is not None:
+                    continue
+                if task is hedge:
+                    self.hedge_wins += 1
+                    metrics.UPSTREAM_HEDGES.labels("won").inc()
+                return task.result()
+            if not pending:
+                # Both failed, report the primary's error
+                return primary.result()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "deadline_seconds": round(self.deadline(), 3),
+        }
@@ -0,0 +1,147 @@
+# Shared HTTP connection pool for upstream calls
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
+
+if TYPE_CHECKING:
+    import httpx
+    from httpx import AsyncBaseTransport as _Transport
+else:
+    _Transport = object
+
+# httpx and the OpenAI SDK are imported on first use, to keep startup fast
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HTTPPool:
+    """One connection pool shared by every upstream OpenAI client.
+
+    Each client gets its own thin httpx.AsyncClient (so it keeps its own
+    event hooks) on top of the same transport, so connections are reused
+    across clients. The transport is built on first use; ``warm()`` opens
+    connections ahead of the first request and ``aclose()`` closes them.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 64,
+        max_keepalive_connections: int = 32,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        if http2 and not _http2_available():
+            logger.warning("OPENAI_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self._transport: Optional["httpx.AsyncHTTPTransport"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.warmed = 0
+
+    @property
+    def transport(self) -> "httpx.AsyncHTTPTransport":
+        import httpx
+
+        # Connections belong to the event loop that opened them, so a new
+        # loop (a forked worker, a test) gets a new pool
+        loop = asyncio.get_running_loop()
+        if self._transport is None or self._loop is not loop:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+            self._transport = httpx.AsyncHTTPTransport(limits=limits, http2=self.http2)
+            self._loop = loop
+        return self._transport
+
+    def client(self, **kwargs: Any) -> "httpx.AsyncClient":
+        """An httpx client for the OpenAI SDK that sends through the shared pool."""
+        import openai
+
+        return openai.DefaultAsyncHttpxClient(transport=_Shared(self), **kwargs)
+
+    async def warm(self, urls: Iterable[str], connections: int, timeout: float = 5.0) -> None:
+        """Open ``connections`` keep-alive connections to each URL's host.
+
+        Any response will do, so a HEAD on the URL is enough; failures are
+        only logged, since the first real request will simply connect itself.
+        """
+        urls = list(urls)
+        if connections <= 0 or not urls:
+            return
+        import httpx
+
+        # Concurrent requests each need their own connection
+        async with httpx.AsyncClient(transport=_Shared(self), timeout=timeout) as client:
+            results = await asyncio.gather(
+                *(client.head(url) for url in urls for _ in range(connections)),
+                return_exceptions=True,
+            )
+        errors = [r for r in results if isinstance(r, Exception)]
+        self.warmed += len(results) - len(errors)
+        if errors:
+            logger.warning("Could not pre-open %d upstream connection(s): %r", len(errors), errors[0])
+
+    def discard(self) -> None:
+        """Forget the pool without closing it, e.g. in a forked child whose
+        parent still owns the sockets."""
+        self._transport = None
+        self._loop = None
+
+    async def aclose(self) -> None:
+        if self._transport is not None:
+            transport, self._transport = self._transport, None
+            await transport.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        # httpcore doesn't expose pool stats, so read its pool defensively
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for c in connections if c.is_idle())
+        queued = sum(1 for r in getattr(pool, "_requests", []) if r.is_queued())
+        max_connections = self.max_connections
+        return {
+            "max_connections": max_connections,
+            "connections": len(connections),
+            "active": len(connections) - idle,
+            "idle": idle,
+            "queued_requests": queued,
+            "utilization": round((len(connections) - idle) / max_connections, 3) if max_connections else 0.0,
+            "http2": self.http2,
+            "warmed": self.warmed,
+        }
+
+
+class _Shared(_Transport):
+    """Sends through the pool's current transport and leaves closing it to the pool.
+
+    Clients keep working after ``HTTPPool.aclose()``; they get a new pool.
+    Implements the httpx.AsyncBaseTransport interface, only subclassing it
+    for type checkers, so defining it doesn't import httpx.
+    """
+
+    def __init__(self, pool: HTTPPool):
+        self._pool = pool
+
+    async def handle_async_request(self, request: "httpx.Request") -> "httpx.Response":
+        return await self._pool.transport.handle_async_request(request)
+
+    async def __aenter__(self) -> "_Shared":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
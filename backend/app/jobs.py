@@ -0,0 +1,352 @@
+# Background rephrase jobs: accept now, fetch the result later
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Final, List, Literal, Optional, Sequence
+
+from app import llm, metrics
+from app.config import get_settings
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+QUEUED: Final = "queued"
+RUNNING: Final = "running"
+SUCCEEDED: Final = "succeeded"
+FAILED: Final = "failed"
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are waiting; the client should retry after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(
+        self,
+        text: str,
+        styles: Optional[Sequence[str]],
+        created_at: float,
+        id: Optional[str] = None,
+        status: JobStatus = QUEUED,
+        result: Optional[Dict[str, str]] = None,
+        error: Optional[str] = None,
+        finished_at: Optional[float] = None,
+    ):
+        self.id = id or secrets.token_urlsafe(16)
+        self.text = text
+        self.styles = list(styles) if styles else None
+        self.status: JobStatus = status
+        self.result = result
+        self.error = error
+        self.created_at = created_at
+        self.finished_at = finished_at
+        self.size = len(text.encode("utf-8"))
+        self._done = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+
+class JobQueue:
+    """A fixed pool of workers running ``rephrase()`` for queued jobs.
+
+    Job state and results live in a SQLite file shared by every worker
+    process on the host, so a job can be polled through any of them; each
+    process runs the jobs it accepted. At most ``max_pending`` jobs wait for
+    a process's workers; past that, ``submit`` raises JobQueueFull. A job
+    not finished ``timeout_seconds`` after it was submitted fails. Finished
+    jobs are kept for ``ttl_seconds``, and the oldest finished ones are
+    dropped early to stay within ``max_entries`` and ``max_bytes`` (text plus
+    result, UTF-8). Jobs left unfinished by a process that died are dropped
+    once they would have timed out and expired.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        workers: int = 4,
+        max_pending: int = 1000,
+        max_entries: int = 10000,
+        max_bytes: int = 10 * 1024 * 1024,
+        ttl_seconds: float = 600,
+        timeout_seconds: float = 300,
+        poll_interval: float = 0.25,
+        clock: Callable[[], float] = time.time,
+    ):
+        # Wall clock time, since monotonic clocks aren't comparable across processes
+        self.path = path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.timeout_seconds = timeout_seconds
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._local = threading.local()
+        self._running: Dict[str, Job] = {}  # Unfinished jobs accepted by this process
+        self._queue: Optional["asyncio.Queue[Job]"] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.evictions = 0
+
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Triggers keep running totals, so writes don't have to scan the table to check the bounds
+            conn.executescript(
+                """
+                BEGIN IMMEDIATE;
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY, text TEXT NOT NULL, styles TEXT, status TEXT NOT NULL,
+                    result TEXT, error TEXT, size INTEGER NOT NULL,
+                    created REAL NOT NULL, finished REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+                CREATE TABLE IF NOT EXISTS totals (
+                    id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO totals SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM jobs;
+                CREATE TRIGGER IF NOT EXISTS jobs_inserted AFTER INSERT ON jobs BEGIN
+                    UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size;
+                END;
+                CREATE TRIGGER IF NOT EXISTS jobs_deleted AFTER DELETE ON jobs BEGIN
+                    UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size;
+                END;
+                CREATE TRIGGER IF NOT EXISTS jobs_resized AFTER UPDATE OF size ON jobs BEGIN
+                    UPDATE totals SET bytes = bytes + NEW.size - OLD.size;
+                END;
+                COMMIT;
+                """
+            )
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT entries FROM totals").fetchone()[0]
+
+    async def submit(self, text: str, styles: Optional[Sequence[str]] = None) -> Job:
+        """Queue a job and return it straight away."""
+        queue = self._start_workers()
+        if queue.qsize() >= self.max_pending:
+            metrics.JOBS.labels("rejected").inc()
+            raise JobQueueFull(retry_after=1.0)
+        job = Job(text, styles, self._clock())
+        await asyncio.to_thread(self._insert, job)
+        self._running[job.id] = job
+        queue.put_nowait(job)
+        metrics.JOB_QUEUE_DEPTH.set(queue.qsize())
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Return the job, or None if it's unknown or has expired."""
+        job = self._running.get(job_id)
+        if job is not None:
+            return job
+        return await asyncio.to_thread(self._load, job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Wait up to ``timeout`` seconds for the job to finish, then return it either way.
+
+        Jobs run by this process are waited for directly; others are polled
+        every ``poll_interval`` seconds.
+        """
+        local = self._running.get(job.id)
+        if local is not None:
+            # Until it's stored, even if its status says it's done
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(local._done.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return local
+        if job.done or timeout <= 0:
+            return job
+        deadline = time.monotonic() + timeout
+        while not job.done:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(self.poll_interval, remaining))
+            latest = await asyncio.to_thread(self._load, job.id)
+            if latest is None:
+                break  # Expired or evicted meanwhile
+            job = latest
+        return job
+
+    async def aclose(self) -> None:
+        """Stop the workers; jobs that hadn't finished are marked failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = self._loop = None
+        interrupted, self._running = list(self._running.values()), {}
+        for job in interrupted:
+            job.status, job.error = FAILED, "Job was interrupted"
+            job.finished_at = self._clock()
+            job._done.set()
+        if interrupted:
+            await asyncio.to_thread(self._save_many, interrupted)
+
+    def stats(self) -> Dict[str, float]:
+        """Counts over every process sharing the file. Reads only, so it's safe from any thread."""
+        counts = dict(self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "workers": self.workers,
+            "queued": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "finished": counts.get(SUCCEEDED, 0) + counts.get(FAILED, 0),
+            "bytes": self._connection().execute("SELECT bytes FROM totals").fetchone()[0],
+            "max_pending": self.max_pending,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+        }
+
+    def _start_workers(self) -> "asyncio.Queue[Job]":
+        # Workers belong to the event loop that first needs them
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._queue is None:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._tasks = [loop.create_task(self._work(self._queue)) for _ in range(self.workers)]
+        return self._queue
+
+    async def _work(self, queue: "asyncio.Queue[Job]") -> None:
+        while True:
+            job = await queue.get()
+            metrics.JOB_QUEUE_DEPTH.set(queue.qsize())
+            job.status = RUNNING
+            try:
+                await asyncio.to_thread(self._save, job)
+                remaining = job.created_at + self.timeout_seconds - self._clock()
+                job.result = await asyncio.wait_for(llm.rephrase(job.text, styles=job.styles), max(remaining, 0))
+                job.status = SUCCEEDED
+            except asyncio.TimeoutError:
+                job.status, job.error = FAILED, "Job timed out"
+            except llm.LLMOverloadedError:
+                job.status, job.error = FAILED, "Service is busy"
+            except llm.LLMError:
+                # Don't leak internal details
+                job.status, job.error = FAILED, "LLM call failed"
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                job.status, job.error = FAILED, "Job failed"
+            await self._finish(job)
+
+    async def _finish(self, job: Job) -> None:
+        job.finished_at = self._clock()
+        job.size += sum(len(k.encode("utf-8")) + len(v.encode("utf-8")) for k, v in (job.result or {}).items())
+        try:
+            await asyncio.to_thread(self._save, job)
+        except sqlite3.Error:
+            pass  # Waiters in this process still get the outcome
+        self._running.pop(job.id, None)
+        job._done.set()
+        metrics.JOBS.labels(job.status).inc()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, job: Job) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, text, styles, status, size, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, job.text, json.dumps(job.styles), job.status, job.size, job.created_at),
+            )
+            self._prune(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _save(self, job: Job) -> None:
+        self._save_many([job])
+
+    def _save_many(self, jobs: List[Job]) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, size = ?, finished = ? WHERE id = ?",
+                [
+                    (job.status, json.dumps(job.result) if job.result is not None else None,
+                     job.error, job.size, job.finished_at, job.id)
+                    for job in jobs
+                ],
+            )
+            self._prune(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        row = self._connection().execute(
+            "SELECT text, styles, status, result, error, created, finished FROM jobs "
+            "WHERE id = ? AND (finished > ? OR finished IS NULL AND created > ?)",
+            (job_id, self._clock() - self.ttl_seconds, self._clock() - self.ttl_seconds - self.timeout_seconds),
+        ).fetchone()
+        if row is None:
+            return None
+        text, styles, status, result, error, created, finished = row
+        return Job(
+            text, json.loads(styles) if styles else None, created, id=job_id, status=status,
+            result=json.loads(result) if result is not None else None, error=error, finished_at=finished,
+        )
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        expired = self._clock() - self.ttl_seconds
+        conn.execute("DELETE FROM jobs WHERE finished <= ?", (expired,))
+        # Left behind by a process that died; it would have timed out and expired by now
+        conn.execute("DELETE FROM jobs WHERE finished IS NULL AND created <= ?", (expired - self.timeout_seconds,))
+        entries, total = conn.execute("SELECT entries, bytes FROM totals").fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+        # Only finished jobs are evicted, oldest first; queued ones are bounded by max_pending
+        self.evictions += conn.execute(
+            "DELETE FROM jobs WHERE id IN (SELECT id FROM ("
+            "SELECT id, COUNT(*) OVER w - 1 AS dropped_before, SUM(size) OVER w - size AS freed_before "
+            "FROM jobs WHERE finished IS NOT NULL "
+            "WINDOW w AS (ORDER BY finished, id ROWS UNBOUNDED PRECEDING)"
+            ") WHERE dropped_before < ? OR freed_before < ?)",
+            (entries - self.max_entries, total - self.max_bytes),
+        ).rowcount
+
+
+@lru_cache()
+def get_job_queue() -> JobQueue:
+    """Get the shared job queue, sized from settings."""
+    settings = get_settings()
+    return JobQueue(
+        path=settings.job_store_path,
+        workers=settings.job_workers,
+        max_pending=settings.job_max_pending,
+        max_entries=settings.job_max_entries,
+        max_bytes=settings.job_max_bytes,
+        ttl_seconds=settings.job_ttl_seconds,
+        timeout_seconds=settings.job_timeout_seconds,
+    )
+
+
+if hasattr(os, "register_at_fork"):
+    # Workers, jobs and connections belong to the parent
+    os.register_at_fork(after_in_child=get_job_queue.cache_clear)
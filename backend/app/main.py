@@ -1,18 +1,43 @@
 # Main application entry point
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 
 from app.config import get_settings
+from app.content_filter import get_content_filter
 from app.api.v1 import router as v1_router
-from app.middleware import SecurityHeadersMiddleware
+from app.middleware import SecurityHeadersMiddleware, MetricsMiddleware
+from app import metrics, llm
+from app.jobs import get_job_queue
 
 # Load our configuration
 settings = get_settings()
 
+# Compile the content blocklist now rather than on the first request
+get_content_filter()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connect to the LLM provider and load stored results in the background,
+    # so health checks pass as soon as we're listening, and hang up cleanly
+    # on shutdown after stopping the job workers
+    warm_up = app.state.warm_up = asyncio.create_task(llm.open_connections())
+    warm_cache = app.state.warm_cache = asyncio.create_task(llm.load_stored_results())
+    yield
+    warm_up.cancel()
+    warm_cache.cancel()
+    await asyncio.gather(warm_up, warm_cache, return_exceptions=True)
+    if get_job_queue.cache_info().currsize:  # Don't open the job store just to close it
+        await get_job_queue().aclose()
+    await llm.close_connections()
+
 # Set up the main app
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.title,
     description=settings.description,
     version=settings.version,
@@ -37,7 +62,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request latency includes all the middleware above
+app.add_middleware(MetricsMiddleware)
+
 # Set up our API endpoints
 app.include_router(v1_router, prefix="/api")
 
-
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus metrics for this process."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
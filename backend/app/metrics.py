@@ -0,0 +1,278 @@
+# Prometheus metrics
+#
+# A small in-process registry that renders the Prometheus text format.
+# Updates are plain attribute arithmetic on the event loop thread, so
+# recording a metric never takes a lock.
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from fast cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROCESS_START = time.time()
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self.labels()  # So unlabelled metrics show up as zero before first use
+        _registry.append(self)
+
+    def labels(self, *values: str):
+        """Return the child for one combination of label values."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _default(self):
+        # Metrics without labels behave like their only child
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def _render_child(self, values, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+def _reset_after_fork() -> None:
+    # Each worker reports its own numbers, not a copy of its parent's
+    global PROCESS_START
+    PROCESS_START = time.time()
+    for metric in _registry:
+        metric._children.clear()
+        if not metric.labelnames:
+            metric.labels()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    UPTIME.set(time.time() - PROCESS_START)
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# HTTP layer
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total", "Requests rejected by the rate limiter.", ("endpoint",)
+)
+
+# Upstream LLM calls
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "llm_upstream_request_duration_seconds",
+    "Latency of chat completion calls to the LLM provider.",
+    ("operation", "outcome"),
+)
+UPSTREAM_REQUESTS_IN_FLIGHT = Gauge(
+    "llm_upstream_requests_in_flight", "Chat completion calls currently in flight."
+)
+UPSTREAM_QUEUE_DEPTH = Gauge(
+    "llm_upstream_queue_depth", "Calls waiting for an upstream slot."
+)
+UPSTREAM_SHED = Counter(
+    "llm_upstream_shed_total", "Calls rejected because the upstream queue was too long."
+)
+UPSTREAM_HEDGES = Counter(
+    "llm_upstream_hedges_total", "Hedge calls fired, and how many finished first.", ("event",)
+)
+UPSTREAM_FAILOVERS = Counter(
+    "llm_upstream_failovers_total", "Calls moved on to another backend after one failed.", ("backend",)
+)
+UPSTREAM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens reported in the provider's usage field.", ("kind",)
+)
+
+# Streaming
+STREAM_TIME_TO_FIRST_CHUNK = Histogram(
+    "rephrase_stream_time_to_first_chunk_seconds",
+    "Time from starting a streamed rephrase to its first content chunk.",
+)
+STREAM_DURATION = Histogram(
+    "rephrase_stream_duration_seconds", "Total duration of streamed rephrases."
+)
+STREAM_ABORTS = Counter(
+    "rephrase_stream_aborts_total", "Streamed rephrases stopped early because the client went away."
+)
+STREAM_TOKENS_SAVED = Counter(
+    "rephrase_stream_tokens_saved_total",
+    "Estimated output tokens not generated thanks to aborted streams (max_tokens less tokens already streamed).",
+)
+
+# Background jobs
+JOBS = Counter(
+    "rephrase_jobs_total", "Rephrase jobs by how they ended (succeeded, failed or rejected).", ("status",)
+)
+JOB_QUEUE_DEPTH = Gauge("rephrase_jobs_queue_depth", "Jobs waiting for a worker.")
+
+UPTIME = Gauge("process_uptime_seconds", "Seconds since the process started.")
+
+
+def record_usage(usage) -> None:
+    """Count prompt and completion tokens from a response's usage field."""
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if isinstance(prompt_tokens, int):
+        UPSTREAM_TOKENS.labels("prompt").inc(prompt_tokens)
+    if isinstance(completion_tokens, int):
+        UPSTREAM_TOKENS.labels("completion").inc(completion_tokens)
+
+
+@contextmanager
+def track_upstream(operation: str) -> Iterator[None]:
+    """Time one upstream LLM call and count it as in flight while it runs."""
+    UPSTREAM_REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        UPSTREAM_REQUESTS_IN_FLIGHT.dec()
+        UPSTREAM_REQUEST_DURATION.labels(operation, outcome).observe(time.perf_counter() - start)
+
+
+def requests_served() -> int:
+    """HTTP requests this process has finished."""
+    return sum(HTTP_REQUEST_DURATION.labels(*values).count for values in list(HTTP_REQUEST_DURATION._children))
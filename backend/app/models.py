@@ -1,9 +1,23 @@
 # Data models and validation
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import List, Literal, Optional
+from app.content_filter import get_content_filter
+
+Style = Literal["professional", "casual", "polite", "social_media"]
+
+def _dedupe_styles(v: Optional[List[str]]) -> Optional[List[str]]:
+    return list(dict.fromkeys(v)) if v is not None else None
 
 class RephraseIn(BaseModel):
     text: str = Field(..., min_length=1, max_length=5000, description="Text to rephrase")
+    styles: Optional[List[Style]] = Field(
+        default=None, min_length=1, description="Styles to generate (all four if omitted)"
+    )
+    
+    @field_validator('styles')
+    @classmethod
+    def validate_styles(cls, v):
+        return _dedupe_styles(v)
     
     @field_validator('text')
     @classmethod
@@ -11,18 +25,43 @@ class RephraseIn(BaseModel):
         if not v or not v.strip():
             raise ValueError("Text cannot be empty")
         
-        # Simple content filtering - can be expanded
-        inappropriate_words = ['spam', 'malware', 'hack']  # Add more as needed
-        if any(word in v.lower() for word in inappropriate_words):
+        # Whole-word match against the blocklist, in one pass over the text
+        if get_content_filter().contains_blocked(v):
             raise ValueError("Text contains inappropriate content")
         
         return v.strip()
 
 class RephraseOut(BaseModel):
-    professional: str
-    casual: str
-    polite: str
-    social_media: str
+    """One field per requested style; styles that weren't asked for are left out."""
+    professional: Optional[str] = None
+    casual: Optional[str] = None
+    polite: Optional[str] = None
+    social_media: Optional[str] = None
+
+class RephraseBatchIn(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=100, description="Texts to rephrase")
+    styles: Optional[List[Style]] = Field(
+        default=None, min_length=1, description="Styles to generate for every text (all four if omitted)"
+    )
+    
+    @field_validator('styles')
+    @classmethod
+    def validate_styles(cls, v):
+        return _dedupe_styles(v)
+
+class RephraseBatchItem(BaseModel):
+    index: int
+    result: Optional[RephraseOut] = None
+    error: Optional[str] = None
+
+class RephraseBatchOut(BaseModel):
+    results: List[RephraseBatchItem]
+
+class JobOut(BaseModel):
+    id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    result: Optional[RephraseOut] = None
+    error: Optional[str] = None
 
 class HealthResponse(BaseModel):
     status: str
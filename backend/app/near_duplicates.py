@@ -0,0 +1,184 @@
+# Near-duplicate lookup: reuse a cached result for almost the same text
+"""
+Texts are canonicalized (Unicode NFKC, case-folded, punctuation and
+whitespace dropped) and turned into a set of word shingles, single words
+plus word pairs. A MinHash signature of that set estimates the Jaccard
+similarity between two texts; locality-sensitive hashing over bands of
+the signature finds the candidates without comparing against every entry.
+
+Signatures use one-permutation hashing (each shingle is hashed once and
+lands in one of 64 bins, empty bins borrow from their neighbour) and keep
+the lowest 8 bits of each bin's minimum (b-bit MinHash), so an entry costs
+64 bytes plus its bucket slots.
+"""
+import hashlib
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from app.config import get_settings
+
+NUM_PERM = 64
+BANDS, ROWS = 8, 4  # A pair at 0.8 similarity shares a band 98.5% of the time
+
+_BIN_BITS = NUM_PERM.bit_length() - 1
+_EMPTY = 1 << 64  # Above any bin value, so an empty bin takes the first one
+_WORD = re.compile(r"\w+(?:'\w+)*")
+
+
+def canonicalize(text: str) -> str:
+    """Reduce a text to lower-case words separated by single spaces."""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("’", "'")
+    return " ".join(_WORD.findall(text))
+
+
+def shingles(canonical: str) -> Set[str]:
+    words = canonical.split()
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def signature(text: str) -> Optional[bytes]:
+    """The b-bit MinHash signature of a text, or None if it has no words."""
+    mins = [_EMPTY] * NUM_PERM
+    for shingle in shingles(canonicalize(text)):
+        # Not hash(): signatures should be the same in every process
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        slot, value = h & (NUM_PERM - 1), h >> _BIN_BITS
+        if value < mins[slot]:
+            mins[slot] = value
+    filled = [i for i, value in enumerate(mins) if value != _EMPTY]
+    if not filled:
+        return None
+    # Densify: an empty bin takes the next filled bin's minimum, offset by the distance
+    out = bytearray(NUM_PERM)
+    nxt = filled[0] + NUM_PERM
+    for i in range(NUM_PERM - 1, -1, -1):
+        if mins[i] != _EMPTY:
+            nxt = i
+        out[i] = (mins[nxt % NUM_PERM] + (nxt - i) * 0x9E37) & 0xFF
+    return bytes(out)
+
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    matches = sum(x == y for x, y in zip(a, b)) / NUM_PERM
+    # Unrelated minimums still agree on their low 8 bits 1 time in 256
+    return max(0.0, (matches - 1 / 256) / (1 - 1 / 256))
+
+
+class NearDuplicateIndex:
+    """Maps texts to the cache keys of earlier, similar enough texts.
+
+    Only texts asking for the same styles are matched. Holds up to
+    ``max_entries`` keys, dropping the least recently used.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 100_000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # cache key -> (styles, signature), least recently used first
+        self._entries: Dict[str, Tuple[Tuple[str, ...], bytes]] = {}
+        # styles -> {band number and value: cache key, or a list of them if several}
+        self._buckets: Dict[Tuple[str, ...], Dict[int, Union[str, List[str]]]] = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, text: str, styles: Iterable[str], key: str) -> None:
+        """Remember that ``key`` holds the result for ``text`` in ``styles``."""
+        sig = signature(text)
+        if sig is not None:
+            self._add(sig, tuple(styles), key)
+
+    def find(self, text: str, styles: Iterable[str]) -> Optional[str]:
+        """Return the key of the most similar earlier text, if any is similar enough."""
+        self.lookups += 1
+        sig = signature(text)
+        if sig is None:
+            return None
+        key = self._find(sig, tuple(styles))
+        if key is not None:
+            self.hits += 1
+        return key
+
+    def discard(self, key: str) -> None:
+        """Forget a key, e.g. once its cache entry has gone."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        styles, sig = entry
+        buckets = self._buckets[styles]
+        for band in self._band_keys(sig):
+            bucket = buckets[band]
+            if isinstance(bucket, str):
+                del buckets[band]
+            else:
+                bucket.remove(key)
+                if len(bucket) == 1:
+                    buckets[band] = bucket[0]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_ratio": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+    def _add(self, sig: bytes, styles: Tuple[str, ...], key: str) -> None:
+        if key in self._entries:
+            self._entries[key] = self._entries.pop(key)
+            return
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (styles, sig)
+        buckets = self._buckets.setdefault(styles, {})
+        # Most buckets hold one key; only collisions pay for a list
+        for band in self._band_keys(sig):
+            bucket = buckets.get(band)
+            if bucket is None:
+                buckets[band] = key
+            elif isinstance(bucket, str):
+                buckets[band] = [bucket, key]
+            else:
+                bucket.append(key)
+        while len(self._entries) > self.max_entries:
+            self.discard(next(iter(self._entries)))
+
+    def _find(self, sig: bytes, styles: Tuple[str, ...]) -> Optional[str]:
+        buckets = self._buckets.get(styles)
+        if buckets is None:
+            return None
+        best, best_score = None, self.threshold
+        seen = set()
+        for band in self._band_keys(sig):
+            bucket = buckets.get(band, ())
+            for key in (bucket,) if isinstance(bucket, str) else bucket:
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = similarity(sig, self._entries[key][1])
+                if score >= best_score:
+                    best, best_score = key, score
+        if best is not None:
+            self._entries[best] = self._entries.pop(best)
+        return best
+
+    @staticmethod
+    def _band_keys(sig: bytes) -> List[int]:
+        return [band << 32 | int.from_bytes(sig[band * ROWS:(band + 1) * ROWS], "big") for band in range(BANDS)]
+
+
+@lru_cache()
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """Get the shared near-duplicate index, sized from settings."""
+    settings = get_settings()
+    return NearDuplicateIndex(
+        threshold=settings.near_duplicate_threshold,
+        max_entries=settings.near_duplicate_max_entries,
+    )
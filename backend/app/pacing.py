@@ -0,0 +1,171 @@
+# Client-side pacing against the provider's rate limit headers
+import asyncio
+import re
+import time
+from typing import Callable, Dict, Mapping, Optional
+
+# OpenAI reports reset times as Go-style durations, e.g. "1s", "6m0s", "20ms"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse a duration like "6m0s" or "120ms" into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(n + unit for n, unit in parts) != value:
+        try:
+            return float(value)  # Plain seconds
+        except ValueError:
+            return None
+    return sum(float(n) * _UNIT_SECONDS[unit] for n, unit in parts)
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class QuotaExhausted(Exception):
+    """Raised for a call that would certainly be rejected by the provider."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Provider quota exhausted, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class _Budget:
+    """What's left of one provider limit (requests or tokens) until it resets."""
+
+    __slots__ = ("limit", "remaining", "reset_at")
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+
+    def update(self, limit: Optional[int], remaining: Optional[int],
+               reset_in: Optional[float], now: float) -> None:
+        if limit is not None:
+            self.limit = limit
+        if remaining is not None:
+            self.remaining = remaining
+            self.reset_at = now + reset_in if reset_in is not None else None
+
+    def delay(self, need: int, now: float, low_water: float) -> float:
+        """Seconds to wait before spending ``need`` from this budget."""
+        if self.remaining is None:
+            return 0.0  # Nothing reported yet
+        if self.reset_at is not None and now >= self.reset_at:
+            # The window has reset; carry over anything reserved past the old limit
+            if self.limit is None:
+                self.remaining = None
+                return 0.0
+            self.remaining = self.limit + min(self.remaining, 0)
+            self.reset_at = None
+        if self.reset_at is None:
+            return 0.0  # Don't know when it resets, let the provider decide
+        reset_in = self.reset_at - now
+        if self.remaining < need:
+            return reset_in
+        if self.limit and self.remaining < self.limit * low_water:
+            # Running low: spread what's left over the rest of the window
+            return reset_in / (self.remaining / need + 1)
+        return 0.0
+
+
+class RateLimitPacer:
+    """Paces outgoing calls using the provider's x-ratelimit-* headers.
+
+    Every response updates the remaining request and token budgets, and
+    each call reserves from them locally until the next response arrives.
+    A call waits briefly when a budget runs low, and is rejected with
+    QuotaExhausted when it would have to wait longer than ``max_wait`` for
+    the budget to reset. With no headers seen, calls are never delayed.
+    """
+
+    def __init__(self, max_wait: float = 2.0, low_water: float = 0.1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_wait = max_wait
+        self.low_water = low_water
+        self._clock = clock
+        self._requests = _Budget()
+        self._tokens = _Budget()
+        self._blocked_until = 0.0
+        self.paced = 0
+        self.rejected = 0
+
+    def update(self, headers: Mapping[str, str], status_code: int = 200) -> None:
+        """Record the limits reported on a provider response."""
+        now = self._clock()
+        self._requests.update(
+            _parse_int(headers.get("x-ratelimit-limit-requests")),
+            _parse_int(headers.get("x-ratelimit-remaining-requests")),
+            parse_duration(headers.get("x-ratelimit-reset-requests")),
+            now,
+        )
+        self._tokens.update(
+            _parse_int(headers.get("x-ratelimit-limit-tokens")),
+            _parse_int(headers.get("x-ratelimit-remaining-tokens")),
+            parse_duration(headers.get("x-ratelimit-reset-tokens")),
+            now,
+        )
+        if status_code == 429:
+            retry_after_ms = _parse_int(headers.get("retry-after-ms"))
+            if retry_after_ms is not None:
+                retry_after = retry_after_ms / 1000
+            else:
+                retry_after = parse_duration(headers.get("retry-after")) or 1.0
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def check(self, tokens: int = 1) -> float:
+        """Return the wait a call would need, raising QuotaExhausted if it's too long."""
+        now = self._clock()
+        delay = max(
+            self._blocked_until - now,
+            self._requests.delay(1, now, self.low_water),
+            self._tokens.delay(tokens, now, self.low_water),
+        )
+        if self._tokens.limit is not None and tokens > self._tokens.limit:
+            delay = float("inf")  # Can never fit in one window
+        if delay > self.max_wait:
+            self.rejected += 1
+            raise QuotaExhausted(retry_after=delay if delay != float("inf") else 60.0)
+        return delay
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request and ``tokens`` tokens; return how long to wait first."""
+        delay = self.check(tokens)
+        if self._requests.remaining is not None:
+            self._requests.remaining -= 1
+        if self._tokens.remaining is not None:
+            self._tokens.remaining -= tokens
+        if delay > 0:
+            self.paced += 1
+        return max(delay, 0.0)
+
+    async def acquire(self, tokens: int) -> None:
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def retry_after(self) -> float:
+        """Seconds until the provider is expected to accept calls again."""
+        now = self._clock()
+        waits = [self._blocked_until - now]
+        for budget in (self._requests, self._tokens):
+            if budget.remaining is not None and budget.remaining <= 0 and budget.reset_at is not None:
+                waits.append(budget.reset_at - now)
+        return max(1.0, *waits)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        return {
+            "remaining_requests": self._requests.remaining,
+            "remaining_tokens": self._tokens.remaining,
+            "paced": self.paced,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,291 @@
+# Disk-backed store for LLM results, so they survive restarts
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.cache import ResponseCache
+from app.config import get_settings
+
+
+class ResultStore:
+    """Rephrase results in a SQLite file, keyed like the response cache.
+
+    The file is in WAL mode so readers don't wait for writers, and every
+    worker on the host can share it. Calls run in a thread to keep the
+    event loop free. A trigger keeps the total size of the stored results
+    up to date; once it passes ``max_bytes``, expired and then least
+    recently read entries are deleted down to ``low_water`` of the budget
+    and the freed pages are given back to the filesystem.
+
+    Reads are plain SELECTs, so they don't queue for the write lock; the
+    read counts and times they record are kept in memory and written in one
+    batch every ``flush_interval`` seconds, or sooner when the store is
+    written, compacted or ranked anyway.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 30 * 24 * 3600,
+        low_water: float = 0.8,
+        flush_interval: float = 5.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        # Wall clock time, since entries outlive the process
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.low_water = low_water
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._local = threading.local()
+        # Reads not yet written back: key -> (last read, read count)
+        self._reads: Dict[str, Tuple[float, int]] = {}
+        self._reads_lock = threading.Lock()
+        self._flushed_at = clock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.compactions = 0
+        self.errors = 0
+
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        try:
+            # Must be set before the first table exists to take effect
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            # In one transaction, so workers starting together don't both seed results_size
+            conn.executescript(
+                """
+                BEGIN IMMEDIATE;
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,
+                    created REAL NOT NULL, accessed REAL NOT NULL, reads INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+                CREATE TABLE IF NOT EXISTS results_size (total INTEGER NOT NULL);
+                INSERT INTO results_size SELECT COALESCE(SUM(size), 0) FROM results
+                    WHERE NOT EXISTS (SELECT 1 FROM results_size);
+                CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results
+                    BEGIN UPDATE results_size SET total = total + new.size; END;
+                CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results
+                    BEGIN UPDATE results_size SET total = total - old.size; END;
+                CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results
+                    BEGIN UPDATE results_size SET total = total - old.size + new.size; END;
+                COMMIT;
+                """
+            )
+        finally:
+            conn.close()
+
+    def after_fork(self) -> None:
+        # SQLite connections must not be used across a fork; abandon the parent's
+        self._local = threading.local()
+        self._reads = {}
+        self._reads_lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Dict[str, str]]:
+        """Return the stored result for a cache key, or None.
+
+        A store that can't be read counts as a miss rather than failing the request.
+        """
+        try:
+            value = await asyncio.to_thread(self._get, key)
+        except sqlite3.Error:
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict[str, str]) -> None:
+        """Store a result, compacting the file if it's over budget. Errors are counted, not raised."""
+        try:
+            await asyncio.to_thread(self._set, key, value)
+        except sqlite3.Error:
+            self.errors += 1
+            return
+        self.writes += 1
+
+    async def hottest(self, limit: int) -> List[Tuple[str, Dict[str, str]]]:
+        """The ``limit`` most read unexpired entries, least read first; none if the store can't be read."""
+        try:
+            return await asyncio.to_thread(self._hottest, limit)
+        except sqlite3.Error:
+            self.errors += 1
+            return []
+
+    async def compact(self) -> int:
+        """Trim the store to its low-water mark now; returns the entries deleted."""
+        return await asyncio.to_thread(self._compact, True)
+
+    def stats(self) -> Dict[str, float]:
+        conn = self._connection()
+        entries = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": self._total(conn),
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "compactions": self.compactions,
+            "errors": self.errors,
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _total(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT total FROM results_size").fetchone()[0]
+
+    def _get(self, key: str) -> Optional[Dict[str, str]]:
+        conn = self._connection()
+        now = self._clock()
+        row = conn.execute(
+            "SELECT value FROM results WHERE key = ? AND created > ?", (key, now - self.ttl_seconds)
+        ).fetchone()
+        if row is None:
+            return None
+        with self._reads_lock:
+            _, reads = self._reads.get(key, (now, 0))
+            self._reads[key] = (now, reads + 1)
+        if now - self._flushed_at >= self.flush_interval:
+            self._flush_reads()
+        return json.loads(row[0])
+
+    def _flush_reads(self) -> None:
+        with self._reads_lock:
+            pending, self._reads = self._reads, {}
+            self._flushed_at = self._clock()
+        if not pending:
+            return
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "UPDATE results SET accessed = max(accessed, ?), reads = reads + ? WHERE key = ?",
+                    [(accessed, reads, key) for key, (accessed, reads) in pending.items()],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            self.errors += 1  # Only recency is lost; the entries themselves are fine
+
+    def _set(self, key: str, value: Dict[str, str]) -> None:
+        conn = self._connection()
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(key) + len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return  # Would never fit, don't flush the whole store for it
+        self._flush_reads()
+        now = self._clock()
+        conn.execute(
+            "INSERT INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "created = excluded.created, accessed = excluded.accessed",
+            (key, data, size, now, now),
+        )
+        self._compact(False)
+
+    def _hottest(self, limit: int) -> List[Tuple[str, Dict[str, str]]]:
+        self._flush_reads()
+        rows = self._connection().execute(
+            "SELECT key, value FROM results WHERE created > ? "
+            "ORDER BY reads DESC, accessed DESC LIMIT ?",
+            (self._clock() - self.ttl_seconds, limit),
+        ).fetchall()
+        return [(key, json.loads(value)) for key, value in reversed(rows)]
+
+    def _compact(self, force: bool) -> int:
+        conn = self._connection()
+        if not force and self._total(conn) <= self.max_bytes:
+            return 0
+        if force:
+            self._flush_reads()  # _set has just done it otherwise
+        target = int(self.max_bytes * self.low_water)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = conn.execute(
+                "DELETE FROM results WHERE created <= ?", (self._clock() - self.ttl_seconds,)
+            ).rowcount
+            # Least recently read first, until the running total is under target
+            excess = self._total(conn) - target
+            if excess > 0:
+                deleted += conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM ("
+                    "SELECT key, SUM(size) OVER (ORDER BY accessed, key) - size AS freed_before "
+                    "FROM results) WHERE freed_before < ?)",
+                    (excess,),
+                ).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.compactions += 1
+        return deleted
+
+
+async def warm_cache(store: ResultStore, cache: ResponseCache, limit: int) -> int:
+    """Load the most read stored results into the response cache; returns how many."""
+    if limit <= 0 or cache.max_entries <= 0:
+        return 0
+    rows = await store.hottest(min(limit, cache.max_entries))
+    # Hottest last, so they're the last to be evicted
+    for key, value in rows:
+        cache.set(key, value)
+    return len(rows)
+
+
+@lru_cache()
+def get_result_store() -> Optional[ResultStore]:
+    """Get the shared result store, or None if it's disabled."""
+    settings = get_settings()
+    if not settings.result_store_enabled:
+        return None
+    return ResultStore(
+        path=settings.result_store_path,
+        max_bytes=settings.result_store_max_bytes,
+        ttl_seconds=settings.result_store_ttl_seconds,
+    )
+
+
+async def open_result_store() -> Optional[ResultStore]:
+    """``get_result_store()`` off the event loop, since opening it creates its
+    tables. None if it's disabled or can't be opened, so callers carry on without it."""
+    try:
+        return await asyncio.to_thread(get_result_store)
+    except sqlite3.Error:
+        return None
+
+
+def _reset_after_fork() -> None:
+    if get_result_store.cache_info().currsize:
+        store = get_result_store()
+        if store is not None:
+            store.after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,56 +1,214 @@
 # Security utilities and rate limiting
+import os
 import time
 import asyncio
-from collections import defaultdict
-from typing import Dict
+import sqlite3
+import threading
+from typing import Callable, Dict, Tuple
 from fastapi import Request
+from app.config import get_settings
+
+class _Buckets:
+    """Token buckets for one client: one per minute window, one per hour window."""
+    __slots__ = ("minute_tokens", "hour_tokens", "updated")
+    
+    def __init__(self, minute_tokens: float, hour_tokens: float, updated: float):
+        self.minute_tokens = minute_tokens
+        self.hour_tokens = hour_tokens
+        self.updated = updated
 
 class RateLimiter:
-    def __init__(self, requests_per_minute: int = 60, requests_per_hour: int = 1000):
+    """Per-client token bucket limiter with O(1) work and memory per client.
+    
+    Each client gets a bucket holding ``requests_per_minute`` tokens that
+    refills over a minute, and one holding ``requests_per_hour`` tokens that
+    refills over an hour. Clients idle long enough for both buckets to be
+    full again are indistinguishable from new ones, so they are evicted.
+    
+    ``is_allowed`` never awaits, so it runs atomically on the event loop and
+    needs no lock.
+    """
+    
+    def __init__(
+        self,
+        requests_per_minute: int = 60,
+        requests_per_hour: int = 1000,
+        sweep_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
         self.requests_per_minute = requests_per_minute
         self.requests_per_hour = requests_per_hour
-        self.minute_requests: Dict[str, list] = defaultdict(list)
-        self.hour_requests: Dict[str, list] = defaultdict(list)
-        self._lock = asyncio.Lock()
+        self._minute_rate = requests_per_minute / 60
+        self._hour_rate = requests_per_hour / 3600
+        # After this long without requests both buckets are full again
+        self.idle_ttl = 3600.0
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._clients: Dict[str, _Buckets] = {}
+        self._next_sweep = clock() + sweep_interval
+    
+    def __len__(self) -> int:
+        return len(self._clients)
+    
+    def after_fork(self) -> None:
+        """Called in a forked child; in-memory buckets are simply per process."""
+    
+    async def is_allowed(self, client_ip: str, cost: int = 1) -> bool:
+        """Check if the client IP is allowed to make a request.
+        
+        ``cost`` is how many requests this call counts as, e.g. for batches.
+        """
+        now = self._clock()
+        if now >= self._next_sweep:
+            self._evict_idle(now)
+        
+        buckets = self._clients.get(client_ip)
+        if buckets is None:
+            buckets = _Buckets(self.requests_per_minute, self.requests_per_hour, now)
+            self._clients[client_ip] = buckets
+        else:
+            buckets.minute_tokens, buckets.hour_tokens = self._refill(
+                buckets.minute_tokens, buckets.hour_tokens, now - buckets.updated
+            )
+            buckets.updated = now
+        
+        if buckets.minute_tokens < cost or buckets.hour_tokens < cost:
+            return False
+        
+        buckets.minute_tokens -= cost
+        buckets.hour_tokens -= cost
+        return True
+    
+    def _refill(self, minute_tokens: float, hour_tokens: float, elapsed: float) -> Tuple[float, float]:
+        """Add the tokens earned over ``elapsed`` seconds, capped at the bucket sizes."""
+        return (
+            min(self.requests_per_minute, minute_tokens + elapsed * self._minute_rate),
+            min(self.requests_per_hour, hour_tokens + elapsed * self._hour_rate),
+        )
     
-    async def is_allowed(self, client_ip: str) -> bool:
+    def _evict_idle(self, now: float):
+        """Forget clients that haven't made a request within the idle TTL."""
+        cutoff = now - self.idle_ttl
+        idle = [ip for ip, buckets in self._clients.items() if buckets.updated <= cutoff]
+        for ip in idle:
+            del self._clients[ip]
+        self._next_sweep = now + self.sweep_interval
+
+class SharedRateLimiter(RateLimiter):
+    """Token bucket limiter whose buckets live in a SQLite file.
+    
+    Every uvicorn worker on the host opens the same file, so the limits
+    hold across processes instead of multiplying by the worker count.
+    Each check is one short ``BEGIN IMMEDIATE`` transaction run in a
+    thread, keeping the event loop free while SQLite takes its lock.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        requests_per_minute: int = 60,
+        requests_per_hour: int = 1000,
+        sweep_interval: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        # Wall clock time, since monotonic clocks aren't comparable across processes
+        super().__init__(requests_per_minute, requests_per_hour, sweep_interval, clock)
+        self.path = path
+        self._local = threading.local()
+        
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "client TEXT PRIMARY KEY, minute_tokens REAL NOT NULL, "
+                "hour_tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS rate_limit_buckets_updated "
+                "ON rate_limit_buckets (updated)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM rate_limit_buckets").fetchone()[0]
+    
+    def after_fork(self) -> None:
+        # SQLite connections must not be used across a fork; abandon the parent's
+        self._local = threading.local()
+    
+    async def is_allowed(self, client_ip: str, cost: int = 1) -> bool:
         """Check if the client IP is allowed to make a request."""
-        async with self._lock:
-            current_time = time.time()
-            
-            # Clean old entries
-            self._clean_old_entries(client_ip, current_time)
+        return await asyncio.to_thread(self._check, client_ip, cost)
+    
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _check(self, client_ip: str, cost: int) -> bool:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = self._clock()
+            row = conn.execute(
+                "SELECT minute_tokens, hour_tokens, updated FROM rate_limit_buckets WHERE client = ?",
+                (client_ip,),
+            ).fetchone()
+            if row is None:
+                minute_tokens, hour_tokens = float(self.requests_per_minute), float(self.requests_per_hour)
+            else:
+                minute_tokens, hour_tokens = self._refill(row[0], row[1], max(0.0, now - row[2]))
             
-            # Check minute limit
-            if len(self.minute_requests[client_ip]) >= self.requests_per_minute:
-                return False
+            allowed = minute_tokens >= cost and hour_tokens >= cost
+            if allowed:
+                minute_tokens -= cost
+                hour_tokens -= cost
             
-            # Check hour limit
-            if len(self.hour_requests[client_ip]) >= self.requests_per_hour:
-                return False
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (client, minute_tokens, hour_tokens, updated) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT(client) DO UPDATE SET "
+                "minute_tokens = excluded.minute_tokens, hour_tokens = excluded.hour_tokens, "
+                "updated = excluded.updated",
+                (client_ip, minute_tokens, hour_tokens, now),
+            )
             
-            # Add current request
-            self.minute_requests[client_ip].append(current_time)
-            self.hour_requests[client_ip].append(current_time)
+            if now >= self._next_sweep:
+                conn.execute(
+                    "DELETE FROM rate_limit_buckets WHERE updated <= ?", (now - self.idle_ttl,)
+                )
+                self._next_sweep = now + self.sweep_interval
             
-            return True
-    
-    def _clean_old_entries(self, client_ip: str, current_time: float):
-        """Remove old entries from the rate limiting windows."""
-        # Clean minute window (60 seconds)
-        self.minute_requests[client_ip] = [
-            req_time for req_time in self.minute_requests[client_ip]
-            if current_time - req_time < 60
-        ]
-        
-        # Clean hour window (3600 seconds)
-        self.hour_requests[client_ip] = [
-            req_time for req_time in self.hour_requests[client_ip]
-            if current_time - req_time < 3600
-        ]
+            conn.execute("COMMIT")
+            return allowed
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+def create_rate_limiter(settings) -> RateLimiter:
+    """Build the rate limiter for the configured backend."""
+    if settings.rate_limit_backend == "sqlite":
+        return SharedRateLimiter(
+            path=settings.rate_limit_db_path,
+            requests_per_minute=settings.rate_limit_per_minute,
+            requests_per_hour=settings.rate_limit_per_hour,
+        )
+    return RateLimiter(
+        requests_per_minute=settings.rate_limit_per_minute,
+        requests_per_hour=settings.rate_limit_per_hour,
+    )
+
+# Global rate limiter instance using the configured limits and backend
+rate_limiter = create_rate_limiter(get_settings())
 
-# Global rate limiter instance with default values
-rate_limiter = RateLimiter()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: rate_limiter.after_fork())
 
 def get_client_ip(request: Request) -> str:
     """Extract client IP address from request, handling proxies."""
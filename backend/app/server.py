@@ -0,0 +1,59 @@
+# Production launcher: uvicorn with one worker process per CPU
+"""
+Runs app.main:app under uvicorn with several worker processes, each
+replaced after serving WORKER_MAX_REQUESTS requests.
+
+Usage: python -m app.server [--host 0.0.0.0] [--port 8000] [--workers N] [--max-requests N]
+
+With more than one worker, RATE_LIMIT_BACKEND defaults to sqlite so the
+rate limits hold across workers. Each worker still has its own in-memory
+caches, upstream queue and resumable streams, so a Last-Event-ID reconnect
+that lands on another worker starts a new generation.
+"""
+import argparse
+import os
+from typing import List, Optional
+
+from app.config import get_settings
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on, respecting affinity masks (e.g. container cpusets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS or Windows
+        return os.cpu_count() or 1
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.web_workers or available_cpus(),
+                        help="Worker processes (default: WEB_WORKERS, or one per available CPU)")
+    parser.add_argument("--max-requests", type=int, default=settings.worker_max_requests,
+                        help="Replace a worker after this many requests, 0 for never")
+    args = parser.parse_args(argv)
+
+    # Workers read these back to report them in /api/v1/status
+    os.environ["WEB_WORKERS"] = str(args.workers)
+    os.environ["WORKER_MAX_REQUESTS"] = str(args.max_requests)
+    if args.workers > 1:
+        # Per-process limits would let a client through once per worker
+        os.environ.setdefault("RATE_LIMIT_BACKEND", "sqlite")
+
+    import uvicorn
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        # A single worker runs without a supervisor to replace it, so it isn't recycled
+        limit_max_requests=(args.max_requests or None) if args.workers > 1 else None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# Replay buffers for resumable SSE streams
+import asyncio
+import hashlib
+import os
+import secrets
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.config import get_settings
+
+
+def fingerprint(text: str, styles: Optional[Sequence[str]]) -> str:
+    """Identify a request body, so an event ID can't resume someone else's stream."""
+    raw = "\x00".join([text, *(styles or ())])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class StreamSession:
+    """The SSE events of one generation, kept so a dropped client can resume.
+
+    Events are stored already framed with an ``id: <stream id>:<index>``
+    line, which is what clients send back as ``Last-Event-ID``.
+    """
+
+    def __init__(self, stream_id: str, fingerprint: str):
+        self.id = stream_id
+        self.fingerprint = fingerprint
+        self.events: List[str] = []
+        self.nbytes = 0
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._grace: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+
+class StreamRegistry:
+    """Runs generations independently of their clients and buffers their events.
+
+    A generation keeps running for ``grace`` seconds after its last client
+    disconnects, so a reconnect can attach to it; after that it's cancelled,
+    which stops the upstream call and forgets the stream, since it can't be
+    completed any more. Finished streams stay replayable for ``ttl`` seconds. The oldest streams are dropped to stay within
+    ``max_streams`` and ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        max_streams: int = 1000,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl: float = 60.0,
+        grace: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_streams = max_streams
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.grace = grace
+        self._clock = clock
+        self._sessions: "OrderedDict[str, StreamSession]" = OrderedDict()
+        self._bytes = 0
+        self.resumed = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def start(self, events: AsyncGenerator[str, None], fingerprint: str) -> StreamSession:
+        """Start pumping ``events`` into a new session, whether or not anyone listens."""
+        self._prune()
+        session = StreamSession(secrets.token_urlsafe(16), fingerprint)
+        self._sessions[session.id] = session
+        session.task = asyncio.ensure_future(self._pump(session, events))
+        # The pump ends on its own; don't warn about exceptions nobody awaited
+        session.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return session
+
+    def find(self, last_event_id: Optional[str], fingerprint: str) -> Optional[Tuple[StreamSession, int]]:
+        """Look up the session a ``Last-Event-ID`` belongs to, and the index it names.
+
+        Returns None if it's malformed, expired or from a different request.
+        """
+        stream_id, _, index = (last_event_id or "").strip().rpartition(":")
+        session = self._sessions.get(stream_id)
+        if session is None or session.fingerprint != fingerprint or not index.isdigit():
+            return None
+        if session.finished_at is not None and session.finished_at + self.ttl <= self._clock():
+            return None
+        self.resumed += 1
+        return session, int(index)
+
+    async def subscribe(self, session: StreamSession, after: int = -1) -> AsyncGenerator[str, None]:
+        """Yield the session's events after index ``after``, then new ones as they come."""
+        session.subscribers += 1
+        if session._grace is not None:
+            session._grace.cancel()
+            session._grace = None
+        try:
+            index = after + 1
+            while True:
+                while index < len(session.events):
+                    yield session.events[index]
+                    index += 1
+                if session.done:
+                    return
+                session._changed.clear()
+                await session._changed.wait()
+        finally:
+            session.subscribers -= 1
+            if session.subscribers == 0 and not session.done:
+                session._grace = asyncio.get_running_loop().call_later(
+                    self.grace, self._abandon, session
+                )
+
+    def stats(self) -> Dict[str, float]:
+        self._prune()
+        return {
+            "streams": len(self._sessions),
+            "running": sum(1 for s in self._sessions.values() if not s.done),
+            "bytes": self._bytes,
+            "resumed": self.resumed,
+        }
+
+    async def _pump(self, session: StreamSession, events: AsyncGenerator[str, None]) -> None:
+        try:
+            async for event in events:
+                framed = f"id: {session.id}:{len(session.events)}\n{event}"
+                session.events.append(framed)
+                session.nbytes += len(framed)
+                if self._sessions.get(session.id) is session:
+                    self._bytes += len(framed)
+                session._changed.set()
+        finally:
+            session.finished_at = self._clock()
+            session._changed.set()
+            if session._grace is not None:
+                session._grace.cancel()
+                session._grace = None
+            await events.aclose()
+
+    def _abandon(self, session: StreamSession) -> None:
+        """Nobody came back in time: stop the generation, and don't offer a truncated replay."""
+        session._grace = None
+        if session.subscribers == 0 and session.task is not None:
+            session.task.cancel()
+            if self._sessions.get(session.id) is session:
+                self._drop(session)
+
+    def _prune(self) -> None:
+        now = self._clock()
+        for session in list(self._sessions.values()):
+            if session.finished_at is not None and session.finished_at + self.ttl <= now:
+                self._drop(session)
+        # Oldest first; a dropped running stream carries on, it just can't be resumed
+        while self._sessions and (len(self._sessions) >= self.max_streams or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._sessions.values())))
+
+    def _drop(self, session: StreamSession) -> None:
+        del self._sessions[session.id]
+        self._bytes -= session.nbytes
+
+
+@lru_cache()
+def get_stream_registry() -> StreamRegistry:
+    """Get the shared stream registry, sized from settings."""
+    settings = get_settings()
+    return StreamRegistry(
+        max_streams=settings.stream_buffer_max_streams,
+        max_bytes=settings.stream_buffer_max_bytes,
+        ttl=settings.stream_buffer_ttl,
+        grace=settings.stream_resume_grace,
+    )
+
+
+if hasattr(os, "register_at_fork"):
+    # Sessions belong to the parent's event loop
+    os.register_at_fork(after_in_child=get_stream_registry.cache_clear)
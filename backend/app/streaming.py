@@ -0,0 +1,238 @@
+# Incremental parsing of the streamed JSON and SSE formatting
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+STYLE_KEYS = ("professional", "casual", "polite", "social_media")
+
+# (event name, payload) pairs produced by the parser
+StreamEvent = Tuple[str, Dict[str, Any]]
+
+_ESCAPES = {
+    '"': '"', "\\": "\\", "/": "/",
+    "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t",
+}
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+# Parser states
+_START, _KEY, _IN_KEY, _COLON, _VALUE, _IN_STRING, _IN_OTHER, _END = range(8)
+
+
+class StreamParseError(ValueError):
+    pass
+
+
+class StyleStreamParser:
+    """Incremental parser for the model's flat JSON object of styles.
+
+    Feed it raw fragments as they arrive; it returns ``delta`` events with
+    newly decoded text for each tracked style and a ``style_complete``
+    event as soon as a style's string value closes.
+    """
+
+    def __init__(self, styles: Iterable[str] = STYLE_KEYS):
+        self.styles = tuple(styles)
+        self.values: Dict[str, str] = {}
+        self._state = _START
+        self._key: List[str] = []
+        self._value: List[str] = []
+        self._current: Optional[str] = None  # Key whose string value we're reading
+        self._escape: Optional[str] = None  # Pending escape sequence, "\\" or "\\uXXXX"
+        self._high_surrogate: Optional[int] = None
+        self._depth = 0  # Nesting depth when skipping a non-string value
+        self._other_in_string = False
+
+    @property
+    def complete(self) -> bool:
+        return self._state == _END
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        events: List[StreamEvent] = []
+        # Text decoded for the current style during this call, sent as one delta
+        delta: List[str] = []
+        i, n = 0, len(chunk)
+
+        while i < n:
+            state = self._state
+
+            if state == _IN_STRING:
+                if self._escape is not None:
+                    i = self._feed_escape(chunk, i, delta)
+                    continue
+                match = _STRING_SPECIAL.search(chunk, i)
+                end = match.start() if match else n
+                if end > i:
+                    self._append(chunk[i:end], delta)
+                if match is None:
+                    break
+                i = end + 1
+                if match.group() == "\\":
+                    self._escape = "\\"
+                else:
+                    self._close_string(delta, events)
+                continue
+
+            ch = chunk[i]
+            i += 1
+            if state == _IN_KEY:
+                if self._escape is not None:
+                    self._escape = None
+                    self._key.append(_ESCAPES.get(ch, ch))
+                elif ch == "\\":
+                    self._escape = "\\"
+                elif ch == '"':
+                    self._state = _COLON
+                else:
+                    self._key.append(ch)
+            elif state == _IN_OTHER:
+                self._skip_other(ch)
+            elif ch.isspace():
+                continue
+            elif state == _START:
+                if ch != "{":
+                    raise StreamParseError("Expected a JSON object.")
+                self._state = _KEY
+            elif state == _KEY:
+                if ch == '"':
+                    self._key = []
+                    self._state = _IN_KEY
+                elif ch == "}":
+                    self._state = _END
+                elif ch != ",":
+                    raise StreamParseError(f"Unexpected character {ch!r} before key.")
+            elif state == _COLON:
+                if ch != ":":
+                    raise StreamParseError("Expected ':' after key.")
+                self._state = _VALUE
+            elif state == _VALUE:
+                if ch == '"':
+                    key = "".join(self._key)
+                    self._current = key if key in self.styles else None
+                    self._value = []
+                    self._state = _IN_STRING
+                else:
+                    self._state = _IN_OTHER
+                    self._depth = 0
+                    self._other_in_string = False
+                    self._skip_other(ch)
+            elif state == _END:
+                raise StreamParseError("Unexpected data after the JSON object.")
+
+        if delta and self._current is not None:
+            events.append(("delta", {"style": self._current, "text": "".join(delta)}))
+        return events
+
+    def result(self) -> Dict[str, str]:
+        """Return every tracked style, stripped, once the object is complete."""
+        if not self.complete:
+            raise StreamParseError("Stream ended before the JSON object was complete.")
+        return {style: self.values.get(style, "").strip() for style in self.styles}
+
+    def _append(self, text: str, delta: List[str]) -> None:
+        if self._current is not None:
+            self._value.append(text)
+            delta.append(text)
+
+    def _close_string(self, delta: List[str], events: List[StreamEvent]) -> None:
+        self._state = _KEY
+        if self._current is None:
+            return
+        if delta:
+            events.append(("delta", {"style": self._current, "text": "".join(delta)}))
+            delta.clear()
+        value = "".join(self._value)
+        self.values[self._current] = value
+        events.append(("style_complete", {"style": self._current, "text": value.strip()}))
+        self._current = None
+
+    def _feed_escape(self, chunk: str, i: int, delta: List[str]) -> int:
+        """Consume escape sequence characters, which may span chunks."""
+        assert self._escape is not None
+        escape = self._escape + chunk[i]
+        i += 1
+        if escape[1] != "u":
+            self._escape = None
+            self._append(_ESCAPES.get(escape[1], escape[1]), delta)
+            return i
+        if len(escape) < 6:
+            self._escape = escape
+            return i
+
+        self._escape = None
+        code = int(escape[2:], 16)
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return i
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._append(chr(code), delta)
+        return i
+
+    def _skip_other(self, ch: str) -> None:
+        """Skip over a value we don't track (number, bool, array, object)."""
+        if self._other_in_string:
+            if self._escape is not None:
+                self._escape = None
+            elif ch == "\\":
+                self._escape = "\\"
+            elif ch == '"':
+                self._other_in_string = False
+        elif ch == '"':
+            self._other_in_string = True
+        elif ch in "[{":
+            self._depth += 1
+        elif ch in "]}" and self._depth > 0:
+            self._depth -= 1
+        elif self._depth == 0 and ch in ",}":
+            self._state = _END if ch == "}" else _KEY
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# An SSE comment: ignored by clients, but keeps proxies from timing out an idle stream
+HEARTBEAT = ": ping\n\n"
+
+
+async def with_heartbeats(
+    events: AsyncGenerator[str, None],
+    interval: float,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll: float = 1.0,
+) -> AsyncIterator[str]:
+    """Relay SSE ``events``, adding a heartbeat after ``interval`` seconds of silence.
+
+    Checks ``is_disconnected`` after every event and at least every ``poll``
+    seconds while waiting, and closes ``events`` as soon as the client is
+    gone, so an upstream generation isn't read to the end for nobody.
+    """
+    pending: Optional[asyncio.Future] = None
+    last_sent = time.monotonic()
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(events.__anext__())
+            await asyncio.wait({pending}, timeout=min(poll, interval))
+            if await is_disconnected():
+                return
+            if pending.done():
+                done, pending = pending, None
+                try:
+                    event = done.result()
+                except StopAsyncIteration:
+                    return
+                yield event
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= interval:
+                yield HEARTBEAT
+                last_sent = time.monotonic()
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await events.aclose()
@@ -0,0 +1,32 @@
+# Token counting for request budgeting
+import math
+from functools import lru_cache
+from typing import Optional
+
+# Fallback when tiktoken isn't installed: OpenAI's rule of thumb for English.
+# Other scripts (CJK in particular) run closer to a token per character, so
+# non-ASCII characters are counted one each to keep the estimate from running low.
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """Tokenizer for the model, loaded once per model (None without tiktoken)."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Unknown or custom model name, use the tokenizer of current OpenAI models
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count the tokens in text, exactly with tiktoken or estimated without it."""
+    encoding = _encoding(model) if model else None
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    ascii_chars = len(text.encode("ascii", errors="ignore"))
+    return math.ceil(ascii_chars / _CHARS_PER_TOKEN) + len(text) - ascii_chars
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Content filter scan time at 5000-character inputs.
+
+Compares the compiled blocklist (word set plus trie regex for phrases),
+a single trie regex over every term, and the old approach of lowercasing
+the text and running one substring search per term, for blocklists of
+growing size. 5% of the terms are two-word phrases. Inputs contain no
+blocked term, so every scan reads the whole text.
+
+Usage: python -m benchmarks.bench_content_filter [--terms 5000]
+"""
+import argparse
+import random
+import string
+import time
+
+from app.content_filter import CompiledBlocklist, compile_terms
+
+TEXT_LENGTH = 5000
+
+
+def random_words(rng: random.Random, count: int, min_len: int = 4, max_len: int = 12):
+    return [
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(min_len, max_len)))
+        for _ in range(count)
+    ]
+
+
+def make_text(rng: random.Random, blocked: set) -> str:
+    words = []
+    length = 0
+    while length < TEXT_LENGTH:
+        word = random_words(rng, 1, 2, 9)[0]
+        if word not in blocked:
+            words.append(word)
+            length += len(word) + 1
+    return " ".join(words)[:TEXT_LENGTH]
+
+
+def substring_scan(terms):
+    def scan(text):
+        lowered = text.lower()
+        return any(term in lowered for term in terms)
+    return scan
+
+
+def time_scan(scan, texts, rounds: int) -> float:
+    """Mean microseconds per scan."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            scan(text)
+    return (time.perf_counter() - start) / (rounds * len(texts)) * 1e6
+
+
+def main(max_terms: int, rounds: int):
+    rng = random.Random(42)
+    all_terms = random_words(rng, max_terms)
+    for i in range(0, max_terms, 20):
+        all_terms[i] = f"{all_terms[i]} {random_words(rng, 1)[0]}"
+    texts = [make_text(rng, set(all_terms)) for _ in range(20)]
+
+    print(f"{TEXT_LENGTH}-char inputs, {len(texts)} texts x {rounds} rounds\n")
+    print(f"{'terms':>8}{'build ms':>10}{'compiled us':>14}{'trie regex us':>16}{'substring us':>15}")
+    sizes = sorted({3, 100, 1000, max_terms})
+    for size in sizes:
+        terms = all_terms[:size]
+        start = time.perf_counter()
+        blocklist = CompiledBlocklist(terms)
+        build_ms = (time.perf_counter() - start) * 1000
+        compiled_us = time_scan(blocklist.find, texts, rounds)
+        regex_us = time_scan(compile_terms(terms).search, texts, rounds)
+        substring_us = time_scan(substring_scan(terms), texts, max(1, rounds // 10))
+        print(f"{size:>8}{build_ms:>10.1f}{compiled_us:>14.1f}{regex_us:>16.1f}{substring_us:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--terms", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    main(args.terms, args.rounds)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of the security headers middleware.
+
+Compares the old BaseHTTPMiddleware implementation with the pure ASGI one
+on /api/v1/hello and /api/v1/rephrase-stream (with a fake, instant LLM
+stream), relative to an app with no headers middleware at all.
+
+Usage: python -m benchmarks.bench_middleware [--requests 2000]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+from httpx import AsyncClient, ASGITransport
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.api.v1 import endpoints
+from app.api.v1 import router as v1_router
+from app.middleware import SecurityHeadersMiddleware
+from app.security import RateLimiter
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    """The previous implementation, kept here for comparison."""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
+        csp_policy = (
+            "default-src 'self'; "
+            "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+            "style-src 'self' 'unsafe-inline'; "
+            "img-src 'self' data: https:; "
+            "font-src 'self'; "
+            "connect-src 'self' https://api.openai.com; "
+            "frame-ancestors 'none';"
+        )
+        response.headers["Content-Security-Policy"] = csp_policy
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        return response
+
+
+PAYLOAD = json.dumps({
+    "professional": "Let's schedule a meeting to discuss AI.",
+    "casual": "Let's chat about AI!",
+    "polite": "Would you be available to discuss AI?",
+    "social_media": "AI huddle time!",
+})
+
+
+async def fake_rephrase_stream(text, *args, **kwargs):
+    for i in range(0, len(PAYLOAD), 8):
+        yield PAYLOAD[i:i + 8]
+
+
+def build_app(middleware_class=None) -> FastAPI:
+    app = FastAPI()
+    if middleware_class is not None:
+        app.add_middleware(middleware_class)
+    app.include_router(v1_router, prefix="/api")
+    return app
+
+
+async def time_requests(app: FastAPI, method: str, path: str, count: int) -> float:
+    """Return the mean wall time per request in microseconds."""
+    transport = ASGITransport(app=app)
+    body = {"text": "Hey guys, let's huddle about AI"} if method == "POST" else None
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(min(200, count)):
+            await client.request(method, path, json=body)
+        start = time.perf_counter()
+        for _ in range(count):
+            response = await client.request(method, path, json=body)
+            response.raise_for_status()
+        return (time.perf_counter() - start) / count * 1e6
+
+
+async def main(count: int):
+    # Instant fake LLM and no rate limiting so only the middleware differs
+    endpoints.rephrase_stream = fake_rephrase_stream
+    endpoints.rate_limiter = RateLimiter(requests_per_minute=10**9, requests_per_hour=10**9)
+
+    variants = [
+        ("none", build_app()),
+        ("BaseHTTPMiddleware", build_app(LegacySecurityHeadersMiddleware)),
+        ("pure ASGI", build_app(SecurityHeadersMiddleware)),
+    ]
+    routes = [("GET", "/api/v1/hello"), ("POST", "/api/v1/rephrase-stream")]
+
+    print(f"{count} requests per measurement, in-process ASGI transport\n")
+    print(f"{'route':<32}{'middleware':<22}{'us/request':>12}{'overhead us':>14}")
+    for method, path in routes:
+        baseline = None
+        for name, app in variants:
+            mean = await time_requests(app, method, path, count)
+            baseline = mean if baseline is None else baseline
+            print(f"{method + ' ' + path:<32}{name:<22}{mean:>12.1f}{mean - baseline:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().requests))
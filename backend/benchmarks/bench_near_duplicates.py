@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate index lookup time and memory at a million entries.
+
+Fills the index with random signatures (as if from that many distinct
+texts), adds a set of real-looking texts, then times find() for variants
+of those texts (one word changed, different casing and punctuation) and
+for unrelated texts. Lookup times include computing the query's signature.
+
+Usage: python -m benchmarks.bench_near_duplicates [--entries 1000000]
+"""
+import argparse
+import random
+import resource
+import statistics
+import string
+import time
+
+from app.near_duplicates import NUM_PERM, NearDuplicateIndex
+from app.streaming import STYLE_KEYS
+
+SAMPLES = 2000
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9)))
+        for _ in range(words)
+    )
+
+
+def near_variant(rng: random.Random, text: str) -> str:
+    words = text.split()
+    words[rng.randrange(len(words))] = "changed"
+    return " ".join(words).upper() + "!"
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def time_lookups(index: NearDuplicateIndex, texts) -> list:
+    """Microseconds per find()."""
+    out = []
+    for text in texts:
+        start = time.perf_counter()
+        index.find(text, STYLE_KEYS)
+        out.append((time.perf_counter() - start) * 1e6)
+    return out
+
+
+def main(entries: int, words: int):
+    rng = random.Random(42)
+    index = NearDuplicateIndex(max_entries=entries + SAMPLES)
+
+    before = rss_mb()
+    start = time.perf_counter()
+    for i in range(entries):
+        index._add(rng.randbytes(NUM_PERM), STYLE_KEYS, f"{i:064x}")
+    texts = [make_text(rng, words) for _ in range(SAMPLES)]
+    for i, text in enumerate(texts):
+        index.add(text, STYLE_KEYS, f"text-{i}")
+    build = time.perf_counter() - start
+    print(f"{len(index):,} entries built in {build:.1f}s, "
+          f"~{(rss_mb() - before) * 1024 * 1024 / len(index):.0f} bytes per entry")
+
+    hits = time_lookups(index, [near_variant(rng, t) for t in texts])
+    found = index.hits
+    misses = time_lookups(index, [make_text(rng, words) for _ in range(SAMPLES)])
+    for name, values in (("near-duplicate", hits), ("unrelated", misses)):
+        values.sort()
+        print(f"{name:>14} lookups: median {statistics.median(values):.0f}us, "
+              f"p99 {values[int(len(values) * 0.99)]:.0f}us")
+    print(f"near-duplicates found: {found / SAMPLES:.1%}, "
+          f"false matches on unrelated texts: {index.hits - found}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the near-duplicate index")
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--words", type=int, default=40, help="Words per sample text")
+    args = parser.parse_args()
+    main(args.entries, args.words)
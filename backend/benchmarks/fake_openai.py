@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Serves POST /v1/chat/completions in both JSON and SSE streaming modes with
+configurable latency (with an optional slow tail), token rate, 429/5xx
+injection, an optional
+per-minute request/token quota reported in x-ratelimit-* headers and
+simulated prompt caching, so the app can be load tested without network
+access or an API key.
+
+Usage: python -m benchmarks.fake_openai --port 9100 --latency-ms 300
+Then run the app with OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STYLES = ("professional", "casual", "polite", "social_media")
+
+
+class FakeConfig:
+    """Behaviour of the fake server; attributes can be changed while it runs."""
+
+    def __init__(
+        self,
+        latency_ms: float = 200.0,
+        tokens_per_second: float = 200.0,
+        error_rate_429: float = 0.0,
+        error_rate_5xx: float = 0.0,
+        seed: Optional[int] = None,
+        rpm_limit: Optional[int] = None,
+        tpm_limit: Optional[int] = None,
+        prefill_tokens_per_second: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_ms: float = 0.0,
+    ):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.error_rate_429 = error_rate_429
+        self.error_rate_5xx = error_rate_5xx
+        self.random = random.Random(seed)
+        # Occasional slow responses, for tail latency: slow_rate of them take slow_ms longer
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.requests = 0
+        self.errors = 0
+        # Account quota per minute, reported in x-ratelimit-* headers like OpenAI does
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.quota_rejections = 0
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._window_tokens = 0
+        # Prompt processing speed for uncached tokens, adds to time to first token (0 = instant)
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        # Token accounting, for cost estimates
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.reserved_tokens = 0  # Sum of max_tokens requested
+        self.streamed_tokens = 0  # Tokens actually sent on streams; fewer if clients hang up early
+        self._seen_prefixes: Set[str] = set()
+
+    def cached_prefix_tokens(self, messages) -> int:
+        """Prompt tokens served from the provider's prompt cache.
+
+        Like OpenAI, everything before the last message is cacheable once
+        it's been seen, in 128-token steps, and only from 1024 tokens up.
+        """
+        prefix = messages[:-1]
+        tokens = estimate_tokens("".join(m.get("content") or "" for m in prefix)) if prefix else 0
+        if tokens < 1024:
+            return 0
+        key = json.dumps(prefix, sort_keys=True)
+        if key not in self._seen_prefixes:
+            self._seen_prefixes.add(key)
+            return 0
+        return tokens // 128 * 128
+
+    def charge(self, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        """Count a request against the per-minute quota; returns (allowed, headers)."""
+        if self.rpm_limit is None and self.tpm_limit is None:
+            return True, {}
+        now = time.monotonic()
+        if now - self._window_start >= 60:
+            self._window_start, self._window_requests, self._window_tokens = now, 0, 0
+        reset = f"{max(0.0, 60 - (now - self._window_start)):.3f}s"
+
+        allowed = ((self.rpm_limit is None or self._window_requests + 1 <= self.rpm_limit)
+                   and (self.tpm_limit is None or self._window_tokens + tokens <= self.tpm_limit))
+        if allowed:
+            self._window_requests += 1
+            self._window_tokens += tokens
+        else:
+            self.quota_rejections += 1
+
+        headers = {}
+        if self.rpm_limit is not None:
+            headers["x-ratelimit-limit-requests"] = str(self.rpm_limit)
+            headers["x-ratelimit-remaining-requests"] = str(self.rpm_limit - self._window_requests)
+            headers["x-ratelimit-reset-requests"] = reset
+        if self.tpm_limit is not None:
+            headers["x-ratelimit-limit-tokens"] = str(self.tpm_limit)
+            headers["x-ratelimit-remaining-tokens"] = str(self.tpm_limit - self._window_tokens)
+            headers["x-ratelimit-reset-tokens"] = reset
+        return allowed, headers
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough OpenAI-style token count: about four characters per token."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def _user_text(messages) -> str:
+    """Pull the text to rephrase out of the last user message."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content") or ""
+            if '"""' in content:
+                parts = content.split('"""')
+                if len(parts) >= 3:
+                    return parts[-2].strip()
+            return content.strip()
+    return ""
+
+
+def _requested_styles(body) -> Tuple[str, ...]:
+    """Keys of a json_schema response_format, or all four styles for plain JSON mode."""
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        properties = response_format.get("json_schema", {}).get("schema", {}).get("properties", {})
+        return tuple(properties)
+    return STYLES
+
+
+def _build_content(text: str, styles: Tuple[str, ...] = STYLES) -> str:
+    return json.dumps({style: f"[{style}] {text}" for style in styles})
+
+
+def _split_tokens(content: str):
+    return [content[i:i + 4] for i in range(0, len(content), 4)]
+
+
+def _usage(prompt_tokens: int, cached_tokens: int, completion_tokens: int):
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI()
+    app.state.config = config
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        config.requests += 1
+
+        # Like OpenAI, the token quota is charged for the prompt plus max_tokens up front
+        messages = body.get("messages", [])
+        prompt_tokens = estimate_tokens("".join(m.get("content") or "" for m in messages))
+        allowed, quota_headers = config.charge(prompt_tokens + (body.get("max_tokens") or 0))
+        if not allowed:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers=quota_headers,
+            )
+
+        roll = config.random.random()
+        if roll < config.error_rate_429:
+            config.errors += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after-ms": "50"},
+            )
+        if roll < config.error_rate_429 + config.error_rate_5xx:
+            config.errors += 1
+            return JSONResponse({"error": {"message": "Upstream failure", "type": "server_error"}}, status_code=503)
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model", "fake-model")
+        tokens = _split_tokens(_build_content(_user_text(messages), _requested_styles(body)))
+        max_tokens = body.get("max_tokens")
+        finish_reason = "stop"
+        if max_tokens is not None and len(tokens) > max_tokens:
+            tokens = tokens[:max_tokens]
+            finish_reason = "length"
+        cached_tokens = config.cached_prefix_tokens(messages)
+        usage = _usage(prompt_tokens, cached_tokens, len(tokens))
+        config.prompt_tokens += prompt_tokens
+        config.cached_tokens += cached_tokens
+        config.completion_tokens += len(tokens)
+        config.reserved_tokens += max_tokens or 0
+        token_delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+        prefill = 0.0
+        if config.prefill_tokens_per_second > 0:
+            prefill = (prompt_tokens - cached_tokens) / config.prefill_tokens_per_second
+        slow = config.slow_ms / 1000 if config.random.random() < config.slow_rate else 0.0
+        await asyncio.sleep(config.latency_ms / 1000 + prefill + slow)
+
+        if not body.get("stream"):
+            await asyncio.sleep(token_delay * len(tokens))
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": usage,
+            }, headers=quota_headers)
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta, finish=None, **extra):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if delta is not None else [],
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                # Like the real API, stop generating once the client hangs up
+                if await request.is_disconnected():
+                    return
+                yield chunk({"content": token})
+                config.streamed_tokens += 1
+                if token_delay:
+                    await asyncio.sleep(token_delay)
+            yield chunk({}, finish_reason)
+            if include_usage:
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=quota_headers)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--rpm-limit", type=int, help="Requests per minute quota")
+    parser.add_argument("--tpm-limit", type=int, help="Tokens per minute quota")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of responses that are slow")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="Extra latency of a slow response")
+    args = parser.parse_args()
+
+    import uvicorn
+    config = FakeConfig(args.latency_ms, args.tokens_per_second, args.error_rate_429, args.error_rate_5xx,
+                        rpm_limit=args.rpm_limit, tpm_limit=args.tpm_limit,
+                        prefill_tokens_per_second=args.prefill_tokens_per_second,
+                        slow_rate=args.slow_rate, slow_ms=args.slow_ms)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
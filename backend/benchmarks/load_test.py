@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+End-to-end load benchmark against a local fake OpenAI server.
+
+Starts benchmarks.fake_openai in-process, runs the app under uvicorn in a
+subprocess pointed at it via OPENAI_BASE_URL, then drives
+/api/v1/rephrase and /api/v1/rephrase-stream at the given concurrency and
+reports throughput, latency percentiles, time to first token and token
+use with an estimated cost.
+No network access or API key is needed.
+
+Usage: python -m benchmarks.load_test --concurrency 32 --requests 500
+"""
+import argparse
+import asyncio
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+
+from benchmarks.fake_openai import FakeConfig, create_app
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_TEXTS = [
+    "Hey guys, let's huddle about AI",
+    "I need to cancel my appointment tomorrow",
+    "Thanks for your help with this issue",
+    "Can we schedule a meeting tomorrow?",
+    "The report is late because the data arrived on Friday",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Result:
+    def __init__(self, latency: float, status: int, ttft: Optional[float] = None,
+                 first_style: Optional[float] = None):
+        self.latency = latency
+        self.status = status
+        self.ttft = ttft  # First delta event
+        self.first_style = first_style  # First style_complete event
+
+
+def start_fake_openai(config: FakeConfig, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port,
+                                           log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def start_app(port: int, fake_port: int, extra_env: Dict[str, str]) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "OPENAI_API_KEY": "sk-benchmark-0000000000000000000000",
+        "ENVIRONMENT": "development",
+        "RATE_LIMIT_PER_MINUTE": str(10**9),
+        "RATE_LIMIT_PER_HOUR": str(10**9),
+    })
+    env.update(extra_env)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+async def wait_until_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/v1/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.05)
+    raise RuntimeError("App did not become ready in time")
+
+
+async def call_rephrase(client: httpx.AsyncClient, text: str) -> Result:
+    start = time.perf_counter()
+    response = await client.post("/api/v1/rephrase", json={"text": text})
+    return Result(time.perf_counter() - start, response.status_code)
+
+
+async def call_stream(client: httpx.AsyncClient, text: str) -> Result:
+    start = time.perf_counter()
+    ttft = first_style = None
+    status = 0
+    async with client.stream("POST", "/api/v1/rephrase-stream", json={"text": text}) as response:
+        status = response.status_code
+        async for line in response.aiter_lines():
+            if not line.startswith("event: "):
+                continue
+            event = line[7:]
+            now = time.perf_counter() - start
+            if event == "delta" and ttft is None:
+                ttft = now
+            elif event == "style_complete" and first_style is None:
+                first_style = now
+            elif event == "error":
+                status = 599  # Failed after the 200 was sent
+    return Result(time.perf_counter() - start, status, ttft, first_style)
+
+
+async def run_load(base_url: str, endpoint: str, concurrency: int, total: int,
+                   unique: bool) -> Tuple[List[Result], float]:
+    call = call_stream if endpoint == "stream" else call_rephrase
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(total):
+        text = SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]
+        # Unique texts defeat the response cache so every request reaches upstream
+        queue.put_nowait(f"{text} (request {i})" if unique else text)
+
+    results: List[Result] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker():
+            while True:
+                try:
+                    text = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    results.append(await call(client, text))
+                except httpx.HTTPError:
+                    results.append(Result(0.0, 0))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def report(endpoint: str, results: List[Result], elapsed: float):
+    ok = [r for r in results if r.status == 200]
+    statuses = Counter(r.status for r in results)
+
+    def ms(values, pct):
+        return percentile(values, pct) * 1000
+
+    print(f"\n== {endpoint} ==")
+    print(f"requests: {len(results)}  ok: {len(ok)}  statuses: {dict(sorted(statuses.items()))}")
+    print(f"throughput: {len(ok) / elapsed:.1f} req/s over {elapsed:.2f}s")
+    rows = [("latency", [r.latency for r in ok])]
+    if endpoint == "stream":
+        rows.append(("ttft", [r.ttft for r in ok if r.ttft is not None]))
+        rows.append(("first style", [r.first_style for r in ok if r.first_style is not None]))
+    print(f"{'':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in rows:
+        print(f"{name:<14}{ms(values, 50):>10.1f}{ms(values, 95):>10.1f}{ms(values, 99):>10.1f}")
+
+
+def report_tokens(config: FakeConfig, args):
+    """Token totals from the fake upstream, priced per million tokens."""
+    calls = max(1, config.requests - config.errors - config.quota_rejections)
+    uncached = config.prompt_tokens - config.cached_tokens
+    cost = (uncached * args.price_input + config.cached_tokens * args.price_cached
+            + config.completion_tokens * args.price_output) / 1_000_000
+    print(f"tokens per call: prompt {config.prompt_tokens / calls:.0f} "
+          f"(cached {config.cached_tokens / calls:.0f}), completion {config.completion_tokens / calls:.0f}, "
+          f"max_tokens reserved {config.reserved_tokens / calls:.0f}")
+    print(f"estimated cost: ${cost / calls * 1000:.4f} per 1k calls")
+
+
+def fetch_metrics(base_url: str) -> str:
+    try:
+        return httpx.get(f"{base_url}/metrics").text
+    except httpx.HTTPError:
+        return ""
+
+
+async def main(args):
+    config = FakeConfig(args.latency_ms, args.tokens_per_second, args.error_rate_429,
+                        args.error_rate_5xx, seed=1, rpm_limit=args.rpm_limit, tpm_limit=args.tpm_limit,
+                        prefill_tokens_per_second=args.prefill_tokens_per_second,
+                        slow_rate=args.slow_rate, slow_ms=args.slow_ms)
+    fake_port, app_port = free_port(), free_port()
+    fake_server = start_fake_openai(config, fake_port)
+    extra_env = {} if args.cache else {"CACHE_ENABLED": "false"}
+    if args.no_pacing:
+        extra_env["OPENAI_PACING_ENABLED"] = "false"
+    if args.hedge:
+        extra_env["HEDGE_ENABLED"] = "true"
+    if args.fixed_max_tokens:
+        extra_env.update({"ADAPTIVE_MAX_TOKENS": "false", "MAX_TOKENS": str(args.fixed_max_tokens)})
+    app = start_app(app_port, fake_port, extra_env)
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    try:
+        await wait_until_ready(base_url)
+        print(f"fake upstream: latency {args.latency_ms}ms, {args.tokens_per_second} tokens/s, "
+              f"429 rate {args.error_rate_429}, 5xx rate {args.error_rate_5xx}")
+        print(f"load: {args.requests} requests per endpoint at concurrency {args.concurrency}")
+
+        endpoints = ["rephrase", "stream"] if args.endpoint == "both" else [args.endpoint]
+        for endpoint in endpoints:
+            results, elapsed = await run_load(base_url, endpoint, args.concurrency,
+                                              args.requests, unique=not args.repeat_texts)
+            report(endpoint, results, elapsed)
+
+        print(f"\nupstream calls: {config.requests} (injected errors: {config.errors}, "
+              f"over quota: {config.quota_rejections})")
+        report_tokens(config, args)
+        if args.show_metrics:
+            print(fetch_metrics(base_url))
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        fake_server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the app against a fake OpenAI server")
+    parser.add_argument("--endpoint", choices=["rephrase", "stream", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    parser.add_argument("--rpm-limit", type=int, help="Fake account quota, requests per minute")
+    parser.add_argument("--tpm-limit", type=int, help="Fake account quota, tokens per minute")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of slow upstream responses")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="Extra latency of a slow response")
+    parser.add_argument("--hedge", action="store_true", help="Enable hedged upstream calls")
+    parser.add_argument("--no-pacing", action="store_true", help="Disable header-driven pacing")
+    parser.add_argument("--fixed-max-tokens", type=int,
+                        help="Send this max_tokens on every call instead of sizing it to the input")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0.0,
+                        help="Fake prompt processing speed for uncached tokens (0 = instant)")
+    # Defaults are gpt-4o-mini list prices, USD per million tokens
+    parser.add_argument("--price-input", type=float, default=0.15)
+    parser.add_argument("--price-cached", type=float, default=0.075)
+    parser.add_argument("--price-output", type=float, default=0.60)
+    parser.add_argument("--repeat-texts", action="store_true",
+                        help="Reuse a small set of texts instead of making each one unique")
+    parser.add_argument("--cache", action="store_true", help="Leave the response cache enabled")
+    parser.add_argument("--show-metrics", action="store_true", help="Print /metrics at the end")
+    asyncio.run(main(parser.parse_args()))
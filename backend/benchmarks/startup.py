@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: how fast a new process can take traffic.
+
+Measures, each in a fresh interpreter, the time to import app.main and
+which heavy modules that pulls in, then starts the app under uvicorn
+against a local fake OpenAI server and measures the time from launch to
+the first successful /api/v1/health and /api/v1/rephrase responses.
+
+Usage: python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.fake_openai import FakeConfig
+from benchmarks.load_test import BACKEND_DIR, free_port, start_app, start_fake_openai
+
+# Slow to import and not needed to serve health checks
+HEAVY_MODULES = ("openai", "httpx", "tiktoken")
+
+_IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_import() -> Dict:
+    """Import app.main in a fresh interpreter; return the time and heavy modules loaded."""
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _wait_for(client: httpx.Client, method: str, url: str, deadline: float, **kwargs) -> None:
+    while time.monotonic() < deadline:
+        try:
+            if client.request(method, url, **kwargs).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"No successful {method} {url} before the deadline")
+
+
+def measure_first_requests(timeout: float = 30.0) -> Dict[str, float]:
+    """Launch the app; return seconds until the first healthy and first rephrased responses."""
+    config = FakeConfig(latency_ms=0, tokens_per_second=0, seed=1)
+    fake_port, app_port = free_port(), free_port()
+    fake_server = start_fake_openai(config, fake_port)
+    base_url = f"http://127.0.0.1:{app_port}"
+    start = time.monotonic()
+    app = start_app(app_port, fake_port, {"CACHE_ENABLED": "false"})
+    try:
+        with httpx.Client(timeout=5) as client:
+            _wait_for(client, "GET", f"{base_url}/api/v1/health", start + timeout)
+            health = time.monotonic() - start
+            _wait_for(client, "POST", f"{base_url}/api/v1/rephrase", start + timeout,
+                      json={"text": "First request after a deploy"})
+            rephrase = time.monotonic() - start
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        fake_server.should_exit = True
+    return {"health": health, "rephrase": rephrase}
+
+
+def main(args):
+    imports: List[float] = []
+    for _ in range(args.runs):
+        result = measure_import()
+        imports.append(result["seconds"])
+    print(f"import app.main: median {statistics.median(imports) * 1000:.0f}ms, "
+          f"min {min(imports) * 1000:.0f}ms over {args.runs} runs")
+    print(f"heavy modules loaded on import: {', '.join(result['heavy']) or 'none'}")
+
+    first = [measure_first_requests() for _ in range(args.runs)]
+    for name in ("health", "rephrase"):
+        values = [f[name] for f in first]
+        print(f"launch to first {name}: median {statistics.median(values) * 1000:.0f}ms, "
+              f"max {max(values) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure app import and cold-start time")
+    parser.add_argument("--runs", type=int, default=3)
+    main(parser.parse_args())
@@ -18,3 +18,36 @@ def set_test_environment():
         os.environ["ENVIRONMENT"] = original_env
     elif original_env != "development":
         os.environ.pop("ENVIRONMENT", None)
+
+@pytest.fixture
+def fake_openai(request, monkeypatch):
+    """Point the OpenAI client at the benchmark stand-in server, and yield its FakeConfig.
+
+    Parametrize indirectly to change the config, e.g. with {"tokens_per_second": 100}.
+    """
+    from app.config import get_settings
+    from app.llm import _client
+    from benchmarks.fake_openai import FakeConfig
+    from benchmarks.load_test import free_port, start_fake_openai
+
+    options = dict(latency_ms=0, tokens_per_second=0, seed=1)
+    options.update(getattr(request, "param", {}))
+    config = FakeConfig(**options)
+    port = free_port()
+    server = start_fake_openai(config, port)
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "openai_base_url", f"http://127.0.0.1:{port}/v1")
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test-00000000000000000000000000")
+    monkeypatch.setattr(settings, "openai_max_retries", 0)
+    _client.cache_clear()
+    yield config
+    _client.cache_clear()
+    server.should_exit = True
+
+@pytest.fixture(autouse=True)
+def reset_response_cache():
+    """Start every test with an empty response cache."""
+    from app.cache import get_response_cache
+    get_response_cache().clear()
+    yield
@@ -0,0 +1,24 @@
+# tests/helpers.py
+"""
+Small test doubles shared by several test modules.
+"""
+import json
+from unittest.mock import MagicMock
+
+
+class FakeClock:
+    """A clock for code that takes a ``clock`` callable; move it with ``now``."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def mock_response(payload):
+    """A chat completion response whose message is ``payload`` as JSON."""
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = json.dumps(payload)
+    return response
@@ -0,0 +1,143 @@
+# tests/test_admission.py
+import asyncio
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient, ASGITransport
+from app.admission import AdmissionController, AdmissionRejected
+
+
+@pytest.mark.asyncio
+async def test_calls_beyond_the_limit_wait_in_fifo_order():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_wait=5)
+    order = []
+
+    async def call(name, hold):
+        async with controller.slot():
+            order.append(name)
+            await hold.wait()
+
+    holds = [asyncio.Event() for _ in range(3)]
+    tasks = [asyncio.create_task(call(i, hold)) for i, hold in enumerate(holds)]
+    await asyncio.sleep(0)
+    assert controller.in_flight == 1
+    assert controller.queued == 2
+
+    for hold in holds:
+        hold.set()
+    await asyncio.gather(*tasks)
+    assert order == [0, 1, 2]
+    assert controller.in_flight == 0
+    assert controller.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_immediately():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, max_queue_wait=60)
+    await controller.acquire()
+    waiter = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire()
+    assert exc_info.value.retry_after >= 1
+    assert controller.rejected == 1
+
+    controller.release(0.1)
+    await waiter
+    controller.release(0.1)
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_long_expected_wait_sheds_before_queueing():
+    # Calls take ~10s each on one slot, so even the first queued call would wait too long
+    controller = AdmissionController(max_in_flight=1, max_queue=100, max_queue_wait=5,
+                                     initial_service_time=10.0)
+    await controller.acquire()
+    assert controller.expected_wait() == pytest.approx(10.0)
+
+    with pytest.raises(AdmissionRejected):
+        controller.check()
+    with pytest.raises(AdmissionRejected):
+        await controller.acquire()
+    assert controller.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_queued_call_is_shed_after_the_wait_budget():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_wait=0.05,
+                                     initial_service_time=0.01)
+    await controller.acquire()
+
+    with pytest.raises(AdmissionRejected):
+        await controller.acquire()
+    assert controller.queued == 0
+    assert controller.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_slot_handed_over_as_the_wait_times_out_is_kept():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_wait=5)
+    await controller.acquire()
+
+    async def granted_then_timed_out(waiter, timeout):
+        # The holder releases and the timeout fires in the same loop iteration
+        controller.release(0.1)
+        assert waiter.done()
+        raise asyncio.TimeoutError
+
+    with patch("app.admission.asyncio.wait_for", granted_then_timed_out):
+        await controller.acquire()
+    assert controller.in_flight == 1
+    assert controller.rejected == 0
+
+    controller.release(0.1)
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_queue_wait=5)
+    await controller.acquire()
+    cancelled = asyncio.create_task(controller.acquire())
+    waiting = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+
+    cancelled.cancel()
+    await asyncio.gather(cancelled, return_exceptions=True)
+    assert controller.queued == 1
+
+    controller.release(0.1)
+    await waiting
+    assert controller.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_overloaded_rephrase_returns_503_with_retry_after():
+    from app.main import app
+    from app.llm import LLMOverloadedError
+
+    async def overloaded(text, styles=None):
+        raise LLMOverloadedError(retry_after=2.4)
+
+    with patch("app.api.v1.endpoints.rephrase", overloaded):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            res = await ac.post("/api/v1/rephrase", json={"text": "Hello there"})
+
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == "3"
+
+
+@pytest.mark.asyncio
+async def test_overloaded_stream_is_rejected_before_streaming():
+    from app.main import app
+    from app.llm import admission
+
+    with patch.object(admission, "max_in_flight", 0), patch.object(admission, "max_queue", 0):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            res = await ac.post("/api/v1/rephrase-stream", json={"text": "Hello there"})
+
+    assert res.status_code == 503
+    assert int(res.headers["retry-after"]) >= 1
@@ -0,0 +1,100 @@
+# tests/test_batch.py
+import asyncio
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient, ASGITransport
+from app.llm import LLMError
+
+
+def _result(text):
+    return {
+        "professional": f"P: {text}",
+        "casual": f"C: {text}",
+        "polite": f"Po: {text}",
+        "social_media": f"S: {text}",
+    }
+
+
+@pytest.fixture
+def fresh_rate_limiter():
+    from app.security import RateLimiter
+    limiter = RateLimiter(requests_per_minute=60, requests_per_hour=1000)
+    with patch("app.api.v1.endpoints.rate_limiter", limiter):
+        yield limiter
+
+
+@pytest.mark.asyncio
+async def test_batch_returns_per_item_results_and_errors(fresh_rate_limiter):
+    from app.main import app
+
+    async def fake_rephrase(text, styles=None):
+        if text == "fail me":
+            raise LLMError("boom")
+        return _result(text)
+
+    texts = ["first text", "fail me", "this is spam", "last text"]
+    with patch("app.api.v1.endpoints.rephrase", fake_rephrase):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            res = await ac.post("/api/v1/rephrase-batch", json={"texts": texts})
+
+    assert res.status_code == 200
+    results = res.json()["results"]
+    assert [item["index"] for item in results] == [0, 1, 2, 3]
+    assert results[0]["result"] == _result("first text")
+    assert results[1]["error"] == "LLM call failed"
+    assert "inappropriate" in results[2]["error"]
+    assert results[3]["result"] == _result("last text")
+
+
+@pytest.mark.asyncio
+async def test_batch_respects_concurrency_limit(fresh_rate_limiter, monkeypatch):
+    from app.main import app
+    from app.config import get_settings
+    monkeypatch.setattr(get_settings(), "batch_concurrency", 3)
+
+    active = 0
+    peak = 0
+
+    async def fake_rephrase(text, styles=None):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return _result(text)
+
+    texts = [f"text number {i}" for i in range(12)]
+    with patch("app.api.v1.endpoints.rephrase", fake_rephrase):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            res = await ac.post("/api/v1/rephrase-batch", json={"texts": texts})
+
+    assert res.status_code == 200
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_counts_items_against_rate_limit(fresh_rate_limiter):
+    from app.main import app
+
+    async def fake_rephrase(text, styles=None):
+        return _result(text)
+
+    texts = [f"text number {i}" for i in range(100)]  # 25 requests at weight 0.25
+    with patch("app.api.v1.endpoints.rephrase", fake_rephrase):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            assert (await ac.post("/api/v1/rephrase-batch", json={"texts": texts})).status_code == 200
+            assert (await ac.post("/api/v1/rephrase-batch", json={"texts": texts})).status_code == 200
+            assert (await ac.post("/api/v1/rephrase-batch", json={"texts": texts})).status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_batch_rejects_empty_and_oversized_batches():
+    from app.main import app
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        assert (await ac.post("/api/v1/rephrase-batch", json={"texts": []})).status_code == 422
+        res = await ac.post("/api/v1/rephrase-batch", json={"texts": ["hi"] * 101})
+        assert res.status_code == 422
@@ -0,0 +1,118 @@
+# tests/test_bulk.py
+import asyncio
+import io
+import json
+import pytest
+from app.bulk import BulkRun, main
+from app.llm import LLMError
+
+
+@pytest.fixture
+def fake_rephrase(monkeypatch):
+    state = {"calls": [], "active": 0, "peak": 0, "delay": 0.01}
+
+    async def fake(text, styles=None):
+        state["calls"].append(text)
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(state["delay"])
+        finally:
+            state["active"] -= 1
+        if text == "fail":
+            raise LLMError("The LLM request timed out.")
+        return {style: text.upper() for style in styles or ["casual"]}
+
+    monkeypatch.setattr("app.llm.rephrase", fake)
+    return state
+
+
+def _write_input(path, lines):
+    path.write_text("".join(line + "\n" for line in lines))
+    return str(path)
+
+
+def _read_output(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_bulk_run_writes_a_result_or_error_per_line(fake_rephrase, tmp_path):
+    src = _write_input(tmp_path / "in.jsonl", [
+        json.dumps({"id": i, "text": f"text {i}"}) for i in range(20)
+    ] + ["", "not json", json.dumps({"id": "x", "text": "fail"}), json.dumps({"id": "y"})])
+    out = tmp_path / "out.jsonl"
+
+    summary = await BulkRun(src, str(out), concurrency=4, styles=["polite"], report=io.StringIO()).run()
+
+    records = _read_output(out)
+    assert len(records) == 23
+    assert len({r["offset"] for r in records}) == 23
+    results = {r["id"]: r["result"] for r in records if "result" in r}
+    assert results[3] == {"polite": "TEXT 3"}
+    errors = {r.get("id"): r["error"] for r in records if "error" in r}
+    assert errors["x"] == "The LLM request timed out."
+    assert "y" in errors and None in errors  # Missing text, invalid JSON
+    assert summary["completed"] == 20
+    assert summary["errors"] == 3
+    assert summary["progress"] == 1.0
+    assert fake_rephrase["peak"] == 4
+
+
+@pytest.mark.asyncio
+async def test_bulk_run_reports_invalid_utf8_lines(fake_rephrase, tmp_path):
+    src = tmp_path / "in.jsonl"
+    src.write_bytes(b'{"id": 1, "text": "caf\xe9"}\n\xff\xfe\n{"id": 2, "text": "fine"}\n')
+    out = tmp_path / "out.jsonl"
+
+    summary = await BulkRun(str(src), str(out), report=io.StringIO()).run()
+
+    records = sorted(_read_output(out), key=lambda r: r["offset"])
+    assert [r.get("id") for r in records] == [1, None, 2]
+    assert records[0]["error"] == "Invalid UTF-8"
+    assert records[1]["error"] == "Invalid JSON"
+    assert "result" in records[2]
+    assert summary["completed"] == 1
+    assert summary["errors"] == 2
+    assert fake_rephrase["calls"] == ["fine"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_run_resumes_from_checkpoint(fake_rephrase, tmp_path):
+    src = _write_input(tmp_path / "in.jsonl", [json.dumps({"text": f"text {i}"}) for i in range(30)])
+    out = tmp_path / "out.jsonl"
+
+    first = BulkRun(src, str(out), concurrency=3, checkpoint_interval=0, report=io.StringIO())
+    task = asyncio.create_task(first.run())
+    while first.completed < 10:
+        await asyncio.sleep(0.005)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    calls_before = len(fake_rephrase["calls"])
+    assert calls_before < 30
+
+    second = BulkRun(src, str(out), concurrency=3, report=io.StringIO())
+    summary = await second.run()
+
+    records = _read_output(out)
+    assert sorted(r["result"]["casual"] for r in records) == sorted(f"TEXT {i}" for i in range(30))
+    # Only the lines that were in flight when it stopped are rephrased twice
+    assert len(fake_rephrase["calls"]) <= 30 + 3
+    assert summary["completed"] <= 30 - 10
+
+    # A finished run has nothing left to do
+    third = await BulkRun(src, str(out), report=io.StringIO()).run()
+    assert third["completed"] == 0
+    assert len(_read_output(out)) == 30
+
+
+def test_cli_reports_progress_and_exit_status(fake_rephrase, tmp_path, capsys):
+    src = _write_input(tmp_path / "in.jsonl", [json.dumps({"text": "hello"}), json.dumps({"text": "fail"})])
+    out = tmp_path / "out.jsonl"
+
+    assert main([src, str(out), "--concurrency", "2", "--styles", "casual,polite"]) == 1
+    report = capsys.readouterr().err
+    assert "done: 1 rephrased, 1 errors (100.0% of input)" in report
+    assert "tokens 0 prompt / 0 completion" in report
+    assert (tmp_path / "out.jsonl.checkpoint").exists()
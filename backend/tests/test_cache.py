@@ -0,0 +1,109 @@
+# tests/test_cache.py
+import pytest
+from unittest.mock import patch, AsyncMock
+from app.cache import ResponseCache, get_response_cache
+from tests.helpers import FakeClock, mock_response
+
+
+RESULT = {
+    "professional": "I require assistance with this project.",
+    "casual": "Could use some help on this project.",
+    "polite": "I would appreciate assistance with this project.",
+    "social_media": "Need help with this project!",
+}
+
+
+def test_cache_hit_and_miss_counters():
+    cache = ResponseCache()
+    assert cache.get("a") is None
+    cache.set("a", {"casual": "hi"})
+    assert cache.get("a") == {"casual": "hi"}
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_cache_returns_copies():
+    cache = ResponseCache()
+    cache.set("a", {"casual": "hi"})
+    cache.get("a")["casual"] = "changed"
+    assert cache.get("a") == {"casual": "hi"}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", {"casual": "1"})
+    cache.set("b", {"casual": "2"})
+    cache.get("a")  # "b" is now the oldest
+    cache.set("c", {"casual": "3"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_respects_byte_budget():
+    cache = ResponseCache(max_bytes=100)
+    cache.set("a", {"casual": "x" * 60})
+    cache.set("b", {"casual": "y" * 60})
+
+    assert len(cache) == 1
+    assert cache.get("b") is not None
+    assert cache.stats()["bytes"] <= 100
+
+    # Entries bigger than the whole budget are skipped
+    cache.set("c", {"casual": "z" * 500})
+    assert cache.get("c") is None
+    assert cache.get("b") is not None
+
+
+def test_cache_expires_entries():
+    clock = FakeClock(0.0)
+    cache = ResponseCache(ttl_seconds=10, clock=clock)
+    cache.set("a", {"casual": "hi"})
+
+    clock.now = 9.9
+    assert cache.get("a") is not None
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_rephrase_cache_hit_skips_client(mock_client):
+    """Repeated texts are served from the cache, ignoring whitespace differences."""
+    from app.llm import rephrase
+
+    create = AsyncMock(return_value=mock_response(RESULT))
+    mock_client.return_value.chat.completions.create = create
+
+    first = await rephrase("I need help with this project.")
+    second = await rephrase("  I need  help with\nthis project.  ")
+
+    assert first == second == RESULT
+    assert create.await_count == 1
+    assert mock_client.call_count == 1
+    assert get_response_cache().stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_rephrase_errors_are_not_cached(mock_client):
+    from app.llm import rephrase, LLMError
+    from openai import APIConnectionError
+
+    mock_client.return_value.chat.completions.create = AsyncMock(
+        side_effect=APIConnectionError(request=None)
+    )
+    with pytest.raises(LLMError):
+        await rephrase("Test text")
+
+    mock_client.return_value.chat.completions.create = AsyncMock(
+        return_value=mock_response(RESULT)
+    )
+    assert await rephrase("Test text") == RESULT
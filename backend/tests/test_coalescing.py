@@ -0,0 +1,83 @@
+# tests/test_coalescing.py
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+from tests.helpers import mock_response
+
+
+RESULT = {
+    "professional": "Good morning.",
+    "casual": "Hey!",
+    "polite": "Good morning to you.",
+    "social_media": "GM everyone!",
+}
+
+
+def _slow_create(release: asyncio.Event, error: Exception = None):
+    """Build a create() mock that blocks until the test releases it."""
+    async def create(**kwargs):
+        await release.wait()
+        if error is not None:
+            raise error
+        return mock_response(RESULT)
+    return AsyncMock(side_effect=create)
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_concurrent_identical_calls_share_one_upstream_call(mock_client):
+    from app.llm import rephrase, _inflight
+
+    release = asyncio.Event()
+    create = _slow_create(release)
+    mock_client.return_value.chat.completions.create = create
+
+    waiters = [asyncio.create_task(rephrase("Hello there")) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert all(result == RESULT for result in results)
+    assert create.await_count == 1
+    assert not _inflight
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_cancelled_waiter_does_not_cancel_shared_call(mock_client):
+    from app.llm import rephrase
+
+    release = asyncio.Event()
+    create = _slow_create(release)
+    mock_client.return_value.chat.completions.create = create
+
+    first = asyncio.create_task(rephrase("Hello there"))
+    second = asyncio.create_task(rephrase("Hello there"))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == RESULT
+    assert first.cancelled()
+    assert create.await_count == 1
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_errors_are_delivered_to_all_waiters(mock_client):
+    from app.llm import rephrase, LLMError
+    from openai import APIConnectionError
+
+    release = asyncio.Event()
+    create = _slow_create(release, error=APIConnectionError(request=None))
+    mock_client.return_value.chat.completions.create = create
+
+    waiters = [asyncio.create_task(rephrase("Hello there")) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert all(isinstance(result, LLMError) for result in results)
+    assert create.await_count == 1
@@ -0,0 +1,63 @@
+# tests/test_content_filter.py
+import os
+import pytest
+from app.content_filter import ContentFilter, compile_terms
+
+
+def test_matches_whole_words_only():
+    content_filter = ContentFilter(terms=["hack", "spam"])
+    assert content_filter.contains_blocked("Let's hack the planet")
+    assert content_filter.contains_blocked("SPAM!")
+    assert not content_filter.contains_blocked("Join our hackathon")
+    assert not content_filter.contains_blocked("A spammy subject line")
+
+
+def test_shared_prefixes_and_multi_word_terms():
+    content_filter = ContentFilter(terms=["hack", "hacker", "hacking tools", "buy now"])
+    assert content_filter.find("ask a hacker") == "hacker"
+    assert content_filter.find("some hacking   tools here") == "hacking   tools"
+    assert content_filter.find("Buy\nNow and save") == "Buy\nNow"
+    assert not content_filter.contains_blocked("hacking is a word we allow alone")
+
+
+def test_special_characters_are_escaped():
+    pattern = compile_terms(["c++", "a.b"])
+    assert pattern.search("I write c++ daily")
+    assert not pattern.search("axb")
+
+
+def test_empty_blocklist_allows_everything():
+    assert compile_terms(["", "   "]) is None
+    assert not ContentFilter(terms=[]).contains_blocked("anything")
+
+
+def test_loads_and_reloads_blocklist_file(tmp_path):
+    path = tmp_path / "blocklist.txt"
+    path.write_text("# Blocked terms\nphishing\n\nscam\n", encoding="utf-8")
+    content_filter = ContentFilter(path=str(path), refresh_interval=0)
+
+    assert content_filter.term_count == 2
+    assert content_filter.contains_blocked("This is a scam")
+    assert not content_filter.contains_blocked("This is spam")
+
+    path.write_text("spam\n", encoding="utf-8")
+    os.utime(path, (1, 1))  # Make sure the mtime changes
+    assert content_filter.contains_blocked("This is spam")
+    assert not content_filter.contains_blocked("This is a scam")
+
+
+def test_missing_blocklist_file_fails_at_startup(tmp_path):
+    with pytest.raises(OSError):
+        ContentFilter(path=str(tmp_path / "missing.txt"))
+
+
+def test_rephrase_in_allows_words_containing_blocked_terms():
+    from app.models import RephraseIn
+    assert RephraseIn(text="See you at the hackathon").text == "See you at the hackathon"
+
+
+def test_terms_starting_with_punctuation():
+    content_filter = ContentFilter(terms=["$$$", "c++"])
+    assert content_filter.find("Make $$$ fast") == "$$$"
+    assert content_filter.find("Learn C++ now") == "C++"
+    assert not content_filter.contains_blocked("c is fine")
@@ -0,0 +1,50 @@
+# tests/test_fake_openai.py
+"""
+Run the real OpenAI SDK against the local benchmark stand-in server.
+"""
+import json
+import pytest
+from benchmarks.load_test import percentile
+
+
+@pytest.mark.asyncio
+async def test_rephrase_against_fake_server(fake_openai):
+    from app.llm import rephrase
+
+    result = await rephrase("Hello from the benchmark")
+    assert result["casual"] == "[casual] Hello from the benchmark"
+    assert set(result) == {"professional", "casual", "polite", "social_media"}
+    assert fake_openai.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_rephrase_stream_against_fake_server(fake_openai):
+    from app.llm import rephrase_stream
+
+    chunks = [chunk async for chunk in rephrase_stream("Stream me")]
+    assert len(chunks) > 1
+    assert json.loads("".join(chunks))["polite"] == "[polite] Stream me"
+
+
+@pytest.mark.asyncio
+async def test_fake_server_injects_errors(fake_openai):
+    from app.llm import rephrase, LLMError
+
+    fake_openai.error_rate_429 = 1.0
+    with pytest.raises(LLMError, match="Rate limit exceeded"):
+        await rephrase("Please fail")
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0
+
+
+@pytest.mark.asyncio
+async def test_fake_server_returns_only_schema_keys(fake_openai):
+    from app.llm import rephrase_stream
+
+    chunks = [chunk async for chunk in rephrase_stream("Just one", styles=["casual"])]
+    assert json.loads("".join(chunks)) == {"casual": "[casual] Just one"}
@@ -0,0 +1,108 @@
+# tests/test_hedging.py
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+from app.hedging import HedgePolicy
+from tests.helpers import mock_response
+
+
+def _calls(*delays, error=None):
+    """A call factory whose n-th call sleeps delays[n] and returns n."""
+    started = []
+    cancelled = []
+
+    async def call():
+        n = len(started)
+        started.append(n)
+        try:
+            await asyncio.sleep(delays[n])
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        if error is not None and n in error:
+            raise RuntimeError(f"call {n} failed")
+        return n
+
+    return call, started, cancelled
+
+
+@pytest.mark.asyncio
+async def test_fast_call_is_not_hedged():
+    policy = HedgePolicy(default_delay=0.05, max_rate=1.0)
+    call, started, _ = _calls(0)
+    assert await policy.run(call) == 0
+    assert started == [0]
+    assert policy.hedged == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_and_loser_cancelled():
+    policy = HedgePolicy(default_delay=0.01, max_rate=1.0)
+    call, started, cancelled = _calls(10, 0.01)
+    assert await policy.run(call) == 1
+    await asyncio.sleep(0)
+    assert started == [0, 1]
+    assert cancelled == [0]
+    assert policy.hedge_wins == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_covers_a_failing_primary():
+    policy = HedgePolicy(default_delay=0.01, max_rate=1.0)
+    call, _, _ = _calls(0.03, 0.05, error={0})
+    assert await policy.run(call) == 1
+
+
+@pytest.mark.asyncio
+async def test_both_failing_raises_the_primary_error():
+    policy = HedgePolicy(default_delay=0.01, max_rate=1.0)
+    call, _, _ = _calls(0.02, 0.02, error={0, 1})
+    with pytest.raises(RuntimeError, match="call 0 failed"):
+        await policy.run(call)
+
+
+@pytest.mark.asyncio
+async def test_hedge_rate_is_capped():
+    policy = HedgePolicy(default_delay=0.001, max_rate=0.1)
+    for _ in range(50):
+        call, _, _ = _calls(0.005, 0.005)
+        await policy.run(call)
+    assert 1 <= policy.hedged <= 5
+
+
+@pytest.mark.asyncio
+async def test_saved_up_budget_is_capped():
+    policy = HedgePolicy(default_delay=0.001, max_rate=1.0, max_budget=2)
+    for _ in range(10):
+        call, _, _ = _calls(0)
+        await policy.run(call)  # Fast calls earn budget without spending it
+    assert policy._budget == 2
+
+
+def test_deadline_follows_the_observed_quantile():
+    policy = HedgePolicy(quantile=0.9, default_delay=2.0, min_samples=10)
+    assert policy.deadline() == 2.0
+    policy._latencies.extend(i / 100 for i in range(1, 101))
+    assert policy.deadline() == pytest.approx(0.9)
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_rephrase_hedges_slow_upstream_calls(mock_client, monkeypatch):
+    from app.config import get_settings
+    from app.llm import rephrase
+
+    result = {"professional": "P", "casual": "C", "polite": "Po", "social_media": "S"}
+    delays = [10, 0]
+
+    async def create(**kwargs):
+        await asyncio.sleep(delays.pop(0))
+        return mock_response(result)
+
+    create_mock = AsyncMock(side_effect=create)
+    mock_client.return_value.chat.completions.create = create_mock
+    monkeypatch.setattr(get_settings(), "hedge_enabled", True)
+    monkeypatch.setattr("app.llm.hedging", HedgePolicy(default_delay=0.01, max_rate=1.0))
+
+    assert await asyncio.wait_for(rephrase("Hedge me"), timeout=2) == result
+    assert create_mock.await_count == 2
@@ -0,0 +1,50 @@
+# tests/test_http_pool.py
+import pytest
+from app.http_pool import HTTPPool
+from benchmarks.load_test import free_port
+
+
+@pytest.mark.asyncio
+async def test_warm_opens_idle_connections(fake_openai):
+    from app.config import get_settings
+
+    pool = HTTPPool(max_connections=8)
+    await pool.warm([get_settings().openai_base_url], connections=3)
+    stats = pool.stats()
+    assert stats["warmed"] == 3
+    assert stats["connections"] == 3
+    assert stats["idle"] == 3
+    assert stats["utilization"] == 0
+
+    await pool.aclose()
+    assert pool.stats()["connections"] == 0
+
+
+@pytest.mark.asyncio
+async def test_warm_failures_are_not_fatal():
+    pool = HTTPPool()
+    await pool.warm([f"http://127.0.0.1:{free_port()}/v1"], connections=2, timeout=1)
+    assert pool.stats()["warmed"] == 0
+    await pool.aclose()
+
+
+def test_http2_falls_back_without_h2(monkeypatch):
+    monkeypatch.setattr("app.http_pool._http2_available", lambda: False)
+    assert HTTPPool(http2=True).http2 is False
+
+
+@pytest.mark.asyncio
+async def test_lifespan_warms_the_pool_and_requests_reuse_it(fake_openai, monkeypatch):
+    from app.main import app
+    from app.llm import http_pool, rephrase
+    from app.config import get_settings
+
+    monkeypatch.setattr(get_settings(), "openai_http_warm_connections", 2)
+    async with app.router.lifespan_context(app):
+        await app.state.warm_up
+        assert http_pool.stats()["idle"] == 2
+        await rephrase("Reuse a warm connection")
+        await rephrase("And again")
+        assert fake_openai.requests == 2
+        assert http_pool.stats()["connections"] == 2
+    assert http_pool.stats()["connections"] == 0
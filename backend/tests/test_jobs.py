@@ -0,0 +1,189 @@
+# tests/test_jobs.py
+import asyncio
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app.jobs import Job, JobQueue, JobQueueFull, FAILED, QUEUED, RUNNING, SUCCEEDED
+from app.llm import LLMError
+
+
+@pytest.fixture
+def slow_rephrase(monkeypatch):
+    """Patch rephrase() with one that takes a while and tracks its concurrency."""
+    state = {"active": 0, "peak": 0, "calls": 0, "delay": 0.05}
+
+    async def fake(text, styles=None):
+        state["calls"] += 1
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(state["delay"])
+        finally:
+            state["active"] -= 1
+        if text == "fail":
+            raise LLMError("boom")
+        return {style: f"{style}: {text}" for style in styles or ["casual"]}
+
+    monkeypatch.setattr("app.llm.rephrase", fake)
+    return state
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_on_a_bounded_worker_pool(slow_rephrase, db_path):
+    queue = JobQueue(db_path, workers=2)
+    jobs = [await queue.submit(f"text {i}", ["polite"]) for i in range(6)]
+    assert not any(job.done for job in jobs)
+
+    for job in jobs:
+        await queue.wait(job, timeout=2)
+    assert [job.status for job in jobs] == [SUCCEEDED] * 6
+    assert jobs[0].result == {"polite": "polite: text 0"}
+    assert slow_rephrase["peak"] == 2
+    assert queue.stats()["finished"] == 6
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_jobs_hide_internal_errors(slow_rephrase, db_path):
+    queue = JobQueue(db_path, workers=1)
+    job = await queue.wait(await queue.submit("fail"), timeout=2)
+    assert job.status == FAILED
+    assert job.error == "LLM call failed"
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_submit_rejects_when_too_many_jobs_wait(slow_rephrase, db_path):
+    queue = JobQueue(db_path, workers=1, max_pending=2)
+    await queue.submit("a")
+    await asyncio.sleep(0)  # The worker takes the first job
+    await queue.submit("b")
+    await queue.submit("c")
+    with pytest.raises(JobQueueFull):
+        await queue.submit("d")
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_wait_returns_unfinished_job_after_timeout(slow_rephrase, db_path):
+    slow_rephrase["delay"] = 1
+    queue = JobQueue(db_path, workers=1)
+    job = await queue.wait(await queue.submit("slow"), timeout=0.05)
+    assert not job.done
+    await queue.aclose()
+    # Shutting down doesn't leave it queued forever for other workers
+    assert (await queue.get(job.id)).error == "Job was interrupted"
+
+
+@pytest.mark.asyncio
+async def test_finished_jobs_expire_and_are_evicted_to_fit(slow_rephrase, tmp_path):
+    now = [0.0]
+    queue = JobQueue(str(tmp_path / "a.sqlite3"), workers=1, ttl_seconds=10, clock=lambda: now[0])
+    job = await queue.wait(await queue.submit("hello"), timeout=2)
+    assert (await queue.get(job.id)).result == {"casual": "casual: hello"}
+    now[0] = 11
+    assert await queue.get(job.id) is None
+    await queue.aclose()
+
+    queue = JobQueue(str(tmp_path / "b.sqlite3"), workers=1, max_bytes=100)
+    first = await queue.wait(await queue.submit("x" * 30), timeout=2)
+    second = await queue.wait(await queue.submit("y" * 30), timeout=2)
+    assert await queue.get(first.id) is None
+    assert (await queue.get(second.id)).status == SUCCEEDED
+    assert queue.stats()["bytes"] <= 100
+    assert queue.stats()["evictions"] == 1
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_jobs_time_out_and_abandoned_ones_are_dropped(slow_rephrase, db_path):
+    now = [0.0]
+    slow_rephrase["delay"] = 10
+    queue = JobQueue(db_path, workers=1, ttl_seconds=10, timeout_seconds=0.05, clock=lambda: now[0])
+    job = await queue.wait(await queue.submit("hello"), timeout=2)
+    assert job.status == FAILED
+    assert job.error == "Job timed out"
+    await queue.aclose()
+
+    # A job left queued by a process that died
+    queue = JobQueue(db_path, workers=1, ttl_seconds=10, timeout_seconds=5, clock=lambda: now[0])
+    orphan = Job("orphan", None, now[0])
+    queue._insert(orphan)
+    assert (await queue.get(orphan.id)).status == QUEUED
+    now[0] = 16
+    assert await queue.get(orphan.id) is None
+    slow_rephrase["delay"] = 0
+    await queue.wait(await queue.submit("later"), timeout=2)
+    assert len(queue) == 1
+    assert queue.stats()["bytes"] == len("later") + len("casual") + len("casual: later")
+    await queue.aclose()
+
+
+def test_shutdown_leaves_an_unused_job_store_alone():
+    from fastapi.testclient import TestClient
+    from app.jobs import get_job_queue
+    from app.main import app
+
+    get_job_queue.cache_clear()
+    with TestClient(app) as client:
+        client.get("/api/v1/health")
+    assert get_job_queue.cache_info().currsize == 0
+
+
+@pytest.mark.asyncio
+async def test_another_worker_can_poll_a_job(slow_rephrase, db_path):
+    # Two queues on one file stand in for two worker processes
+    accepting = JobQueue(db_path, workers=1)
+    polling = JobQueue(db_path, workers=1, poll_interval=0.01)
+    job = await accepting.submit("Hello", ["casual"])
+
+    seen = await polling.get(job.id)
+    assert seen is not job and seen.status in (QUEUED, RUNNING)
+    seen = await polling.wait(seen, timeout=2)
+    assert seen.status == SUCCEEDED
+    assert seen.result == {"casual": "casual: Hello"}
+    assert polling.stats()["finished"] == 1
+    await accepting.aclose()
+
+
+@pytest.mark.asyncio
+async def test_jobs_endpoints_accept_then_long_poll(slow_rephrase, monkeypatch, db_path):
+    from app.main import app
+
+    queue = JobQueue(db_path, workers=1)
+    monkeypatch.setattr("app.api.v1.endpoints.get_job_queue", lambda: queue)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        res = await ac.post("/api/v1/jobs", json={"text": "Hello", "styles": ["casual"]})
+        assert res.status_code == 202
+        job = res.json()
+        assert job["status"] == "queued"
+        assert res.headers["location"].endswith(f"/api/v1/jobs/{job['id']}")
+
+        res = await ac.get(f"/api/v1/jobs/{job['id']}", params={"wait": 2})
+        assert res.status_code == 200
+        assert res.json() == {"id": job["id"], "status": "succeeded", "result": {"casual": "casual: Hello"}}
+
+        res = await ac.get("/api/v1/jobs/nope")
+        assert res.status_code == 404
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_jobs_endpoint_sheds_load_when_queue_is_full(slow_rephrase, monkeypatch, db_path):
+    from app.main import app
+
+    queue = JobQueue(db_path, workers=1, max_pending=0)
+    monkeypatch.setattr("app.api.v1.endpoints.get_job_queue", lambda: queue)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        res = await ac.post("/api/v1/jobs", json={"text": "Hello"})
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == "1"
+    await queue.aclose()
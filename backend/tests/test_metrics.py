@@ -0,0 +1,99 @@
+# tests/test_metrics.py
+import pytest
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient, ASGITransport
+from app import metrics
+from tests.helpers import mock_response
+
+
+def _sample(text, line_prefix):
+    """Return the value of the first sample line starting with line_prefix."""
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_latency_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    histogram.labels("/a").observe(0.05)
+    histogram.labels("/a").observe(0.5)
+    histogram.labels("/a").observe(5)
+
+    lines = histogram.render()
+    assert "# TYPE test_latency_seconds histogram" in lines
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{route="/a"} 3' in lines
+
+
+def test_counter_and_label_escaping():
+    counter = metrics.Counter("test_events_total", "Test.", ("name",))
+    counter.labels('say "hi"').inc(2)
+    assert 'test_events_total{name="say \\"hi\\""} 2.0' in counter.render()
+
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_route_latency():
+    from app.main import app
+    transport = ASGITransport(app=app)
+
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.get("/api/v1/hello")
+        await ac.get("/no/such/path")
+        res = await ac.get("/metrics")
+
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = res.text
+    prefix = 'http_request_duration_seconds_count{method="GET",route="/api/v1/hello",status="200"}'
+    assert _sample(body, prefix) >= 1
+    assert 'route="unmatched"' in body
+    assert "/no/such/path" not in body
+    assert _sample(body, "http_requests_in_flight") == 1.0  # The /metrics request itself
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_upstream_latency_and_token_usage_are_recorded(mock_client):
+    from app.llm import rephrase
+
+    response = mock_response({"casual": "Hi"})
+    response.usage.prompt_tokens = 40
+    response.usage.completion_tokens = 12
+    mock_client.return_value.chat.completions.create = AsyncMock(return_value=response)
+
+    tokens = metrics.UPSTREAM_TOKENS
+    prompt_before = tokens.labels("prompt").value
+    completion_before = tokens.labels("completion").value
+    calls = metrics.UPSTREAM_REQUEST_DURATION.labels("rephrase", "success")
+    calls_before = calls.count
+
+    await rephrase("Metrics test text")
+
+    assert tokens.labels("prompt").value - prompt_before == 40
+    assert tokens.labels("completion").value - completion_before == 12
+    assert calls.count == calls_before + 1
+    assert metrics.UPSTREAM_REQUESTS_IN_FLIGHT.labels().value == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_rejections_are_counted():
+    from app.main import app
+    from app.security import RateLimiter
+
+    rejections = metrics.RATE_LIMIT_REJECTIONS.labels("rephrase")
+    before = rejections.value
+    limiter = RateLimiter(requests_per_minute=0, requests_per_hour=0)
+
+    with patch("app.api.v1.endpoints.rate_limiter", limiter):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            res = await ac.post("/api/v1/rephrase", json={"text": "Hello"})
+
+    assert res.status_code == 429
+    assert rejections.value == before + 1
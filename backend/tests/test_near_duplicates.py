@@ -0,0 +1,67 @@
+# tests/test_near_duplicates.py
+import pytest
+from unittest.mock import patch, AsyncMock
+from app.near_duplicates import NearDuplicateIndex, canonicalize, get_near_duplicate_index
+from app.streaming import STYLE_KEYS
+from tests.helpers import mock_response
+
+TEXT = (
+    "Could you please send me the quarterly report by Friday? I need it for the "
+    "board meeting next week and want some time to review the numbers first."
+)
+
+
+def test_canonicalize_ignores_case_whitespace_and_punctuation():
+    assert canonicalize("  Hello,   WORLD!!\n") == "hello world"
+    assert canonicalize("Don’t stop.") == canonicalize("don't stop")
+    assert canonicalize("ＦＵＬＬ width") == "full width"
+
+
+def test_index_finds_near_duplicates_only():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add(TEXT, STYLE_KEYS, "key")
+
+    assert index.find(TEXT.upper().replace("?", ""), STYLE_KEYS) == "key"
+    assert index.find(TEXT.replace("Friday", "Monday"), STYLE_KEYS) == "key"
+    assert index.find("Thanks for the lovely dinner last night, see you soon.", STYLE_KEYS) is None
+    assert index.find(TEXT, ("casual",)) is None
+    assert index.stats()["hits"] == 2
+
+
+def test_index_is_bounded_and_forgets_discarded_keys():
+    index = NearDuplicateIndex(max_entries=2)
+    index.add("first text about apples and pears", STYLE_KEYS, "a")
+    index.add("second text about trains and buses", STYLE_KEYS, "b")
+    index.find("First text about apples and pears.", STYLE_KEYS)  # "b" is now the oldest
+    index.add("third text about rivers and lakes", STYLE_KEYS, "c")
+
+    assert len(index) == 2
+    assert index.find("second text about trains and buses", STYLE_KEYS) is None
+    index.discard("a")
+    assert index.find("first text about apples and pears", STYLE_KEYS) is None
+    assert index.find("third text about rivers and lakes", STYLE_KEYS) == "c"
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_rephrase_reuses_result_for_near_duplicate(mock_client, monkeypatch):
+    from app.config import get_settings
+    from app.llm import rephrase
+
+    monkeypatch.setattr(get_settings(), "near_duplicate_enabled", True)
+    monkeypatch.setattr(get_settings(), "near_duplicate_threshold", 0.8)
+    get_near_duplicate_index.cache_clear()
+
+    result = {style: f"{style} version" for style in STYLE_KEYS}
+    response = mock_response(result)
+    create = AsyncMock(return_value=response)
+    mock_client.return_value.chat.completions.create = create
+
+    try:
+        assert await rephrase(TEXT) == result
+        assert await rephrase(TEXT.lower().replace("?", "!")) == result
+        assert create.await_count == 1
+        await rephrase("Something else entirely, about the weather this weekend.")
+        assert create.await_count == 2
+    finally:
+        get_near_duplicate_index.cache_clear()
@@ -0,0 +1,112 @@
+# tests/test_pacing.py
+import pytest
+from app.pacing import RateLimitPacer, QuotaExhausted, parse_duration
+from tests.helpers import FakeClock
+
+
+def _headers(remaining_requests, remaining_tokens, reset="10s", limit_requests=100, limit_tokens=10000):
+    return {
+        "x-ratelimit-limit-requests": str(limit_requests),
+        "x-ratelimit-remaining-requests": str(remaining_requests),
+        "x-ratelimit-reset-requests": reset,
+        "x-ratelimit-limit-tokens": str(limit_tokens),
+        "x-ratelimit-remaining-tokens": str(remaining_tokens),
+        "x-ratelimit-reset-tokens": reset,
+    }
+
+
+def test_parse_duration():
+    assert parse_duration("6m0s") == 360.0
+    assert parse_duration("1h2m3.5s") == 3723.5
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("2") == 2.0
+    assert parse_duration("soon") is None
+    assert parse_duration(None) is None
+
+
+def test_no_headers_means_no_pacing():
+    pacer = RateLimitPacer()
+    assert all(pacer.reserve(500) == 0 for _ in range(1000))
+
+
+def test_plenty_of_budget_is_not_delayed():
+    pacer = RateLimitPacer(clock=FakeClock())
+    pacer.update(_headers(90, 9000))
+    assert pacer.reserve(100) == 0
+    assert pacer.stats()["remaining_requests"] == 89
+    assert pacer.stats()["remaining_tokens"] == 8900
+
+
+def test_low_budget_spreads_calls_over_the_window():
+    pacer = RateLimitPacer(max_wait=5, clock=FakeClock())
+    pacer.update(_headers(4, 9000, reset="10s"))
+    delays = [pacer.reserve(10) for _ in range(4)]
+    assert all(0 < delay <= 5 for delay in delays)
+    assert delays == sorted(delays)
+    assert pacer.paced == 4
+
+
+def test_call_that_cannot_fit_before_reset_is_rejected():
+    clock = FakeClock()
+    pacer = RateLimitPacer(max_wait=2, clock=clock)
+    pacer.update(_headers(50, 300, reset="30s"))
+
+    with pytest.raises(QuotaExhausted) as exc_info:
+        pacer.reserve(500)
+    assert exc_info.value.retry_after == pytest.approx(30)
+    assert pacer.rejected == 1
+
+    # A short wait for the reset is taken rather than rejected
+    clock.now += 29
+    assert pacer.reserve(500) == pytest.approx(1)
+
+
+def test_budget_refills_after_reset():
+    clock = FakeClock()
+    pacer = RateLimitPacer(max_wait=1, clock=clock)
+    pacer.update(_headers(0, 9000, reset="5s"))
+    with pytest.raises(QuotaExhausted):
+        pacer.reserve(10)
+
+    clock.now += 6
+    assert pacer.reserve(10) == 0
+    assert pacer.stats()["remaining_requests"] == 99
+
+
+def test_429_blocks_until_retry_after():
+    clock = FakeClock()
+    pacer = RateLimitPacer(max_wait=1, clock=clock)
+    pacer.update({"retry-after-ms": "3000"}, status_code=429)
+    assert pacer.retry_after() == pytest.approx(3)
+    with pytest.raises(QuotaExhausted):
+        pacer.reserve(10)
+
+    clock.now += 2.5
+    assert pacer.reserve(10) == pytest.approx(0.5)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fake_openai", [{"rpm_limit": 2}], indirect=True)
+async def test_exhausted_quota_is_rejected_without_calling_upstream(fake_openai, monkeypatch):
+    from app.llm import rephrase, LLMOverloadedError
+
+    monkeypatch.setattr("app.llm.pacer", RateLimitPacer(max_wait=2))
+    await rephrase("First call")
+    await rephrase("Second call")
+    with pytest.raises(LLMOverloadedError) as exc_info:
+        await rephrase("Third call")
+
+    assert exc_info.value.retry_after > 2
+    assert fake_openai.requests == 2
+    assert fake_openai.quota_rejections == 0
+
+
+def test_check_does_not_reserve():
+    pacer = RateLimitPacer(max_wait=1, clock=FakeClock())
+    pacer.update(_headers(50, 9000, reset="30s"))
+    assert pacer.check(100) == 0
+    assert pacer.stats()["remaining_tokens"] == 9000
+
+    pacer.update(_headers(0, 9000, reset="30s"))
+    with pytest.raises(QuotaExhausted):
+        pacer.check()
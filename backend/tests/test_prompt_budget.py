@@ -0,0 +1,78 @@
+# tests/test_prompt_budget.py
+import pytest
+from unittest.mock import patch, AsyncMock
+from app.tokens import count_tokens
+from tests.helpers import mock_response
+
+
+def _mock_create():
+    async def create(**kwargs):
+        styles = kwargs["response_format"]["json_schema"]["schema"]["required"]
+        return mock_response({style: "ok" for style in styles})
+    return AsyncMock(side_effect=create)
+
+
+def test_count_tokens_estimate_without_a_model():
+    assert count_tokens("abcd" * 10) == 10
+    assert count_tokens("abcde") == 2
+    assert count_tokens("") == 0
+    # Not much shorter than a tokenizer's count for non-Latin scripts
+    assert count_tokens("这个项目我需要帮助") == 9
+    assert count_tokens("help 帮助") == 4
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_instruction_prefix_is_identical_across_calls(mock_client):
+    from app.llm import rephrase
+
+    create = _mock_create()
+    mock_client.return_value.chat.completions.create = create
+
+    await rephrase("Short one")
+    await rephrase("A different and rather longer message to rewrite", styles=["casual"])
+
+    first, second = (call.kwargs["messages"] for call in create.await_args_list)
+    assert first[0] == second[0]
+    assert first[0]["role"] == "system"
+    # The user's text is sent as is, after the shared prefix
+    assert first[1] == {"role": "user", "content": "Short one"}
+    assert second[1]["content"] == "A different and rather longer message to rewrite"
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_max_tokens_scales_with_input_up_to_the_ceiling(mock_client, monkeypatch):
+    from app.config import get_settings
+    from app.llm import rephrase
+
+    create = _mock_create()
+    mock_client.return_value.chat.completions.create = create
+    settings = get_settings()
+
+    await rephrase("Hi there")
+    await rephrase("word " * 200)
+    await rephrase("term " * 200, styles=["casual"])
+    short, long, long_single = (call.kwargs["max_tokens"] for call in create.await_args_list)
+    assert short < long
+    assert long_single < long
+    assert short < 1000  # The old fixed budget
+
+    monkeypatch.setattr(settings, "max_tokens", 300)
+    await rephrase("word " * 300)
+    assert create.await_args.kwargs["max_tokens"] == 300
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_fixed_budget_when_adaptive_is_off(mock_client, monkeypatch):
+    from app.config import get_settings
+    from app.llm import rephrase
+
+    create = _mock_create()
+    mock_client.return_value.chat.completions.create = create
+    settings = get_settings()
+    monkeypatch.setattr(settings, "adaptive_max_tokens", False)
+
+    await rephrase("Hi there")
+    assert create.await_args.kwargs["max_tokens"] == settings.max_tokens
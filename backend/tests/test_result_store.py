@@ -0,0 +1,174 @@
+# tests/test_result_store.py
+import json
+import sqlite3
+import pytest
+from unittest.mock import patch, AsyncMock
+from app.cache import ResponseCache
+from app.result_store import ResultStore, get_result_store, warm_cache
+from tests.helpers import FakeClock, mock_response
+
+RESULT = {"casual": "Could use some help on this project.", "polite": "I would appreciate some help."}
+
+
+@pytest.mark.asyncio
+async def test_results_survive_a_new_store_on_the_same_file(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    store = ResultStore(path)
+    assert await store.get("a") is None
+    await store.set("a", RESULT)
+
+    reopened = ResultStore(path)
+    assert await reopened.get("a") == RESULT
+    stats = reopened.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] == len("a") + len(json.dumps(RESULT).encode("utf-8"))
+
+
+@pytest.mark.asyncio
+async def test_expired_results_are_not_returned(tmp_path):
+    clock = FakeClock()
+    store = ResultStore(str(tmp_path / "results.sqlite3"), ttl_seconds=60, clock=clock)
+    await store.set("a", RESULT)
+    clock.now += 61
+    assert await store.get("a") is None
+    assert await store.compact() == 1
+    assert store.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_compaction_drops_least_recently_read_to_low_water(tmp_path):
+    clock = FakeClock()
+    entry_size = len("k0") + len(json.dumps(RESULT).encode("utf-8"))
+    store = ResultStore(str(tmp_path / "results.sqlite3"), max_bytes=entry_size * 5, low_water=0.6, clock=clock)
+    for i in range(5):
+        clock.now += 1
+        await store.set(f"k{i}", RESULT)
+    clock.now += 1
+    await store.get("k0")  # Read recently, so it's kept
+
+    clock.now += 1
+    await store.set("k5", RESULT)  # Over budget: trim to 3 entries
+    stats = store.stats()
+    assert stats["compactions"] == 1
+    assert stats["bytes"] <= entry_size * 3
+    assert await store.get("k0") == RESULT
+    assert await store.get("k5") == RESULT
+    assert await store.get("k1") is None
+
+
+@pytest.mark.asyncio
+async def test_reads_do_not_wait_for_writers(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    store = ResultStore(path)
+    await store.set("a", RESULT)
+
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        assert await store.get("a") == RESULT
+        assert store.errors == 0
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+    # The read is recorded on the next write
+    await store.set("b", RESULT)
+    reads = store._connection().execute("SELECT reads FROM results WHERE key = 'a'").fetchone()[0]
+    assert reads == 1
+
+
+@pytest.mark.asyncio
+async def test_warm_cache_loads_the_most_read_results(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    for key in ("cold", "warm", "hot"):
+        await store.set(key, {"casual": key})
+    await store.get("hot")
+    await store.get("hot")
+    await store.get("warm")
+
+    cache = ResponseCache(max_entries=2)
+    assert await warm_cache(store, cache, limit=10) == 2
+    assert cache.get("hot") == {"casual": "hot"}
+    assert cache.get("warm") == {"casual": "warm"}
+    assert cache.get("cold") is None
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_rephrase_reads_results_stored_before_a_restart(mock_client, tmp_path, monkeypatch):
+    from app.config import get_settings
+    from app.cache import get_response_cache
+    from app.llm import rephrase
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "result_store_enabled", True)
+    monkeypatch.setattr(settings, "result_store_path", str(tmp_path / "results.sqlite3"))
+    get_result_store.cache_clear()
+
+    response = mock_response(RESULT)
+    create = AsyncMock(return_value=response)
+    mock_client.return_value.chat.completions.create = create
+
+    try:
+        styles = ["casual", "polite"]
+        assert await rephrase("Help me with this project", styles=styles) == RESULT
+        # As if restarted: the in-memory cache is gone but the file isn't
+        get_response_cache().clear()
+        get_result_store.cache_clear()
+        assert await rephrase("Help me with this project", styles=styles) == RESULT
+        assert create.await_count == 1
+        assert get_result_store().stats()["hits"] == 1
+    finally:
+        get_result_store.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_unreadable_store_counts_as_a_miss(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    await store.set("a", RESULT)
+    (tmp_path / "results.sqlite3").write_bytes(b"not a database" * 1000)
+    store.after_fork()  # Reconnect to the broken file
+
+    assert await store.get("a") is None
+    assert await store.hottest(10) == []
+    assert store.errors == 2
+
+
+def test_status_reports_a_store_that_cannot_be_opened(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.config import get_settings
+    from app.main import app
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "result_store_enabled", True)
+    monkeypatch.setattr(settings, "result_store_path", str(tmp_path))  # A directory
+    get_result_store.cache_clear()
+    try:
+        res = TestClient(app).get("/api/v1/status")
+    finally:
+        get_result_store.cache_clear()
+
+    assert res.status_code == 200
+    assert res.json()["result_store"]["enabled"] is True
+    assert res.json()["result_store"]["error"]
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_rephrase_works_when_the_store_cannot_be_opened(mock_client, tmp_path, monkeypatch):
+    from app.config import get_settings
+    from app.llm import load_stored_results, rephrase
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "result_store_enabled", True)
+    monkeypatch.setattr(settings, "result_store_path", str(tmp_path))  # A directory
+    get_result_store.cache_clear()
+
+    response = mock_response(RESULT)
+    mock_client.return_value.chat.completions.create = AsyncMock(return_value=response)
+
+    try:
+        assert await rephrase("Help me with this project", styles=["casual", "polite"]) == RESULT
+        assert await load_stored_results() == 0
+    finally:
+        get_result_store.cache_clear()
@@ -0,0 +1,128 @@
+# tests/test_router.py
+import pytest
+from app.backends import Backend, LLMRouter, parse_backends
+from benchmarks.fake_openai import FakeConfig
+from benchmarks.load_test import free_port, start_fake_openai
+from tests.helpers import FakeClock
+
+
+def _router(clock=None, **kwargs):
+    fast = Backend("fast", "gpt-4o-mini", client=None, max_input_tokens=100)
+    strong = Backend("strong", "gpt-4o", client=None)
+    return LLMRouter([strong, fast], clock=clock or FakeClock(0.0), **kwargs), fast, strong
+
+
+def test_short_inputs_go_to_the_smallest_fitting_backend():
+    router, fast, strong = _router()
+    assert router.route(50) == [fast, strong]
+    assert router.route(500) == [strong, fast]
+
+
+def test_erroring_backend_cools_down_then_returns():
+    clock = FakeClock(0.0)
+    router, fast, strong = _router(clock, max_error_rate=0.3, cooldown=30)
+    for _ in range(2):
+        router.record_failure(fast)
+    assert router.route(50) == [strong, fast]
+    assert router.stats()["fast"]["available"] is False
+
+    clock.now = 31
+    assert router.route(50) == [fast, strong]
+    # Half trusted on return: one more failure sends it straight back
+    router.record_failure(fast)
+    assert router.route(50) == [strong, fast]
+
+
+def test_slow_backend_gives_way_to_a_much_faster_one():
+    router, fast, strong = _router(slow_factor=3)
+    router.record_success(fast, latency=2.0)
+    router.record_success(strong, latency=1.0)
+    assert router.route(50) == [fast, strong]
+
+    for _ in range(10):
+        router.record_success(fast, latency=10.0)
+    assert router.route(50) == [strong, fast]
+
+
+def test_slow_backend_only_gives_way_to_backends_the_input_fits():
+    router, fast, strong = _router(slow_factor=3)
+    router.record_success(fast, latency=0.5)
+    router.record_success(strong, latency=5.0)
+    assert router.route(1000) == [strong, fast]
+
+
+def test_slow_backend_is_probed_so_it_can_recover():
+    clock = FakeClock(0.0)
+    router, fast, strong = _router(clock, slow_factor=3, probe_interval=10)
+    router.record_success(strong, latency=1.0)
+    router.record_success(fast, latency=10.0)
+    assert router.route(50) == [strong, fast]
+    clock.now = 5
+    assert router.route(50) == [strong, fast]
+
+    clock.now = 10
+    assert router.route(50) == [fast, strong]  # The probe
+    assert router.route(50) == [strong, fast]
+    for _ in range(20):
+        router.record_success(fast, latency=0.5)
+    assert router.route(50) == [fast, strong]
+
+
+def test_parse_backends_validates_entries():
+    configs = parse_backends('[{"name": "a", "model": "m"}, {"name": "b", "model": "n"}]')
+    assert [c["name"] for c in configs] == ["a", "b"]
+    for raw in ("not json", "[]", '[{"name": "a"}]', '[{"name": "a", "model": "m"}, {"name": "a", "model": "n"}]'):
+        with pytest.raises(ValueError):
+            parse_backends(raw)
+
+
+@pytest.fixture
+def two_backends(monkeypatch):
+    """A fast backend for short inputs and a strong one, each on its own fake server."""
+    from app.config import get_settings
+    from app.llm import _build_backend
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test-00000000000000000000000000")
+    monkeypatch.setattr(settings, "openai_max_retries", 0)
+
+    configs, servers, backends = {}, [], []
+    for name, model, max_input_tokens in (("fast", "gpt-4o-mini", 20), ("strong", "gpt-4o", None)):
+        configs[name] = FakeConfig(latency_ms=0, tokens_per_second=0, seed=1)
+        port = free_port()
+        servers.append(start_fake_openai(configs[name], port))
+        backends.append(_build_backend({
+            "name": name,
+            "model": model,
+            "max_input_tokens": max_input_tokens,
+            "base_url": f"http://127.0.0.1:{port}/v1",
+        }))
+    router = LLMRouter(backends)
+    monkeypatch.setattr("app.llm.router", router)
+    yield configs, router
+    for server in servers:
+        server.should_exit = True
+
+
+@pytest.mark.asyncio
+async def test_inputs_are_routed_by_length(two_backends):
+    from app.llm import rephrase
+
+    configs, _ = two_backends
+    await rephrase("Short message")
+    await rephrase("A much longer message " * 10)
+    assert configs["fast"].requests == 1
+    assert configs["strong"].requests == 1
+
+
+@pytest.mark.asyncio
+async def test_failing_backend_fails_over(two_backends):
+    from app.llm import rephrase
+
+    configs, router = two_backends
+    configs["fast"].error_rate_5xx = 1.0
+
+    result = await rephrase("Route me")
+    assert result["professional"]
+    assert configs["strong"].requests == 1
+    assert router.stats()["fast"]["failures"] == 1
@@ -1,6 +1,7 @@
 # tests/test_security.py
 import pytest
 from httpx import AsyncClient, ASGITransport
+from tests.helpers import FakeClock
 
 @pytest.mark.asyncio
 async def test_api_key_validation():
@@ -107,3 +108,145 @@ async def test_cors_headers():
         assert "access-control-allow-credentials" in headers
         assert headers["access-control-allow-origin"] == "http://localhost:3000"
         assert headers["access-control-allow-credentials"] == "true"
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_minute_limit_and_refill():
+    """Burst up to the minute limit, then refill at the per-minute rate."""
+    from app.security import RateLimiter
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=3, requests_per_hour=100, clock=clock)
+    
+    assert all([await limiter.is_allowed("1.1.1.1") for _ in range(3)])
+    assert await limiter.is_allowed("1.1.1.1") == False
+    # Other clients are unaffected
+    assert await limiter.is_allowed("2.2.2.2") == True
+    
+    clock.now += 20  # One token per 20 seconds
+    assert await limiter.is_allowed("1.1.1.1") == True
+    assert await limiter.is_allowed("1.1.1.1") == False
+
+@pytest.mark.asyncio
+async def test_rate_limiter_hour_limit():
+    from app.security import RateLimiter
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=10, requests_per_hour=12, clock=clock)
+    
+    assert all([await limiter.is_allowed("1.1.1.1") for _ in range(10)])
+    clock.now += 60
+    assert await limiter.is_allowed("1.1.1.1") == True
+    assert await limiter.is_allowed("1.1.1.1") == True
+    assert await limiter.is_allowed("1.1.1.1") == False
+
+@pytest.mark.asyncio
+async def test_rate_limiter_cost():
+    from app.security import RateLimiter
+    limiter = RateLimiter(requests_per_minute=10, requests_per_hour=100, clock=FakeClock())
+    
+    assert await limiter.is_allowed("1.1.1.1", cost=8) == True
+    assert await limiter.is_allowed("1.1.1.1", cost=3) == False
+    assert await limiter.is_allowed("1.1.1.1", cost=2) == True
+
+@pytest.mark.asyncio
+async def test_rate_limiter_evicts_idle_clients():
+    from app.security import RateLimiter
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=5, requests_per_hour=50, clock=clock)
+    
+    for i in range(100):
+        await limiter.is_allowed(f"10.0.0.{i}")
+    assert len(limiter) == 100
+    
+    clock.now += 1800
+    await limiter.is_allowed("10.0.1.1")
+    assert len(limiter) == 101
+    
+    clock.now += 1800
+    await limiter.is_allowed("10.0.1.1")
+    assert len(limiter) == 1
+
+@pytest.mark.asyncio
+async def test_shared_rate_limiter_limits_across_instances(tmp_path):
+    """Two limiters on the same file behave like one, as two workers would."""
+    from app.security import SharedRateLimiter
+    path = str(tmp_path / "limits.sqlite3")
+    clock = FakeClock()
+    worker_a = SharedRateLimiter(path, requests_per_minute=4, requests_per_hour=100, clock=clock)
+    worker_b = SharedRateLimiter(path, requests_per_minute=4, requests_per_hour=100, clock=clock)
+    
+    assert await worker_a.is_allowed("1.1.1.1") == True
+    assert await worker_b.is_allowed("1.1.1.1") == True
+    assert await worker_a.is_allowed("1.1.1.1", cost=2) == True
+    assert await worker_b.is_allowed("1.1.1.1") == False
+    assert await worker_b.is_allowed("2.2.2.2") == True
+    
+    clock.now += 15  # One token per 15 seconds
+    assert await worker_b.is_allowed("1.1.1.1") == True
+    assert await worker_a.is_allowed("1.1.1.1") == False
+    assert len(worker_a) == 2
+
+@pytest.mark.asyncio
+async def test_shared_rate_limiter_evicts_idle_clients(tmp_path):
+    from app.security import SharedRateLimiter
+    clock = FakeClock()
+    limiter = SharedRateLimiter(
+        str(tmp_path / "limits.sqlite3"), requests_per_minute=5, requests_per_hour=50, clock=clock
+    )
+    
+    await limiter.is_allowed("1.1.1.1")
+    clock.now += 3600
+    await limiter.is_allowed("2.2.2.2")
+    assert len(limiter) == 1
+
+def _use_shared_limiter(path: str) -> int:
+    import asyncio
+    from app.security import SharedRateLimiter
+    limiter = SharedRateLimiter(path, requests_per_minute=50, requests_per_hour=1000)
+    
+    async def run():
+        return sum([await limiter.is_allowed("1.1.1.1") for _ in range(40)])
+    return asyncio.run(run())
+
+def test_shared_rate_limiter_across_processes(tmp_path):
+    from concurrent.futures import ProcessPoolExecutor
+    path = str(tmp_path / "limits.sqlite3")
+    from app.security import SharedRateLimiter
+    SharedRateLimiter(path)  # Create the schema up front
+    
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        allowed = sum(pool.map(_use_shared_limiter, [path, path]))
+    assert allowed == 50
+
+@pytest.mark.asyncio
+async def test_security_headers_on_streaming_response():
+    """Streaming responses get the headers without being buffered."""
+    from app.main import app
+    from unittest.mock import patch
+    
+    async def fake_stream(text, styles=None):
+        yield '{"casual": "Hi"}'
+    
+    with patch("app.api.v1.endpoints.rephrase_stream", fake_stream):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            response = await ac.post("/api/v1/rephrase-stream", json={"text": "Hello"})
+    
+    assert response.status_code == 200
+    assert response.headers["X-Frame-Options"] == "DENY"
+    assert response.headers["Content-Security-Policy"].startswith("default-src 'self'")
+    assert len(response.headers.get_list("X-Content-Type-Options")) == 1
+
+@pytest.mark.asyncio
+async def test_security_headers_replace_ones_the_app_set():
+    """A response setting one of the headers itself doesn't end up with two."""
+    from starlette.responses import PlainTextResponse
+    from app.middleware import SecurityHeadersMiddleware
+    
+    inner = PlainTextResponse("ok", headers={"X-Frame-Options": "SAMEORIGIN", "X-Custom": "kept"})
+    transport = ASGITransport(app=SecurityHeadersMiddleware(inner))
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.get("/")
+    
+    assert response.headers.get_list("X-Frame-Options") == ["DENY"]
+    assert response.headers["X-Custom"] == "kept"
+    assert response.text == "ok"
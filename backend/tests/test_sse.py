@@ -0,0 +1,130 @@
+# tests/test_sse.py
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import patch
+from app import metrics
+from app.streaming import HEARTBEAT, with_heartbeats
+
+
+async def _never_disconnected():
+    return False
+
+
+def _request(body: dict, disconnect_after: float, headers: tuple = ()):
+    """ASGI scope and receive for a POST whose client hangs up after a while."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/api/v1/rephrase-stream",
+        "raw_path": b"/api/v1/rephrase-stream", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"test"), (b"content-type", b"application/json"), *headers],
+        "client": ("127.0.0.1", 1234), "server": ("test", 80),
+    }
+    messages = [{"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}]
+    hang_up_at = time.monotonic() + disconnect_after
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Like uvicorn: a disconnect, once it happened, is returned without awaiting
+        if time.monotonic() < hang_up_at:
+            await asyncio.sleep(hang_up_at - time.monotonic())
+        return {"type": "http.disconnect"}
+
+    return scope, receive
+
+
+@pytest.mark.asyncio
+async def test_heartbeats_fill_silences():
+    async def slow_events():
+        yield "event: a\n\n"
+        await asyncio.sleep(0.2)
+        yield "event: b\n\n"
+
+    out = [e async for e in with_heartbeats(slow_events(), 0.05, _never_disconnected, poll=0.01)]
+    assert out[0] == "event: a\n\n" and out[-1] == "event: b\n\n"
+    assert HEARTBEAT in out
+
+
+@pytest.mark.asyncio
+async def test_relay_stops_and_closes_source_on_disconnect():
+    closed = asyncio.Event()
+
+    async def endless():
+        try:
+            while True:
+                yield "event: tick\n\n"
+                await asyncio.sleep(0.01)
+        finally:
+            closed.set()
+
+    gone = False
+
+    async def is_disconnected():
+        return gone
+
+    out = []
+    async for event in with_heartbeats(endless(), 1.0, is_disconnected, poll=0.01):
+        out.append(event)
+        gone = len(out) >= 3
+    assert len(out) == 3
+    assert closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_is_event_stream_and_stops_on_disconnect(monkeypatch):
+    from app.main import app
+    from app.stream_buffer import StreamRegistry
+
+    # No grace period for a reconnect: stop as soon as the client leaves
+    registry = StreamRegistry(grace=0)
+    monkeypatch.setattr("app.api.v1.endpoints.get_stream_registry", lambda: registry)
+
+    upstream_closed = asyncio.Event()
+    sent = 0
+
+    async def endless_stream(text, styles=None):
+        nonlocal sent
+        try:
+            yield '{"casual": "'
+            while True:
+                sent += 1
+                yield "word "
+                await asyncio.sleep(0.01)
+        finally:
+            upstream_closed.set()
+
+    scope, receive = _request({"text": "Hello"}, disconnect_after=0.1)
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    with patch("app.api.v1.endpoints.rephrase_stream", endless_stream):
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+        await asyncio.wait_for(upstream_closed.wait(), timeout=1)
+
+    start = messages[0]
+    assert start["status"] == 200
+    assert dict(start["headers"])[b"content-type"].startswith(b"text/event-stream")
+    assert sent < 100
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fake_openai", [{"tokens_per_second": 100}], indirect=True)
+async def test_aborted_stream_closes_upstream_and_counts_tokens_saved(fake_openai):
+    from app.llm import rephrase_stream
+
+    saved_before = metrics.STREAM_TOKENS_SAVED.labels().value
+    chunks = rephrase_stream("Please stop me early, I am a long enough message")
+    async for _ in chunks:
+        break
+    await chunks.aclose()
+    # Long enough for the whole completion, had it kept streaming
+    await asyncio.sleep(fake_openai.completion_tokens / 100 + 0.2)
+
+    assert metrics.STREAM_ABORTS.labels().value >= 1
+    assert metrics.STREAM_TOKENS_SAVED.labels().value > saved_before
+    # The fake stops sending once the connection is closed
+    assert fake_openai.streamed_tokens < fake_openai.completion_tokens
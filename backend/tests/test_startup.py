@@ -0,0 +1,22 @@
+# tests/test_startup.py
+"""
+Cold-start regression checks. Budgets are loose enough for a busy CI
+machine and can be tightened with STARTUP_IMPORT_BUDGET and
+STARTUP_FIRST_REQUEST_BUDGET (seconds).
+"""
+import os
+from benchmarks.startup import measure_first_requests, measure_import
+
+IMPORT_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", "2.0"))
+FIRST_REQUEST_BUDGET = float(os.getenv("STARTUP_FIRST_REQUEST_BUDGET", "10.0"))
+
+
+def test_importing_the_app_skips_heavy_modules():
+    result = measure_import()
+    assert result["heavy"] == []
+    assert result["seconds"] < IMPORT_BUDGET
+
+
+def test_time_to_first_successful_request():
+    times = measure_first_requests()
+    assert times["health"] <= times["rephrase"] < FIRST_REQUEST_BUDGET
@@ -0,0 +1,135 @@
+# tests/test_stream_parser.py
+import json
+import pytest
+from unittest.mock import patch
+from httpx import AsyncClient, ASGITransport
+from app.streaming import StyleStreamParser, StreamParseError, format_sse
+
+PAYLOAD = {
+    "professional": "Let's schedule a meeting to discuss AI.",
+    "casual": "Hey, let's chat about AI!",
+    "polite": "Would you \"kindly\" join a discussion on AI?\nThanks.",
+    "social_media": "Huddle time: AI \U0001F680 café",
+}
+
+
+def _feed_all(parser, chunks):
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events
+
+
+def _rebuild(events):
+    texts = {}
+    for event, data in events:
+        if event == "delta":
+            texts[data["style"]] = texts.get(data["style"], "") + data["text"]
+    return texts
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_parser_handles_every_chunk_boundary(ensure_ascii):
+    raw = json.dumps(PAYLOAD, ensure_ascii=ensure_ascii)
+    parser = StyleStreamParser()
+    events = _feed_all(parser, list(raw))
+
+    assert parser.complete
+    assert parser.result() == PAYLOAD
+    assert _rebuild(events) == PAYLOAD
+
+    completed = [data["style"] for event, data in events if event == "style_complete"]
+    assert completed == list(PAYLOAD)
+
+
+def test_parser_emits_style_complete_before_stream_ends():
+    raw = json.dumps(PAYLOAD)
+    cut = raw.index('"casual"')
+    parser = StyleStreamParser()
+    events = parser.feed(raw[:cut])
+
+    assert ("style_complete", {"style": "professional", "text": PAYLOAD["professional"]}) in events
+    assert not parser.complete
+
+
+def test_parser_coalesces_deltas_per_chunk():
+    parser = StyleStreamParser()
+    events = parser.feed('{"casual": "Hey the')
+    assert events == [("delta", {"style": "casual", "text": "Hey the"})]
+
+
+def test_parser_skips_untracked_keys():
+    raw = '{"note": {"a": [1, "}"]}, "casual": "Hi", "count": 3}'
+    parser = StyleStreamParser()
+    events = _feed_all(parser, [raw[:12], raw[12:30], raw[30:]])
+
+    assert parser.complete
+    assert _rebuild(events) == {"casual": "Hi"}
+    assert parser.result()["casual"] == "Hi"
+    assert parser.result()["professional"] == ""
+
+
+def test_parser_rejects_incomplete_or_invalid_json():
+    parser = StyleStreamParser()
+    parser.feed('{"casual": "Hi')
+    with pytest.raises(StreamParseError):
+        parser.result()
+
+    with pytest.raises(StreamParseError):
+        StyleStreamParser().feed("not json")
+
+
+def test_format_sse():
+    assert format_sse("delta", {"style": "casual", "text": "hé"}) == (
+        'event: delta\ndata: {"style": "casual", "text": "hé"}\n\n'
+    )
+
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_emits_typed_events():
+    from app.main import app
+
+    raw = json.dumps(PAYLOAD)
+
+    async def fake_stream(text, styles=None):
+        for i in range(0, len(raw), 7):
+            yield raw[i:i + 7]
+
+    with patch("app.api.v1.endpoints.rephrase_stream", fake_stream):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            res = await ac.post("/api/v1/rephrase-stream", json={"text": "Hello"})
+
+    assert res.status_code == 200
+    events = _parse_sse(res.text)
+    names = [event for event, _ in events]
+    assert names[-1] == "done"
+    assert names.count("style_complete") == 4
+    assert names.index("style_complete") < names.index("delta", names.index("style_complete"))
+    assert events[-1][1] == PAYLOAD
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_reports_errors_in_band():
+    from app.main import app
+    from app.llm import LLMError
+
+    async def failing_stream(text, styles=None):
+        yield '{"casual": "Hi'
+        raise LLMError("boom")
+
+    with patch("app.api.v1.endpoints.rephrase_stream", failing_stream):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            res = await ac.post("/api/v1/rephrase-stream", json={"text": "Hello"})
+
+    events = _parse_sse(res.text)
+    assert events[-1] == ("error", {"detail": "LLM call failed"})
@@ -0,0 +1,145 @@
+# tests/test_stream_resume.py
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.stream_buffer import StreamRegistry, fingerprint
+from tests.test_sse import _request
+
+
+async def _events(n, delay=0.0, closed=None):
+    try:
+        for i in range(n):
+            yield f"event: e\ndata: {i}\n\n"
+            await asyncio.sleep(delay)
+    finally:
+        if closed is not None:
+            closed.set()
+
+
+def _ids(events):
+    return [line[4:] for e in events for line in e.splitlines() if line.startswith("id: ")]
+
+
+@pytest.mark.asyncio
+async def test_resume_replays_events_after_last_event_id():
+    registry = StreamRegistry()
+    session = registry.start(_events(4), "fp")
+    first = [e async for e in registry.subscribe(session)]
+    assert len(first) == 4
+    assert _ids(first) == [f"{session.id}:{i}" for i in range(4)]
+
+    found = registry.find(_ids(first)[1], "fp")
+    assert found == (session, 1)
+    rest = [e async for e in registry.subscribe(*found)]
+    assert rest == first[2:]
+
+
+@pytest.mark.asyncio
+async def test_resume_needs_matching_body_and_known_id():
+    registry = StreamRegistry()
+    session = registry.start(_events(1), "fp")
+    await session.task
+    assert registry.find(f"{session.id}:0", "other body") is None
+    assert registry.find("unknown:0", "fp") is None
+    assert registry.find(session.id, "fp") is None
+    assert registry.find(None, "fp") is None
+
+
+@pytest.mark.asyncio
+async def test_generation_is_stopped_once_grace_runs_out():
+    closed = asyncio.Event()
+    registry = StreamRegistry(grace=0.05)
+    session = registry.start(_events(1000, delay=0.01, closed=closed), "fp")
+
+    events = registry.subscribe(session)
+    await events.__anext__()
+    await events.aclose()
+    # A reconnect within the grace period keeps it going
+    await asyncio.sleep(0.02)
+    events = registry.subscribe(session, 0)
+    await events.__anext__()
+    await asyncio.sleep(0.1)
+    assert not closed.is_set()
+
+    await events.aclose()
+    await asyncio.wait_for(closed.wait(), timeout=1)
+    assert session.done and len(session.events) < 1000
+    # Cut short, so it can't be resumed into a stream that never finishes
+    assert registry.find(f"{session.id}:0", "fp") is None
+    assert len(registry) == 0
+
+
+@pytest.mark.asyncio
+async def test_finished_streams_expire_and_oldest_are_evicted():
+    now = [0.0]
+    registry = StreamRegistry(max_streams=2, ttl=10, clock=lambda: now[0])
+    a = registry.start(_events(1), "a")
+    await a.task
+    now[0] = 11
+    assert registry.find(f"{a.id}:0", "a") is None
+    assert registry.stats()["streams"] == 0
+
+    sessions = [registry.start(_events(1), str(i)) for i in range(3)]
+    await asyncio.gather(*(s.task for s in sessions))
+    assert len(registry) == 2
+    assert registry.find(f"{sessions[0].id}:0", "0") is None
+
+    registry = StreamRegistry(max_bytes=100)
+    big = registry.start(_events(10), "big")
+    await big.task
+    small = registry.start(_events(1), "small")
+    await small.task
+    assert registry.find(f"{big.id}:0", "big") is None
+    assert registry.stats()["bytes"] < 100
+
+
+def _sse_body(messages):
+    return b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body").decode()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_attaches_to_running_generation(monkeypatch):
+    from app.main import app
+
+    registry = StreamRegistry()
+    monkeypatch.setattr("app.api.v1.endpoints.get_stream_registry", lambda: registry)
+    calls = 0
+
+    async def slow_stream(text, styles=None):
+        nonlocal calls
+        calls += 1
+        for piece in ['{"casual": "', "one ", "two ", "three", '"}']:
+            yield piece
+            await asyncio.sleep(0.05)
+
+    body = {"text": "Hello", "styles": ["casual"]}
+    first, second = [], []
+
+    async def collect(messages):
+        async def send(message):
+            messages.append(message)
+        return send
+
+    with patch("app.api.v1.endpoints.rephrase_stream", slow_stream):
+        scope, receive = _request(body, disconnect_after=0.08)
+        await asyncio.wait_for(app(scope, receive, await collect(first)), timeout=5)
+        stream_id = dict(first[0]["headers"])[b"x-stream-id"].decode()
+        seen = _ids(_sse_body(first).split("\n\n"))
+        assert seen and "event: done" not in _sse_body(first)
+
+        headers = ((b"last-event-id", seen[-1].encode()),)
+        scope, receive = _request(body, disconnect_after=5, headers=headers)
+        await asyncio.wait_for(app(scope, receive, await collect(second)), timeout=5)
+
+    resumed = _sse_body(second)
+    assert calls == 1
+    assert dict(second[0]["headers"])[b"x-stream-id"].decode() == stream_id
+    assert "event: done" in resumed
+    assert not set(_ids(resumed.split("\n\n"))) & set(seen)
+    assert registry.stats()["resumed"] == 1
+
+
+def test_fingerprint_covers_text_and_styles():
+    assert fingerprint("Hi", ["casual"]) == fingerprint("Hi", ["casual"])
+    assert fingerprint("Hi", ["casual"]) != fingerprint("Hi", ["polite"])
+    assert fingerprint("Hi", None) != fingerprint("Hi there", None)
@@ -38,24 +38,31 @@ async def test_streaming_endpoint():
                         print(f"❌ Error: {response.status_code}")
                         continue
                     
-                    full_content = ""
+                    result = {}
+                    pending = ""
                     async for chunk in response.aiter_text():
-                        # Remove SSE formatting
-                        clean_chunk = chunk.replace("data: ", "").replace("\n\n", "")
-                        if clean_chunk:
-                            print(clean_chunk, end="", flush=True)
-                            full_content += clean_chunk
+                        # Events end with a blank line and may span chunks, so
+                        # keep the unfinished tail for the next one
+                        pending += chunk
+                        *blocks, pending = pending.split("\n\n")
+                        for block in blocks:
+                            # Skip ": ping" heartbeat comments; id lines are harmless
+                            lines = dict(
+                                line.split(": ", 1) for line in block.split("\n")
+                                if ": " in line and not line.startswith(":")
+                            )
+                            if "data" not in lines:
+                                continue
+                            data = json.loads(lines["data"])
+                            if lines.get("event") == "delta":
+                                print(data["text"], end="", flush=True)
+                            elif lines.get("event") == "done":
+                                result = data
                     
-                    print(f"\n✅ Complete! ({len(full_content)} chars)")
-                    
-                    # Try to parse final JSON
-                    try:
-                        result = json.loads(full_content)
-                        print("📝 Parsed styles:")
-                        for style, rephrased in result.items():
-                            print(f"  {style}: {rephrased}")
-                    except json.JSONDecodeError:
-                        print("⚠️  Not valid JSON (expected during streaming)")
+                    print(f"\n✅ Complete!")
+                    print("📝 Parsed styles:")
+                    for style, rephrased in result.items():
+                        print(f"  {style}: {rephrased}")
                         
             except Exception as e:
                 print(f"❌ Error: {e}")
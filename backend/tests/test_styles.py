@@ -0,0 +1,102 @@
+# tests/test_styles.py
+import json
+import pytest
+from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient, ASGITransport
+from tests.helpers import mock_response
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_subset_request_asks_only_for_those_styles(mock_client):
+    from app.llm import rephrase
+    from app.config import get_settings
+
+    create = AsyncMock(return_value=mock_response({"polite": "Would you mind?", "casual": "Hey"}))
+    mock_client.return_value.chat.completions.create = create
+
+    result = await rephrase("Do it now", styles=["polite", "casual"])
+    assert result == {"casual": "Hey", "polite": "Would you mind?"}
+
+    kwargs = create.await_args.kwargs
+    schema = kwargs["response_format"]["json_schema"]["schema"]
+    assert schema["required"] == ["casual", "polite"]
+    assert kwargs["max_tokens"] < get_settings().max_tokens // 2
+
+
+@pytest.mark.asyncio
+@patch('app.llm._client')
+async def test_subset_is_served_from_a_cached_full_result(mock_client):
+    from app.llm import rephrase
+    from app.cache import get_response_cache
+
+    full = {
+        "professional": "Good morning.",
+        "casual": "Hey!",
+        "polite": "Good morning to you.",
+        "social_media": "GM everyone!",
+    }
+    create = AsyncMock(return_value=mock_response(full))
+    mock_client.return_value.chat.completions.create = create
+
+    assert await rephrase("Morning") == full
+    assert await rephrase("Morning", styles=["social_media"]) == {"social_media": "GM everyone!"}
+    assert create.await_count == 1
+    # Each request counts once: a miss, then a hit, though the second tried two keys
+    stats = get_response_cache().stats()
+    assert (stats["misses"], stats["hits"]) == (1, 1)
+
+    await rephrase("Evening", styles=["casual"])
+    assert get_response_cache().stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_rephrase_endpoint_returns_only_requested_styles():
+    from app.main import app
+
+    async def fake_rephrase(text, styles=None):
+        assert styles == ["casual"]
+        return {"casual": "Hey"}
+
+    with patch("app.api.v1.endpoints.rephrase", fake_rephrase):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            res = await ac.post("/api/v1/rephrase", json={"text": "Hello", "styles": ["casual", "casual"]})
+
+    assert res.status_code == 200
+    assert res.json() == {"casual": "Hey"}
+
+
+@pytest.mark.asyncio
+async def test_unknown_style_is_rejected():
+    from app.main import app
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        res = await ac.post("/api/v1/rephrase", json={"text": "Hello", "styles": ["pirate"]})
+        empty = await ac.post("/api/v1/rephrase", json={"text": "Hello", "styles": []})
+
+    assert res.status_code == 422
+    assert empty.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_respects_styles():
+    from app.main import app
+
+    raw = json.dumps({"polite": "Would you mind?"})
+
+    async def fake_stream(text, styles=None):
+        assert styles == ["polite"]
+        for i in range(0, len(raw), 5):
+            yield raw[i:i + 5]
+
+    with patch("app.api.v1.endpoints.rephrase_stream", fake_stream):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            res = await ac.post("/api/v1/rephrase-stream", json={"text": "Hello", "styles": ["polite"]})
+
+    # Drop the id: lines used for resuming
+    events = [block.split("\n", 1)[1] for block in res.text.strip().split("\n\n")]
+    assert events[-1] == 'event: done\ndata: {"polite": "Would you mind?"}'
+    assert sum("event: style_complete" in block for block in events) == 1
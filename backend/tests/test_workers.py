@@ -0,0 +1,104 @@
+# tests/test_workers.py
+import os
+import subprocess
+import sys
+import time
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.server import available_cpus, main
+from benchmarks.load_test import BACKEND_DIR, free_port
+
+client = TestClient(app)
+
+
+def test_available_cpus():
+    assert 1 <= available_cpus() <= (os.cpu_count() or 1)
+
+
+def test_status_reports_this_worker():
+    client.get("/api/v1/health")
+    worker = client.get("/api/v1/status").json()["worker"]
+    assert worker["pid"] == os.getpid()
+    assert worker["requests_served"] >= 1
+    assert worker["upstream_in_flight"] == 0
+
+
+@pytest.mark.parametrize("workers, configured, expected", [
+    (2, None, "sqlite"),
+    (2, "memory", "memory"),
+    (1, None, None),
+])
+def test_launcher_shares_rate_limits_between_workers(monkeypatch, workers, configured, expected):
+    for name in ("WEB_WORKERS", "WORKER_MAX_REQUESTS"):
+        monkeypatch.setenv(name, os.environ.get(name, ""))
+    if configured is None:
+        monkeypatch.delenv("RATE_LIMIT_BACKEND", raising=False)
+    else:
+        monkeypatch.setenv("RATE_LIMIT_BACKEND", configured)
+
+    with patch("uvicorn.run"):
+        main(["--workers", str(workers)])
+    assert os.environ.get("RATE_LIMIT_BACKEND") == expected
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_worker_starts_with_fresh_state(monkeypatch):
+    from app.config import get_settings
+    from app import llm, metrics
+
+    monkeypatch.setattr(get_settings(), "openai_api_key", "sk-test-00000000000000000000000000")
+    llm._client.cache_clear()
+    llm._client()
+    llm.admission.in_flight = 3
+    metrics.HTTP_REQUEST_DURATION.labels("GET", "/x", "200").observe(0.1)
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # Child: report what it inherited, then leave without running pytest's cleanup
+        fresh = (
+            llm._client.cache_info().currsize == 0
+            and llm.admission.in_flight == 0
+            and metrics.requests_served() == 0
+        )
+        os.write(write_end, b"1" if fresh else b"0")
+        os._exit(0)
+    try:
+        os.close(write_end)
+        assert os.read(read_end, 1) == b"1"
+        os.waitpid(pid, 0)
+    finally:
+        os.close(read_end)
+        llm.admission.in_flight = 0
+        llm._client.cache_clear()
+
+
+def test_launcher_runs_and_recycles_workers():
+    port = free_port()
+    env = dict(os.environ, ENVIRONMENT="development",
+               RATE_LIMIT_PER_MINUTE=str(10**9), RATE_LIMIT_PER_HOUR=str(10**9))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "2", "--max-requests", "5"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        pids = set()
+        deadline = time.monotonic() + 30
+        while len(pids) < 3 and time.monotonic() < deadline:
+            try:
+                # A new connection each time, so requests spread over the workers
+                worker = httpx.get(f"http://127.0.0.1:{port}/api/v1/status").json()["worker"]
+            except httpx.TransportError:
+                time.sleep(0.05)
+                continue
+            assert worker["workers"] == 2
+            assert worker["max_requests"] == 5
+            pids.add(worker["pid"])
+        # Recycled workers come back with new pids
+        assert len(pids) >= 3
+    finally:
+        server.terminate()
+        server.wait(timeout=15)
@@ -0,0 +1,72 @@
+import { describe, it, expect, vi } from 'vitest'
+import { parseSSEEvent, processStreamingResponse } from '../streamingUtils'
+
+// A fetch Response whose body yields the given strings as separate reads
+function streamOf(chunks) {
+  const encoder = new TextEncoder()
+  const queue = chunks.map((chunk) => encoder.encode(chunk))
+  return {
+    body: {
+      getReader: () => ({
+        read: async () => (queue.length ? { done: false, value: queue.shift() } : { done: true })
+      })
+    }
+  }
+}
+
+describe('parseSSEEvent', () => {
+  it('reads the event name and JSON data, ignoring the id line', () => {
+    const block = 'id: abc:3\nevent: delta\ndata: {"style": "casual", "text": "Hey"}'
+
+    expect(parseSSEEvent(block)).toEqual({
+      event: 'delta',
+      data: { style: 'casual', text: 'Hey' }
+    })
+  })
+
+  it('defaults the event name to message', () => {
+    expect(parseSSEEvent('data: {"ok": true}')).toEqual({ event: 'message', data: { ok: true } })
+  })
+
+  it('returns null for heartbeat comments', () => {
+    expect(parseSSEEvent(': ping')).toBe(null)
+  })
+
+  it('returns null for a block cut off mid-payload', () => {
+    expect(parseSSEEvent('event: delta\ndata: {"style": "cas')).toBe(null)
+  })
+})
+
+describe('processStreamingResponse', () => {
+  it('reassembles events split across chunks and skips pings', async () => {
+    const onChunk = vi.fn()
+    const onError = vi.fn()
+    const response = streamOf([
+      ': ping\n\nid: s:1\nevent: delta\ndata: {"style": "casual", ',
+      '"text": "He"}\n\nid: s:2\nevent: del',
+      'ta\ndata: {"style": "casual", "text": "y"}\n\n: ping\n\n',
+      'id: s:3\nevent: done\ndata: {"casual": "Hey", "polite": "Hello"}\n\n'
+    ])
+
+    await processStreamingResponse(response, onChunk, onError)
+
+    expect(onError).not.toHaveBeenCalled()
+    const parsed = onChunk.mock.calls.map(([update]) => update.parsed)
+    expect(parsed).toEqual([
+      { casual: 'He' },
+      { casual: 'Hey' },
+      { casual: 'Hey', polite: 'Hello' }
+    ])
+  })
+
+  it('reports an error event', async () => {
+    const onChunk = vi.fn()
+    const onError = vi.fn()
+    const response = streamOf(['event: error\ndata: {"detail": "LLM call failed"}\n\n'])
+
+    await processStreamingResponse(response, onChunk, onError)
+
+    expect(onChunk).not.toHaveBeenCalled()
+    expect(onError).toHaveBeenCalledWith(new Error('LLM call failed'))
+  })
+})
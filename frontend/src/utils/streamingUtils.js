@@ -25,8 +25,36 @@ export function extractPartialStyles(buffer) {
     return Object.keys(styles).length > 0 ? styles : null;
 }
 
+/**
+ * Parse one Server-Sent Event block into its name and JSON payload
+ * @param {string} block - Raw event text without the trailing blank line
+ * @returns {object|null} - { event, data } or null if the block has no data
+ */
+export function parseSSEEvent(block) {
+    let event = "message";
+    const dataLines = [];
+
+    for (const line of block.split('\n')) {
+        if (line.startsWith('event: ')) {
+            event = line.slice(7).trim();
+        } else if (line.startsWith('data: ')) {
+            dataLines.push(line.slice(6));
+        }
+    }
+
+    if (dataLines.length === 0) return null;
+    try {
+        return { event, data: JSON.parse(dataLines.join('\n')) };
+    } catch {
+        return null;
+    }
+}
+
 /**
  * Process streaming response
+ * The server sends typed events: "delta" (new text for one style),
+ * "style_complete" (a style is finished), "done" (full validated result)
+ * and "error".
  * @param {Response} response - Fetch response object
  * @param {function} onChunk - Callback for each chunk
  * @param {function} onError - Error callback
@@ -35,45 +63,40 @@ export async function processStreamingResponse(response, onChunk, onError) {
     try {
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
+        let pending = "";
         let buffer = "";
+        const styles = {};
 
         while (true) {
             const { done, value } = await reader.read();
             if (done) break;
 
             const chunk = decoder.decode(value, { stream: true });
-            const lines = chunk.split('\n');
-            
-            for (const line of lines) {
-                if (line.startsWith('data: ')) {
-                    const data = line.slice(6); // Strip the 'data: ' prefix
-                    if (data.trim()) {
-                        buffer += data;
-                        
-                        // First try to parse the complete JSON
-                        try {
-                            const parsed = JSON.parse(buffer);
-                            onChunk({
-                                buffer,
-                                parsed: {
-                                    professional: parsed.professional || "",
-                                    casual: parsed.casual || "",
-                                    polite: parsed.polite || "",
-                                    social_media: parsed.social_media || ""
-                                }
-                            });
-                        } catch {
-                            // If we can't parse complete JSON, extract what we have
-                            const partial = extractPartialStyles(buffer);
-                            if (partial) {
-                                onChunk({
-                                    buffer,
-                                    parsed: partial
-                                });
-                            }
-                        }
-                    }
+            buffer += chunk;
+            pending += chunk;
+
+            // Events are separated by a blank line and may span network chunks
+            const blocks = pending.split('\n\n');
+            pending = blocks.pop();
+
+            for (const block of blocks) {
+                const parsed = parseSSEEvent(block);
+                if (!parsed) continue;
+                const { event, data } = parsed;
+
+                if (event === "delta") {
+                    styles[data.style] = (styles[data.style] || "") + data.text;
+                } else if (event === "style_complete") {
+                    styles[data.style] = data.text;
+                } else if (event === "done") {
+                    Object.assign(styles, data);
+                } else if (event === "error") {
+                    throw new Error(data.detail || "Streaming failed");
+                } else {
+                    continue;
                 }
+
+                onChunk({ buffer, parsed: { ...styles } });
             }
         }
     } catch (error) {